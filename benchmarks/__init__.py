@@ -0,0 +1 @@
+# Benchmarks de desempenho (não são testes): python -m benchmarks --help
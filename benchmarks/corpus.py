@@ -0,0 +1,87 @@
+import hashlib
+import io
+import os
+import random
+
+from PIL import Image, ImageDraw
+
+# Corpus sintético determinístico: a mesma semente gera as mesmas imagens (para a
+# mesma versão do Pillow), então duas execuções medem exatamente o mesmo trabalho.
+
+# (largura, altura) típicos de fotos de produto, de miniatura a câmera
+TAMANHOS = [(640, 480), (1080, 1080), (1200, 1600), (2048, 1536), (3000, 4000), (4032, 3024)]
+FORMATOS = ["jpg", "jpg", "png", "webp"]  # JPEG é o caso mais comum
+
+
+def _imagem(rng, size, alpha):
+    """Gradiente + formas: comprime como foto de produto (ruído puro distorceria o encode)."""
+    w, h = size
+    fundo = Image.linear_gradient("L").resize(size).convert("RGB")
+    img = Image.merge("RGB", [fundo.getchannel(0).point(lambda v, k=k: (v * k) % 256)
+                              for k in (rng.randint(1, 3), rng.randint(1, 3), rng.randint(1, 3))])
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.randint(3, 8)):
+        x0, y0 = rng.randrange(w), rng.randrange(h)
+        x1, y1 = x0 + rng.randint(w // 10, w // 2), y0 + rng.randint(h // 10, h // 2)
+        cor = tuple(rng.randrange(256) for _ in range(3))
+        (draw.ellipse if rng.random() < 0.5 else draw.rectangle)((x0, y0, x1, y1), fill=cor)
+    if not alpha:
+        return img
+    # Produto recortado: elipse opaca sobre fundo transparente
+    mask = Image.new("L", size, 0)
+    ImageDraw.Draw(mask).ellipse((w // 8, h // 8, w * 7 // 8, h * 7 // 8), fill=255)
+    img.putalpha(mask)
+    return img
+
+
+def _encode(img, fmt):
+    bio = io.BytesIO()
+    if fmt == "jpg":
+        img.convert("RGB").save(bio, format="JPEG", quality=90)
+    elif fmt == "png":
+        img.save(bio, format="PNG", compress_level=6)
+    else:
+        img.save(bio, format="WEBP", quality=90)
+    return bio.getvalue()
+
+
+def gerar(n, semente=0, tamanhos=TAMANHOS, formatos=FORMATOS):
+    """Gera [(nome, bytes)] com tamanhos, formatos e alfa variados (PNG/WebP com alfa em metade dos casos)."""
+    rng = random.Random(semente)
+    itens = []
+    for i in range(n):
+        size = rng.choice(tamanhos)
+        fmt = rng.choice(formatos)
+        alpha = fmt != "jpg" and rng.random() < 0.5
+        nome = f"{i:04d}_{size[0]}x{size[1]}{'_alfa' if alpha else ''}.{fmt}"
+        itens.append((nome, _encode(_imagem(rng, size, alpha), fmt)))
+    return itens
+
+
+def carregar(n, semente=0, pasta_cache=None, **kwargs):
+    """Como gerar(), mas guarda o corpus em disco para as execuções seguintes."""
+    if not pasta_cache:
+        return gerar(n, semente, **kwargs)
+    chave = hashlib.sha1(repr((n, semente, sorted(kwargs.items()))).encode()).hexdigest()[:10]
+    pasta = os.path.join(pasta_cache, f"corpus_{n}_{semente}_{chave}")
+    if not os.path.isdir(pasta):
+        tmp = pasta + ".tmp"
+        os.makedirs(tmp, exist_ok=True)
+        for nome, data in gerar(n, semente, **kwargs):
+            with open(os.path.join(tmp, nome), "wb") as f:
+                f.write(data)
+        os.replace(tmp, pasta)
+    itens = []
+    for nome in sorted(os.listdir(pasta)):
+        with open(os.path.join(pasta, nome), "rb") as f:
+            itens.append((nome, f.read()))
+    return itens
+
+
+def assinatura(itens):
+    """sha256 do corpus, para conferir que baseline e execução mediram o mesmo conteúdo."""
+    h = hashlib.sha256()
+    for nome, data in itens:
+        h.update(nome.encode())
+        h.update(data)
+    return h.hexdigest()[:16]
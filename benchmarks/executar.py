@@ -0,0 +1,375 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import PIL
+
+from benchmarks import corpus
+from benchmarks.mock_shopify import MockShopify
+
+# Orquestra os cenários: cada caso roda num subprocesso próprio (pico de memória
+# isolado, sem aquecimento herdado de outro caso), o exportador fala com o mock
+# que roda neste processo, e o resultado é comparado com o baseline local, se houver
+# (gravado com --salvar-baseline na própria máquina; não vai para o repositório).
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(RAIZ, "benchmarks", "baseline.json")
+CACHE = os.path.join(tempfile.gettempdir(), "v2labs_bench_cache")
+
+CENARIOS = ("conversor", "removedor", "exportador")
+
+# Alvos do conversor: o caso comum (quadrado transparente) e um vertical com fundo
+ALVOS = ("1080x1080:transparente:png", "1080x1920:#ffffff:jpg")
+
+PERFIS = {
+    "rapido": {
+        "imagens": 24, "repeticoes": 3, "produtos": 40,
+        "conversor": [{"workers": w} for w in (1, 4, 8)] + [{"workers": 8, "motor": "processos"}]
+                     + [{"workers": 8, "compressao": c} for c in ("rapida", "menor")],
+        "removedor": [{"workers": 4, "lote": 8}, {"workers": 8, "lote": 8}],
+        "exportador": [{"motor": "threads", "workers": w} for w in (4, 16)] + [{"motor": "asyncio"}]
+                      + [{"motor": "threads", "workers": 16, "fonte": "bulk"}]
+                      + [{"motor": "threads", "workers": 16, "modo": "pipeline"}],
+    },
+    "completo": {
+        "imagens": 96, "repeticoes": 5, "produtos": 200,
+        "conversor": [{"workers": w} for w in (1, 2, 4, 8, 16)] + [{"workers": 8, "motor": "processos"}]
+                     + [{"workers": 8, "compressao": c} for c in ("rapida", "menor")]
+                     + [{"workers": 8, "motor": "processos", "compressao": c} for c in ("rapida", "menor")],
+        "removedor": [{"workers": w, "lote": b} for w, b in ((2, 4), (4, 8), (8, 8), (8, 16))],
+        "exportador": [{"motor": "threads", "workers": w} for w in (4, 8, 16, 32)] + [{"motor": "asyncio"}]
+                      + [{"motor": "threads", "workers": 16, "fonte": "bulk"}]
+                      + [{"motor": "threads", "workers": 16, "modo": "pipeline"}],
+    },
+}
+
+
+def _chave(caso):
+    params = ",".join(f"{k}={v}" for k, v in sorted(caso.items()) if k not in ("cenario", "ambiente"))
+    return f"{caso['cenario']}/{params}"
+
+
+def _maquina():
+    info = {"python": platform.python_version(), "pillow": PIL.__version__, "cpus": os.cpu_count(),
+            "plataforma": platform.platform(terse=True), "processador": platform.machine()}
+    try:
+        import onnxruntime
+        info["onnxruntime"] = onnxruntime.__version__
+    except Exception:
+        pass
+    return info
+
+
+# ====== Execução de um caso (subprocesso) ======
+def _latencias(itens):
+    """Envolve (nome, raw) guardando o instante em que cada item entra no núcleo."""
+    enviados = {}
+
+    def _gerar():
+        for nome, raw in itens:
+            enviados[nome] = time.perf_counter()
+            yield nome, raw
+    return enviados, _gerar()
+
+
+def _rodar_conversor(caso, itens, metricas):
+    from modules.arquivo_zip import ZipStream
+    from modules.conversao import converter_lote, parse_alvo
+
+    alvos = [parse_alvo(a) for a in ALVOS]
+    enviados, fluxo = _latencias(itens)
+    latencias, erros = [], 0
+    with ZipStream() as zout:
+        # Sem "motor"/"compressao" no caso: threads e o nível padrão (chaves antigas do baseline continuam valendo)
+        for nome, _res, erro in converter_lote(fluxo, alvos, zout, subpastas=True, workers=caso["workers"],
+                                        janela=caso["workers"] * 2, metricas=metricas, previews=6,
+                                        compressao=caso.get("compressao", "equilibrada"),
+                                        processos=caso.get("motor") == "processos"):
+            if erro is not None:
+                erros += 1
+                continue
+            latencias.append(time.perf_counter() - enviados[nome])
+        zout.finalizar().close()
+    return len(itens), latencias, erros
+
+
+def _sessao_sintetica():
+    """Troca o ONNX por uma sessão que devolve máscara constante: mede só o pool e o pré/pós."""
+    import numpy as np
+
+    from modules import sessoes_rembg
+
+    class _Entrada:
+        name, shape = "input.1", ["batch", 3, 320, 320]
+
+    class _Interna:
+        def get_inputs(self):
+            return [_Entrada()]
+
+        def run(self, _saidas, feed):
+            lote = feed["input.1"]
+            return [np.ones((lote.shape[0], 1) + lote.shape[2:], dtype=np.float32)]
+
+    class _Sessao:
+        inner_session = _Interna()
+
+    from modules import remocao
+
+    sessoes_rembg.POOL.obter = lambda *a, **k: _Sessao()
+    remocao._HAS_REMBG = True
+
+
+def _preparar_removedor(caso):
+    from modules import remocao, sessoes_rembg
+
+    if caso["ambiente"].get("sessao_sintetica"):
+        _sessao_sintetica()
+    elif not remocao._HAS_REMBG:
+        return "rembg/onnxruntime não instalados"
+    try:
+        # A carga do modelo fica fora da medição
+        sessoes_rembg.obter_sessao(caso["ambiente"]["modelo"])
+    except Exception as e:
+        return f"modelo indisponível: {type(e).__name__}"
+    return None
+
+
+def _rodar_removedor(caso, itens, metricas):
+    from modules.arquivo_zip import ZipStream
+    from modules.remocao import remover_fundo_lote
+
+    enviados, fluxo = _latencias(itens)
+    latencias, erros = [], 0
+    with ZipStream() as zout:
+        lote = remover_fundo_lote(fluxo, zout, caso["ambiente"]["modelo"], tamanho_lote=caso["lote"],
+                                  workers=caso["workers"], cache=None, metricas=metricas)
+        for nome, _raw, _out, erro, _hit in lote:
+            if erro is not None:
+                erros += 1
+                continue
+            latencias.append(time.perf_counter() - enviados[nome])
+        zout.finalizar().close()
+    return len(itens), latencias, erros
+
+
+def _rodar_exportador(caso, _itens, metricas):
+    from modules.conversao import parse_alvo
+    from modules.exportacao import WORKERS_TURBO, exportar_colecao
+
+    # Sem "modo" no caso: ZIP; o pipeline roda sem modelo (download → conversão para o primeiro alvo)
+    modo = caso.get("modo", "zip")
+    opcoes = None
+    if modo == "pipeline":
+        opcoes = {"modelo": None, "alvos": [parse_alvo(ALVOS[0])], "workers_download": caso["workers"]}
+    destino = tempfile.mkdtemp(prefix="v2labs_bench_")
+    try:
+        res = exportar_colecao(
+            "bench", "2024-01", "token", "bench", destino=destino, modo=modo, fonte=caso.get("fonte", "rest"),
+            turbo=True, motor=caso["motor"], incremental=False, deduplicar=False,
+            # asyncio ignora workers_download: a concorrência é adaptativa (até 256 conexões)
+            workers_download=caso.get("workers", WORKERS_TURBO), opcoes_pipeline=opcoes,
+            metricas=metricas,
+        )
+    finally:
+        shutil.rmtree(destino, ignore_errors=True)
+    with metricas._lock:
+        latencias = list(metricas._duracoes.get("download", []))
+    return res.imagens, latencias, len(res.falhas)
+
+
+_EXECUTORES = {"conversor": _rodar_conversor, "removedor": _rodar_removedor, "exportador": _rodar_exportador}
+
+
+def executar_caso(caso):
+    """Roda um caso `repeticoes` vezes e devolve a mediana das medidas."""
+    from modules.metricas import Metricas, _percentil
+
+    amb = caso["ambiente"]
+    if caso["cenario"] == "exportador":
+        os.environ["SHOPIFY_API_BASE"] = amb["base_url"]
+        itens = []
+    else:
+        itens = corpus.carregar(amb["imagens"], amb["semente"], CACHE)
+    if caso["cenario"] == "removedor":
+        motivo = _preparar_removedor(caso)
+        if motivo:
+            return {"caso": _chave(caso), "pulado": motivo}
+
+    rodar = _EXECUTORES[caso["cenario"]]
+    if itens:
+        rodar(caso, itens[:2], Metricas("aquecimento").encerrar())  # imports, pools e caches de código
+    rodadas = []
+    for _ in range(amb["repeticoes"]):
+        with Metricas(caso["cenario"]) as m:
+            n, latencias, erros = rodar(caso, itens, m)
+        latencias.sort()
+        rodadas.append({
+            "itens": n, "erros": erros, "segundos": m.segundos, "imagens_s": n / m.segundos if m.segundos else 0.0,
+            "p50_ms": _percentil(latencias, 0.5) * 1000, "p95_ms": _percentil(latencias, 0.95) * 1000,
+            "pico_rss_mb": m.pico_rss / 2**20, "etapas": m.resumo()["etapas"],
+        })
+    mediana = sorted(rodadas, key=lambda r: r["imagens_s"])[len(rodadas) // 2]
+    return {
+        "caso": _chave(caso), "itens": mediana["itens"], "erros": mediana["erros"],
+        "imagens_s": round(statistics.median(r["imagens_s"] for r in rodadas), 2),
+        "p50_ms": round(statistics.median(r["p50_ms"] for r in rodadas), 1),
+        "p95_ms": round(statistics.median(r["p95_ms"] for r in rodadas), 1),
+        "pico_rss_mb": round(max(r["pico_rss_mb"] for r in rodadas), 1),
+        "variacao": round(statistics.pstdev(r["imagens_s"] for r in rodadas) / max(mediana["imagens_s"], 1e-9), 3),
+        "etapas": mediana["etapas"],
+    }
+
+
+def _subprocesso(caso, timeout):
+    cmd = [sys.executable, "-m", "benchmarks", "_caso", json.dumps(caso)]
+    try:
+        p = subprocess.run(cmd, cwd=RAIZ, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"caso": _chave(caso), "pulado": f"excedeu {timeout}s"}
+    linhas = p.stdout.strip().splitlines()
+    if p.returncode != 0 or not linhas:
+        erro = (p.stderr.strip().splitlines() or ["sem saída"])[-1]
+        return {"caso": _chave(caso), "pulado": f"falhou: {erro}"}
+    return json.loads(linhas[-1])
+
+
+# ====== Relatório e baseline ======
+def _comparar(resultados, baseline, tolerancia):
+    """Acrescenta delta_imagens_s/delta_p95/delta_pico (%) e devolve os casos que regrediram."""
+    anteriores = {r["caso"]: r for r in baseline.get("resultados", [])}
+    regressoes = []
+    for r in resultados:
+        b = anteriores.get(r["caso"])
+        if not b or "pulado" in r or "pulado" in b:
+            continue
+        for campo, delta in (("imagens_s", "delta_imagens_s"), ("p95_ms", "delta_p95"), ("pico_rss_mb", "delta_pico")):
+            r[delta] = round((r[campo] - b[campo]) / b[campo] * 100, 1) if b[campo] else 0.0
+        # Só vazão e memória decidem regressão; p95 oscila demais entre execuções curtas
+        if r["delta_imagens_s"] < -tolerancia * 100 or r["delta_pico"] > tolerancia * 100:
+            regressoes.append(r["caso"])
+    return regressoes
+
+
+def _delta(valor, invertido=False):
+    if valor is None:
+        return ""
+    ruim = valor > 0 if invertido else valor < 0
+    return f"{valor:+.1f}%{' ⚠' if ruim and abs(valor) >= 10 else ''}"
+
+
+def _imprimir(resultados):
+    print(f"\n{'caso':<42}{'img/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'pico MB':>10}   vs baseline (img/s · p95 · pico)")
+    for r in resultados:
+        if "pulado" in r:
+            print(f"{r['caso']:<42}  pulado: {r['pulado']}")
+            continue
+        comp = " · ".join(filter(None, (_delta(r.get("delta_imagens_s")), _delta(r.get("delta_p95"), True),
+                                        _delta(r.get("delta_pico"), True))))
+        print(f"{r['caso']:<42}{r['imagens_s']:>9.2f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['pico_rss_mb']:>10.0f}"
+              f"   {comp}")
+
+
+def _casos(args, perfil, base_url):
+    ambiente = {"imagens": args.imagens or perfil["imagens"], "semente": args.semente,
+                "repeticoes": args.repeticoes or perfil["repeticoes"], "modelo": args.modelo,
+                "sessao_sintetica": args.sessao_sintetica, "base_url": base_url}
+    for cenario in args.cenarios or CENARIOS:
+        for params in perfil[cenario]:
+            yield {"cenario": cenario, **params, "ambiente": ambiente}
+
+
+def _parser():
+    p = argparse.ArgumentParser(prog="python -m benchmarks",
+                                description="Benchmarks reproduzíveis do conversor, removedor e exportador.")
+    p.add_argument("cenarios", nargs="*", metavar="cenario",
+                   help=f"Subconjunto de {', '.join(CENARIOS)} (padrão: todos).")
+    p.add_argument("--perfil", choices=PERFIS, default="rapido")
+    p.add_argument("--imagens", type=int, help="Tamanho do corpus sintético (padrão do perfil).")
+    p.add_argument("--semente", type=int, default=0)
+    p.add_argument("--repeticoes", type=int, help="Rodadas por caso; vale a mediana.")
+    p.add_argument("--modelo", default="u2net_human_seg", help="Modelo do removedor.")
+    p.add_argument("--sessao-sintetica", action="store_true",
+                   help="Removedor sem o modelo ONNX (máscara constante): mede só o pool e o pré/pós.")
+    p.add_argument("--latencia-api-ms", type=float, default=50)
+    p.add_argument("--latencia-cdn-ms", type=float, default=30)
+    p.add_argument("--api-por-segundo", type=float, default=2.0, help="Escoamento do leaky bucket da Admin API.")
+    p.add_argument("--cdn-por-segundo", type=float, default=0.0, help="Limite do CDN em req/s (0 = sem limite).")
+    p.add_argument("--timeout", type=int, default=900, help="Tempo máximo por caso (s).")
+    p.add_argument("--baseline", default=BASELINE)
+    p.add_argument("--salvar-baseline", action="store_true", help="Grava estes resultados como o novo baseline.")
+    p.add_argument("--tolerancia", type=float, default=0.10, help="Queda de img/s ou alta de memória tolerada.")
+    p.add_argument("--saida", help="Grava os resultados completos (com etapas) neste JSON.")
+    return p
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["_caso"]:
+        print(json.dumps(executar_caso(json.loads(argv[1])), ensure_ascii=False))
+        return 0
+
+    parser = _parser()
+    args = parser.parse_args(argv)
+    for c in set(args.cenarios) - set(CENARIOS):
+        parser.error(f"cenário desconhecido: {c}")
+    perfil = PERFIS[args.perfil]
+    n_imagens = args.imagens or perfil["imagens"]
+    print(f"Gerando corpus ({n_imagens} imagens, semente {args.semente})...", flush=True)
+    assinatura = corpus.assinatura(corpus.carregar(n_imagens, args.semente, CACHE))
+
+    imagens_cdn = [data for _, data in corpus.gerar(30, args.semente + 1, tamanhos=[(1200, 1200), (1600, 1200)],
+                                                     formatos=["jpg"])]
+    resultados = []
+    for caso in _casos(args, perfil, None):
+        if caso["cenario"] == "exportador":
+            # Mock novo por caso: baldes vazios e contagem de 429 só deste caso
+            with MockShopify(imagens_cdn, n_produtos=perfil["produtos"], latencia_api_ms=args.latencia_api_ms,
+                             latencia_cdn_ms=args.latencia_cdn_ms, api_por_segundo=args.api_por_segundo,
+                             cdn_por_segundo=args.cdn_por_segundo) as mock:
+                caso["ambiente"] = {**caso["ambiente"], "base_url": mock.base_url}
+                r = _subprocesso(caso, args.timeout)
+                r["http_429"] = mock.contagem["api_429"] + mock.contagem["cdn_429"]
+        else:
+            r = _subprocesso(caso, args.timeout)
+        print(f"  {r['caso']}: " + (f"pulado ({r['pulado']})" if "pulado" in r else f"{r['imagens_s']:.2f} img/s"),
+              flush=True)
+        resultados.append(r)
+
+    condicoes = {"perfil": args.perfil, "imagens": n_imagens, "semente": args.semente, "modelo": args.modelo,
+                 "sessao_sintetica": args.sessao_sintetica, "latencia_api_ms": args.latencia_api_ms,
+                 "latencia_cdn_ms": args.latencia_cdn_ms, "api_por_segundo": args.api_por_segundo,
+                 "cdn_por_segundo": args.cdn_por_segundo}
+    execucao = {"maquina": _maquina(), "condicoes": condicoes, "corpus": assinatura,
+                "data": time.strftime("%Y-%m-%d %H:%M:%S"), "resultados": resultados}
+    regressoes = []
+    if os.path.exists(args.baseline) and not args.salvar_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("maquina") != execucao["maquina"]:
+            print("\n⚠ Baseline gravado em outra máquina/versão; compare com cautela.")
+        if baseline.get("corpus") != assinatura:
+            print("⚠ Corpus diferente do baseline (tamanho, semente ou versão do Pillow).")
+        diferentes = [k for k, v in condicoes.items() if baseline.get("condicoes", {}).get(k) != v]
+        if diferentes:
+            print(f"⚠ Condições diferentes do baseline: {', '.join(diferentes)}.")
+        regressoes = _comparar(resultados, baseline, args.tolerancia)
+
+    _imprimir(resultados)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(execucao, f, ensure_ascii=False, indent=2)
+    if args.salvar_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(execucao, f, ensure_ascii=False, indent=2)
+        print(f"\nBaseline gravado em {args.baseline}")
+    if regressoes:
+        print(f"\n❌ Regressão acima de {args.tolerancia:.0%}: {', '.join(regressoes)}")
+        return 1
+    return 0
@@ -0,0 +1,222 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Admin REST API + CDN falsos da Shopify, locais, com latência e limite de taxa
+# configuráveis. Atende o que o exportador usa: coleção por handle, produtos da
+# coleção paginados por Link/page_info e as imagens em /cdn/<n>.jpg. Para a fonte
+# "bulk" há também o graphql.json (coleção por handle, bulkOperationRunQuery e
+# currentBulkOperation) e o JSONL do resultado em /bulk/<n>.jsonl.
+
+# Campos que o tipo Image do GraphQL Admin aceita (updatedAt não existe)
+_CAMPOS_IMAGE = {"id", "url", "altText", "width", "height"}
+
+
+class _Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+    # Rajadas de 32+ conexões simultâneas não podem esbarrar na fila de accept
+    request_queue_size = 256
+
+
+class _Balde:
+    """Leaky bucket: `capacidade` requisições, escoando `por_segundo` (0 = sem limite)."""
+
+    def __init__(self, capacidade, por_segundo):
+        self.capacidade = capacidade
+        self.por_segundo = por_segundo
+        self.nivel = 0.0
+        self._t = time.monotonic()
+        self._lock = threading.Lock()
+
+    def entrar(self):
+        """Devolve (aceito, nível atual, segundos até caber mais uma)."""
+        if not self.por_segundo:
+            return True, 0, 0.0
+        with self._lock:
+            agora = time.monotonic()
+            self.nivel = max(0.0, self.nivel - (agora - self._t) * self.por_segundo)
+            self._t = agora
+            if self.nivel + 1 > self.capacidade:
+                return False, int(self.nivel), (self.nivel + 1 - self.capacidade) / self.por_segundo
+            self.nivel += 1
+            return True, int(self.nivel), 0.0
+
+
+class MockShopify:
+    """Servidor em thread; `base_url` vai em SHOPIFY_API_BASE.
+
+    `imagens` são os bytes servidos pelo CDN (a imagem k do produto p é a de índice
+    (p * imagens_por_produto + k) % len(imagens), cada uma numa URL própria).
+    """
+
+    def __init__(self, imagens, n_produtos=40, imagens_por_produto=3, latencia_api_ms=50, latencia_cdn_ms=30,
+                 api_capacidade=40, api_por_segundo=2.0, cdn_por_segundo=0.0, cdn_capacidade=50, por_pagina=50,
+                 bulk_segundos=0.0):
+        self.imagens = imagens
+        self.n_produtos = n_produtos
+        self.imagens_por_produto = imagens_por_produto
+        self.latencia_api = latencia_api_ms / 1000
+        self.latencia_cdn = latencia_cdn_ms / 1000
+        self.por_pagina = por_pagina
+        self.balde_api = _Balde(api_capacidade, api_por_segundo)
+        self.balde_cdn = _Balde(cdn_capacidade, cdn_por_segundo)
+        self.bulk_segundos = bulk_segundos  # tempo até a bulk operation ficar COMPLETED
+        self.contagem = {"api": 0, "cdn": 0, "api_429": 0, "cdn_429": 0, "graphql": 0, "bulk": 0}
+        self._bulk = None  # (n, iniciada_em) da bulk operation atual
+        self._lock = threading.Lock()
+        self._srv = None
+
+    @property
+    def total_imagens(self):
+        return self.n_produtos * self.imagens_por_produto
+
+    def _contar(self, chave):
+        with self._lock:
+            self.contagem[chave] += 1
+
+    def _produtos(self, host, pagina):
+        inicio = pagina * self.por_pagina
+        for p in range(inicio, min(self.n_produtos, inicio + self.por_pagina)):
+            yield {
+                "id": p + 1, "title": f"Produto {p:04d}", "handle": f"produto-{p}",
+                "updated_at": "2024-01-01T00:00:00Z",
+                "images": [
+                    {"id": (p + 1) * 100 + k, "src": f"{host}/cdn/{p * self.imagens_por_produto + k}.jpg?v=1",
+                     "updated_at": "2024-01-01T00:00:00Z"}
+                    for k in range(self.imagens_por_produto)
+                ],
+            }
+
+    def _jsonl(self, host):
+        """Resultado da bulk operation: cada produto seguido das suas imagens (__parentId)."""
+        linhas = []
+        for pagina in range(0, max(1, -(-self.n_produtos // self.por_pagina))):
+            for p in self._produtos(host, pagina):
+                gid = f"gid://shopify/Product/{p['id']}"
+                linhas.append({"id": gid, "title": p["title"], "handle": p["handle"], "updatedAt": p["updated_at"]})
+                linhas += [{"id": f"gid://shopify/ProductImage/{img['id']}", "url": img["src"], "__parentId": gid}
+                           for img in p["images"]]
+        return "".join(json.dumps(linha) + "\n" for linha in linhas).encode()
+
+    def _graphql(self, host, query, variaveis):
+        """Resposta (dict) para as três operações que o ShopifyBulk usa."""
+        if "bulkOperationRunQuery" in query:
+            consulta = variaveis.get("query", "")
+            m = re.search(r"images\s*\{\s*edges\s*\{\s*node\s*\{([^}]*)\}", consulta)
+            invalidos = sorted(set(m.group(1).split()) - _CAMPOS_IMAGE) if m else []
+            if invalidos:
+                return {"errors": [{"message": f"Field '{c}' doesn't exist on type 'Image'"} for c in invalidos]}
+            with self._lock:
+                n = (self._bulk[0] + 1) if self._bulk else 1
+                self._bulk = (n, time.monotonic())
+            return {"data": {"bulkOperationRunQuery": {
+                "bulkOperation": {"id": f"gid://shopify/BulkOperation/{n}", "status": "CREATED"}, "userErrors": []}}}
+        if "currentBulkOperation" in query:
+            if self._bulk is None:
+                return {"data": {"currentBulkOperation": None}}
+            n, inicio = self._bulk
+            pronta = time.monotonic() - inicio >= self.bulk_segundos
+            objetos = self.n_produtos * (1 + self.imagens_por_produto)
+            return {"data": {"currentBulkOperation": {
+                "id": f"gid://shopify/BulkOperation/{n}", "status": "COMPLETED" if pronta else "RUNNING",
+                "errorCode": None, "objectCount": str(objetos if pronta else objetos // 2),
+                "url": f"{host}/bulk/{n}.jsonl" if pronta else None, "partialDataUrl": None}}}
+        if "collections(" in query:
+            return {"data": {"collections": {"edges": [{"node": {"id": "gid://shopify/Collection/1",
+                                                                  "handle": variaveis.get("q", "")}}]}}}
+        return {"errors": [{"message": "Operação não suportada pelo mock"}]}
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _enviar(self, status, corpo, tipo="application/json", cabecalhos=None):
+                self.send_response(status)
+                self.send_header("Content-Type", tipo)
+                self.send_header("Content-Length", str(len(corpo)))
+                for k, v in (cabecalhos or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def _json(self, obj, status=200, cabecalhos=None):
+                self._enviar(status, json.dumps(obj).encode(), cabecalhos=cabecalhos)
+
+            def do_GET(self):
+                u = urlparse(self.path)
+                q = parse_qs(u.query)
+                host = f"http://{self.headers['Host']}"
+                m = re.fullmatch(r"/cdn/(\d+)\.jpg", u.path)
+                if m:
+                    return self._cdn(int(m.group(1)))
+                if re.fullmatch(r"/bulk/\d+\.jsonl", u.path):
+                    mock._contar("bulk")
+                    time.sleep(mock.latencia_cdn)
+                    return self._enviar(200, mock._jsonl(host), "application/jsonl")
+                mock._contar("api")
+                time.sleep(mock.latencia_api)
+                ok, nivel, espera = mock.balde_api.entrar()
+                limite = {"X-Shopify-Shop-Api-Call-Limit": f"{nivel}/{mock.balde_api.capacidade}"}
+                if not ok:
+                    mock._contar("api_429")
+                    return self._json({"errors": "Exceeded 2 calls per second for api client."}, 429,
+                                      {"Retry-After": f"{espera:.2f}", **limite})
+                if u.path.endswith("/custom_collections.json"):
+                    return self._json({"custom_collections": [{"id": 1}]}, cabecalhos=limite)
+                if u.path.endswith("/smart_collections.json"):
+                    return self._json({"smart_collections": []}, cabecalhos=limite)
+                if u.path.endswith("/products.json"):
+                    pagina = int(q.get("page_info", ["0"])[0])
+                    if (pagina + 1) * mock.por_pagina < mock.n_produtos:
+                        limite["Link"] = f'<{host}{u.path}?limit=250&page_info={pagina + 1}>; rel="next"'
+                    return self._json({"products": list(mock._produtos(host, pagina))}, cabecalhos=limite)
+                self._json({"errors": "Not Found"}, 404)
+
+            def do_POST(self):
+                u = urlparse(self.path)
+                corpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                if not u.path.endswith("/graphql.json"):
+                    return self._json({"errors": "Not Found"}, 404)
+                mock._contar("graphql")
+                time.sleep(mock.latencia_api)
+                host = f"http://{self.headers['Host']}"
+                self._json(mock._graphql(host, corpo.get("query", ""), corpo.get("variables") or {}))
+
+            def _cdn(self, n):
+                mock._contar("cdn")
+                time.sleep(mock.latencia_cdn)
+                ok, _, espera = mock.balde_cdn.entrar()
+                if not ok:
+                    mock._contar("cdn_429")
+                    return self._json({"errors": "Too Many Requests"}, 429, {"Retry-After": f"{espera:.2f}"})
+                self._enviar(200, mock.imagens[n % len(mock.imagens)], "image/jpeg", {"ETag": f'"img{n}"'})
+
+        return Handler
+
+    def iniciar(self):
+        self._srv = _Servidor(("127.0.0.1", 0), self._handler())
+        threading.Thread(target=self._srv.serve_forever, name="mock-shopify", daemon=True).start()
+        return self
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._srv.server_port}"
+
+    def parar(self):
+        if self._srv is not None:
+            self._srv.shutdown()
+            self._srv.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc):
+        self.parar()
@@ -0,0 +1,184 @@
+import asyncio
+import random
+import threading
+import time
+
+import requests
+
+# Respostas que valem nova tentativa (limite de taxa e falhas temporárias do servidor)
+RETENTAVEIS = {429, 500, 502, 503, 504}
+
+
+class ErroHTTP(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def espera_backoff(tentativa, retry_after=None, base=0.5, teto=30.0):
+    """Retry-After quando o servidor informa; senão backoff exponencial com jitter total."""
+    if retry_after:
+        try:
+            return min(float(retry_after), teto)
+        except ValueError:
+            pass
+    return random.uniform(0, min(teto, base * (2 ** tentativa)))
+
+
+def uso_balde(headers):
+    """Lê 'X-Shopify-Shop-Api-Call-Limit: 32/40' -> (32, 40), ou None."""
+    valor = headers.get("X-Shopify-Shop-Api-Call-Limit") if headers else None
+    if not valor or "/" not in valor:
+        return None
+    try:
+        usado, capacidade = valor.split("/", 1)
+        return int(usado), int(capacidade)
+    except ValueError:
+        return None
+
+
+class _AIMD:
+    """Janela de concorrência aditiva/multiplicativa (como o controle de congestionamento do TCP)."""
+
+    def _iniciar(self, inicial, minimo, maximo, passo_sucessos):
+        self.minimo = max(1, minimo)
+        self.maximo = max(self.minimo, maximo)
+        self.limite = min(max(inicial, self.minimo), self.maximo)
+        self.passo_sucessos = passo_sucessos
+        self._sucessos = 0
+        self._ultimo_corte = 0.0
+        self.em_voo = 0
+
+    def _ajustar_sucesso(self):
+        self._sucessos += 1
+        if self._sucessos >= max(self.passo_sucessos, int(self.limite)):
+            self._sucessos = 0
+            self.limite = min(self.maximo, self.limite + 1)
+
+    def _ajustar_congestionado(self):
+        # Um corte por rajada de erros, não um por resposta
+        agora = time.monotonic()
+        if agora - self._ultimo_corte > 1.0:
+            self.limite = max(self.minimo, self.limite // 2)
+            self._ultimo_corte = agora
+        self._sucessos = 0
+
+
+class LimitadorAdaptativo(_AIMD):
+    """Limite de concorrência adaptativo para código com threads."""
+
+    def __init__(self, inicial=8, minimo=1, maximo=64, passo_sucessos=8):
+        self._iniciar(inicial, minimo, maximo, passo_sucessos)
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self.em_voo >= self.limite:
+                self._cond.wait()
+            self.em_voo += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._cond:
+            self.em_voo -= 1
+            self._cond.notify_all()
+
+    def sucesso(self):
+        with self._cond:
+            self._ajustar_sucesso()
+            self._cond.notify_all()
+
+    def congestionado(self):
+        with self._cond:
+            self._ajustar_congestionado()
+
+
+class LimitadorAdaptativoAsync(_AIMD):
+    """Mesmo controle AIMD para corrotinas asyncio."""
+
+    def __init__(self, inicial=64, minimo=1, maximo=512, passo_sucessos=8):
+        self._iniciar(inicial, minimo, maximo, passo_sucessos)
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.em_voo < self.limite)
+            self.em_voo += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        async with self._cond:
+            self.em_voo -= 1
+            self._cond.notify_all()
+
+    async def sucesso(self):
+        async with self._cond:
+            self._ajustar_sucesso()
+            self._cond.notify_all()
+
+    def congestionado(self):
+        self._ajustar_congestionado()
+
+
+class AgendadorShopify:
+    """Cadencia as chamadas à Admin API para ficar logo abaixo do leaky bucket.
+
+    Lê X-Shopify-Shop-Api-Call-Limit a cada resposta, espaça as próximas chamadas
+    quando o balde passa de `alvo` e repete 429/5xx com backoff (respeitando Retry-After).
+    """
+
+    def __init__(self, sessao, max_tentativas=8, alvo=0.8, vazao_por_s=2.0):
+        self.sessao = sessao
+        self.max_tentativas = max_tentativas
+        self.alvo = alvo
+        self.vazao_por_s = vazao_por_s
+        self._lock = threading.Lock()
+        self._proxima = 0.0
+        self.retentativas = 0
+
+    def _aguardar_vez(self):
+        with self._lock:
+            espera = self._proxima - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+
+    def _agendar(self, headers):
+        balde = uso_balde(headers)
+        if not balde:
+            return
+        usado, capacidade = balde
+        excesso = usado - self.alvo * capacidade
+        with self._lock:
+            if excesso > 0:
+                # Espera o balde vazar até o alvo antes da próxima chamada
+                self._proxima = max(self._proxima, time.monotonic() + excesso / self.vazao_por_s)
+
+    def _pausar(self, segundos):
+        with self._lock:
+            self._proxima = max(self._proxima, time.monotonic() + segundos)
+
+    def get(self, url, headers=None, params=None, timeout=60, **kwargs):
+        return self.requisitar("GET", url, headers=headers, params=params, timeout=timeout, **kwargs)
+
+    def post(self, url, headers=None, json=None, timeout=60):
+        return self.requisitar("POST", url, headers=headers, json=json, timeout=timeout)
+
+    def requisitar(self, metodo, url, timeout=60, **kwargs):
+        ultimo_erro = None
+        for tentativa in range(self.max_tentativas):
+            self._aguardar_vez()
+            try:
+                r = self.sessao.request(metodo, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                ultimo_erro = ErroHTTP(None, f"{type(e).__name__}: {e}")
+                self.retentativas += 1
+                time.sleep(espera_backoff(tentativa))
+                continue
+
+            self._agendar(r.headers)
+            if r.status_code not in RETENTAVEIS or tentativa == self.max_tentativas - 1:
+                return r
+            ultimo_erro = ErroHTTP(r.status_code, f"HTTP {r.status_code}")
+            self.retentativas += 1
+            self._pausar(espera_backoff(tentativa, r.headers.get("Retry-After")))
+        raise ultimo_erro
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import threading
+import zipfile
+
+# Formatos que já vêm comprimidos: deflate só gasta CPU sem reduzir tamanho
+_JA_COMPRIMIDOS = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".zip", ".gz"}
+
+
+def _compressao(arcname):
+    ext = os.path.splitext(arcname)[1].lower()
+    return zipfile.ZIP_STORED if ext in _JA_COMPRIMIDOS else zipfile.ZIP_DEFLATED
+
+
+class ZipStream:
+    """ZIP montado à medida que cada resultado fica pronto.
+
+    Em memória até `limite_memoria_mb`; acima disso vai para um arquivo temporário.
+    Com `destino`, escreve direto nesse caminho. Como gerenciador de contexto, um ZIP
+    que não chegou a finalizar() é descartado na saída.
+    """
+
+    def __init__(self, destino=None, limite_memoria_mb=64):
+        self.destino = destino
+        if destino:
+            self._buf = open(destino, "w+b")
+        else:
+            self._buf = tempfile.SpooledTemporaryFile(max_size=int(limite_memoria_mb * 1024 * 1024))
+        self._zip = zipfile.ZipFile(self._buf, "w", zipfile.ZIP_DEFLATED)
+        self._lock = threading.Lock()
+        self.nomes = set()
+        self.bytes_escritos = 0
+        self._finalizado = False
+
+    def _nome_livre(self, arcname):
+        arcname = arcname.replace(os.sep, "/").lstrip("/")
+        if arcname not in self.nomes:
+            return arcname
+        base, ext = os.path.splitext(arcname)
+        i = 2
+        while f"{base}_{i}{ext}" in self.nomes:
+            i += 1
+        return f"{base}_{i}{ext}"
+
+    def adicionar(self, arcname, data: bytes):
+        """Acrescenta uma entrada a partir de bytes; devolve o nome usado no ZIP."""
+        with self._lock:
+            arcname = self._nome_livre(arcname)
+            self._zip.writestr(arcname, data, compress_type=_compressao(arcname))
+            self.nomes.add(arcname)
+            self.bytes_escritos += len(data)
+        return arcname
+
+    def adicionar_arquivo(self, caminho, arcname):
+        """Acrescenta uma entrada a partir de um arquivo em disco."""
+        with self._lock:
+            arcname = self._nome_livre(arcname)
+            self._zip.write(caminho, arcname, compress_type=_compressao(arcname))
+            self.nomes.add(arcname)
+            self.bytes_escritos += os.path.getsize(caminho)
+        return arcname
+
+    def __len__(self):
+        return len(self.nomes)
+
+    def finalizar(self):
+        """Fecha o ZIP e devolve um objeto legível aceito pelo st.download_button."""
+        with self._lock:
+            self._zip.close()  # não fecha o _buf, que foi passado já aberto
+            self._finalizado = True
+        self._buf.seek(0)
+        return self._buf
+
+    def close(self):
+        """Descarta um ZIP não finalizado (erro ou cancelamento): libera o temporário e apaga o destino parcial."""
+        with self._lock:
+            if self._finalizado:
+                return
+            self._finalizado = True
+            try:
+                self._zip.close()
+            except Exception:
+                pass
+            self._buf.close()
+        if self.destino:
+            try:
+                os.remove(self.destino)
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,183 @@
+import hashlib
+import importlib.metadata
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+_versoes = {}  # modelo -> versão (só quando o arquivo do modelo já existe)
+
+
+def versao_modelo(modelo: str):
+    """Versão do rembg + tamanho do .onnx: muda quando o rembg ou o arquivo do modelo muda.
+
+    Lida sem importar o rembg (metadados do pacote) e guardada depois que o arquivo existe.
+    """
+    if modelo in _versoes:
+        return _versoes[modelo]
+    try:
+        rembg = importlib.metadata.version("rembg")
+    except importlib.metadata.PackageNotFoundError:
+        rembg = "?"
+    # Mesmo local em que o rembg grava os modelos
+    base = os.environ.get("XDG_DATA_HOME", os.path.expanduser("~"))
+    pasta = os.environ.get("U2NET_HOME", os.path.join(base, ".u2net"))
+    try:
+        tamanho = os.path.getsize(os.path.join(os.path.expanduser(pasta), modelo + ".onnx"))
+    except OSError:
+        return f"rembg {rembg}"
+    _versoes[modelo] = f"rembg {rembg}; {tamanho}"
+    return _versoes[modelo]
+
+
+def chave_resultado(raw: bytes, modelo: str, opcoes=None):
+    """Chave de conteúdo: sha256 da entrada + modelo (e sua versão) + opções de remoção."""
+    h = hashlib.sha256(raw)
+    h.update(b"\0" + modelo.encode("utf-8"))
+    h.update(b"\0" + versao_modelo(modelo).encode("utf-8"))
+    h.update(b"\0" + json.dumps(opcoes or {}, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Cache em duas camadas (memória LRU + disco) para resultados do removedor."""
+
+    def __init__(self, memoria_max_mb=256, disco_dir=None, disco_max_mb=2048):
+        self.memoria_max = int(memoria_max_mb * 1024 * 1024)
+        self.disco_max = int(disco_max_mb * 1024 * 1024)
+        self.disco_dir = disco_dir
+        self._mem = OrderedDict()   # chave -> bytes
+        self._mem_bytes = 0
+        self._disco_bytes = 0
+        self._lock = threading.Lock()
+        self.hits_memoria = 0
+        self.hits_disco = 0
+        self.misses = 0
+        if self.disco_dir:
+            os.makedirs(self.disco_dir, exist_ok=True)
+            # Percorrer até 2 GB de arquivos travaria o import: o total chega em segundo plano
+            threading.Thread(target=self._medir_disco, name="cache-disco", daemon=True).start()
+
+    def _medir_disco(self):
+        # Aproximado se houver puts durante a varredura; _despejar_disco recalcula do zero
+        total = sum(tam for _, tam, _ in self._entradas_disco())
+        with self._lock:
+            self._disco_bytes += total
+
+    # ---------- memória ----------
+    def _mem_put(self, chave, data):
+        if len(data) > self.memoria_max:
+            return
+        antigo = self._mem.pop(chave, None)
+        if antigo is not None:
+            self._mem_bytes -= len(antigo)
+        self._mem[chave] = data
+        self._mem_bytes += len(data)
+        while self._mem_bytes > self.memoria_max and self._mem:
+            _, velho = self._mem.popitem(last=False)
+            self._mem_bytes -= len(velho)
+
+    # ---------- disco ----------
+    def _caminho(self, chave):
+        return os.path.join(self.disco_dir, chave[:2], chave + ".bin")
+
+    def _entradas_disco(self):
+        for root, _, files in os.walk(self.disco_dir):
+            for fn in files:
+                if not fn.endswith(".bin"):
+                    continue
+                fp = os.path.join(root, fn)
+                try:
+                    st_ = os.stat(fp)
+                except FileNotFoundError:
+                    continue
+                yield fp, st_.st_size, st_.st_mtime
+
+    def _disco_get(self, chave):
+        fp = self._caminho(chave)
+        try:
+            with open(fp, "rb") as f:
+                data = f.read()
+            os.utime(fp)  # marca como usado recentemente
+            return data
+        except FileNotFoundError:
+            return None
+
+    def _disco_put(self, chave, data):
+        fp = self._caminho(chave)
+        if os.path.exists(fp):
+            return
+        os.makedirs(os.path.dirname(fp), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(fp), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, fp)
+        with self._lock:
+            self._disco_bytes += len(data)
+            excedeu = self._disco_bytes > self.disco_max
+        if excedeu:
+            self._despejar_disco()
+
+    def _despejar_disco(self):
+        """Remove os arquivos menos usados até voltar a 90% do limite."""
+        entradas = sorted(self._entradas_disco(), key=lambda e: e[2])
+        total = sum(tam for _, tam, _ in entradas)
+        alvo = self.disco_max * 0.9
+        for fp, tam, _ in entradas:
+            if total <= alvo:
+                break
+            try:
+                os.remove(fp)
+                total -= tam
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._disco_bytes = total
+
+    # ---------- API ----------
+    def get(self, chave):
+        with self._lock:
+            data = self._mem.get(chave)
+            if data is not None:
+                self._mem.move_to_end(chave)
+                self.hits_memoria += 1
+                return data
+        data = self._disco_get(chave) if self.disco_dir else None
+        with self._lock:
+            if data is not None:
+                self.hits_disco += 1
+                self._mem_put(chave, data)
+            else:
+                self.misses += 1
+        return data
+
+    def put(self, chave, data: bytes):
+        with self._lock:
+            self._mem_put(chave, data)
+        if self.disco_dir:
+            try:
+                self._disco_put(chave, data)
+            except OSError:
+                pass  # disco cheio/sem permissão: segue só com a memória
+
+    def stats(self):
+        with self._lock:
+            hits = self.hits_memoria + self.hits_disco
+            total = hits + self.misses
+            return {
+                "hits_memoria": self.hits_memoria,
+                "hits_disco": self.hits_disco,
+                "misses": self.misses,
+                "hit_ratio": (hits / total) if total else 0.0,
+                "memoria_mb": round(self._mem_bytes / (1024 * 1024), 1),
+                "disco_mb": round(self._disco_bytes / (1024 * 1024), 1),
+            }
+
+
+# Instância única do processo
+CACHE = ResultCache(
+    memoria_max_mb=int(os.environ.get("REMBG_CACHE_MEMORIA_MB", "256")),
+    disco_dir=os.environ.get("REMBG_CACHE_DIR", os.path.join(tempfile.gettempdir(), "v2labs_rembg_cache")),
+    disco_max_mb=int(os.environ.get("REMBG_CACHE_DISCO_MB", "2048")),
+)
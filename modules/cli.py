@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from modules.arquivo_zip import ZipStream
+from modules.cache_resultados import CACHE
+from modules.conversao import COMPRESSOES, Alvo, converter_lote, parse_alvo
+from modules.exportacao import FORMATOS_CDN, MODOS, WORKERS_TURBO, ErroExportacao, exportar_colecao
+from modules.csv_stream import FORMATOS
+from modules.ingestao import LimiteExcedido, arquivos_locais, contar_imagens, iterar_imagens
+from modules.metricas import Metricas
+from modules.remocao import MODELOS, remover_fundo_lote
+
+# Execução sem navegador das três ferramentas (cron, lotes noturnos, profiling).
+# O progresso sai em stdout como JSON lines: um objeto {"evento": ..., ...} por linha.
+#
+#   python -m modules converter fotos/ -o convertidas.zip --alvo 1080x1920:#ffffff:webp
+#   python -m modules remover fotos.zip -o sem_fundo.zip --modelo u2net --lote 16
+#   python -m modules exportar --loja minha-loja --colecao dunk --modo zip --destino saida/
+#
+# Com --metricas PREFIXO, grava PREFIXO.json (trace por etapa) e PREFIXO.prom (Prometheus).
+
+
+def _emitir(evento, **dados):
+    print(json.dumps({"evento": evento, **dados}, ensure_ascii=False, default=str), flush=True)
+
+
+def _avisar(msg):
+    _emitir("aviso", mensagem=msg)
+
+
+def _metricas(args, dados):
+    """Encerra a coleta, grava os arquivos pedidos em --metricas e anexa o resumo ao evento 'fim'."""
+    args.coletor.encerrar()
+    if args.metricas:
+        pasta, prefixo = os.path.split(os.path.abspath(args.metricas))
+        os.makedirs(pasta, exist_ok=True)
+        dados["trace"], dados["prom"] = args.coletor.salvar(pasta, prefixo)
+    dados["metricas"] = args.coletor.resumo()
+    return dados
+
+
+def _entradas(caminhos):
+    files = arquivos_locais(caminhos)
+    total = contar_imagens(files)
+    if not total:
+        raise LimiteExcedido("Nenhuma imagem encontrada nas entradas informadas.")
+    return files, total
+
+
+def _cmd_converter(args):
+    files, total = _entradas(args.entradas)
+    alvos = [parse_alvo(a) for a in args.alvo] or [Alvo((1080, 1080), None, "png")]
+    inicio, erros = time.perf_counter(), 0
+    with ZipStream(destino=args.saida) as zout:
+        lote = converter_lote(
+            iterar_imagens(files, avisar=_avisar), alvos, zout, rapido=args.qualidade == "rapida",
+            subpastas=len(alvos) > 1, workers=args.workers, janela=args.workers * 2, metricas=args.coletor, previews=0,
+            compressao=args.compressao, processos=args.processos,
+        )
+        for i, (nome, _res, erro) in enumerate(lote, 1):
+            if erro is not None:
+                erros += 1
+                _emitir("erro_item", nome=nome, mensagem=str(erro))
+            _emitir("progresso", etapa="conversao", feitos=i, total=total, nome=nome)
+        zout.finalizar().close()
+    _emitir("fim", **_metricas(args, {
+        "saida": args.saida, "processadas": total - erros, "erros": erros,
+        "segundos": round(time.perf_counter() - inicio, 3),
+    }))
+    return 0
+
+
+def _cmd_remover(args):
+    files, total = _entradas(args.entradas)
+    inicio, erros, hits = time.perf_counter(), 0, 0
+    with ZipStream(destino=args.saida) as zout:
+        lote = remover_fundo_lote(
+            iterar_imagens(files, avisar=_avisar), zout, args.modelo, tamanho_lote=args.lote, workers=args.workers,
+            intra_threads=args.intra_threads, inter_threads=args.inter_threads,
+            cache=None if args.sem_cache else CACHE, modo_mascara=not args.sem_mascara,
+            png_compress_level=args.png_nivel, metricas=args.coletor,
+        )
+        for i, (nome, _raw, _out, erro, hit) in enumerate(lote, 1):
+            if erro is not None:
+                erros += 1
+                _emitir("erro_item", nome=nome, mensagem=str(erro))
+            hits += hit
+            _emitir("progresso", etapa="remocao", feitos=i, total=total, nome=nome, cache_hits=hits)
+        zout.finalizar().close()
+    _emitir("fim", **_metricas(args, {
+        "saida": args.saida, "processadas": total - erros, "erros": erros, "cache_hits": hits,
+        "segundos": round(time.perf_counter() - inicio, 3),
+    }))
+    return 0
+
+
+def _cmd_exportar(args):
+    token = args.token or os.environ.get("SHOPIFY_ACCESS_TOKEN")
+    if not token:
+        raise ErroExportacao("Informe --token ou a variável SHOPIFY_ACCESS_TOKEN.")
+    opcoes_pipeline = None
+    if args.modo == "pipeline":
+        opcoes_pipeline = {
+            "modelo": None if args.modelo == "nenhum" else args.modelo,
+            "alvos": [parse_alvo(a) for a in args.alvo],
+            "workers_download": args.workers_download, "workers_encode": args.workers_encode,
+            "tamanho_fila": args.fila, "cache": CACHE, "compressao": args.compressao,
+        }
+    inicio = time.perf_counter()
+    res = exportar_colecao(
+        args.loja, args.api_version, token, args.colecao, destino=args.destino, modo=args.modo, fonte=args.fonte,
+        formato_csv=args.csv_formato, max_imagens=args.max_imagens, comprimir_csv=args.gzip,
+        turbo=not args.sem_turbo, motor=args.motor, incremental=args.incremental, deduplicar=not args.sem_dedup,
+        largura_cdn=args.largura, formato_cdn=args.formato, opcoes_pipeline=opcoes_pipeline,
+        ao_evento=lambda ev: print(json.dumps(ev, ensure_ascii=False, default=str), flush=True),
+        metricas=args.coletor, workers_download=args.workers_download,
+    )
+    for url, motivo in res.falhas:
+        _emitir("erro_item", nome=url, mensagem=motivo)
+    dados = res._asdict()
+    dados["falhas"] = len(res.falhas)
+    dados["segundos"] = round(time.perf_counter() - inicio, 3)
+    _emitir("fim", **_metricas(args, dados))
+    return 0
+
+
+def _largura(valor):
+    return valor if valor == "Original" else int(valor)
+
+
+def _parser():
+    p = argparse.ArgumentParser(prog="python -m modules", description="V2 LABS AI — ferramentas em lote, sem navegador.")
+    sub = p.add_subparsers(dest="comando", required=True)
+
+    c = sub.add_parser("converter", help="Redimensiona e centraliza imagens (uma decodificação → vários alvos).")
+    c.add_argument("entradas", nargs="+", help="Imagens, ZIPs ou pastas.")
+    c.add_argument("-o", "--saida", required=True, help="ZIP de saída.")
+    c.add_argument("--alvo", action="append", default=[],
+                   help="LxA[:fundo[:formato]], ex.: 1080x1920:#f2f2f2:webp (repetível; padrão 1080x1080 png transparente).")
+    c.add_argument("--qualidade", choices=("rapida", "exata"), default="rapida")
+    c.add_argument("--compressao", choices=tuple(COMPRESSOES), default="equilibrada",
+                   help="Esforço do encoder: rapida, equilibrada ou menor (arquivo).")
+    c.add_argument("--workers", type=int, default=8)
+    c.add_argument("--processos", action="store_true", help="Converte num pool de processos (um por núcleo).")
+    c.set_defaults(fn=_cmd_converter)
+
+    r = sub.add_parser("remover", help="Remove o fundo das imagens (rembg/onnxruntime).")
+    r.add_argument("entradas", nargs="+", help="Imagens, ZIPs ou pastas.")
+    r.add_argument("-o", "--saida", required=True, help="ZIP de saída.")
+    r.add_argument("--modelo", choices=MODELOS, default=MODELOS[0])
+    r.add_argument("--lote", type=int, default=8, help="Imagens por chamada ao modelo.")
+    r.add_argument("--workers", type=int, default=4, help="Threads de pré/pós-processamento.")
+    r.add_argument("--intra-threads", type=int, default=0)
+    r.add_argument("--inter-threads", type=int, default=0)
+    r.add_argument("--sem-mascara", action="store_true", help="Inferência no tamanho original (mais lento).")
+    r.add_argument("--png-nivel", type=int, default=6, choices=range(10), metavar="0-9")
+    r.add_argument("--sem-cache", action="store_true")
+    r.set_defaults(fn=_cmd_remover)
+
+    e = sub.add_parser("exportar", help="Exporta imagens de uma coleção da Shopify (CSV, ZIP ou pipeline).")
+    e.add_argument("--loja", required=True)
+    e.add_argument("--colecao", required=True, help="ID, handle ou URL da coleção.")
+    e.add_argument("--token", help="Access token (ou SHOPIFY_ACCESS_TOKEN).")
+    e.add_argument("--api-version", default="2023-10")
+    e.add_argument("--modo", choices=MODOS, default="csv")
+    e.add_argument("--fonte", choices=("rest", "bulk"), default="rest")
+    e.add_argument("--destino", default=".", help="Pasta onde ficam CSV, ZIP e imagens.")
+    e.add_argument("--csv-formato", choices=FORMATOS, default="largo")
+    e.add_argument("--max-imagens", type=int, default=10)
+    e.add_argument("--gzip", action="store_true")
+    e.add_argument("--sem-turbo", action="store_true")
+    e.add_argument("--motor", choices=("threads", "asyncio"), default="threads")
+    e.add_argument("--incremental", action="store_true")
+    e.add_argument("--sem-dedup", action="store_true")
+    e.add_argument("--largura", type=_largura, default="Original", help="Largura pedida ao CDN.")
+    e.add_argument("--formato", choices=FORMATOS_CDN, default="Original", help="Formato pedido ao CDN.")
+    e.add_argument("--modelo", choices=MODELOS + ("nenhum",), default=MODELOS[0], help="Pipeline: modelo de recorte.")
+    e.add_argument("--alvo", action="append", default=[], help="Pipeline: alvo de conversão (como em 'converter').")
+    e.add_argument("--workers-download", type=int, default=WORKERS_TURBO, help="Downloads simultâneos (threads).")
+    e.add_argument("--workers-encode", type=int, default=4)
+    e.add_argument("--fila", type=int, default=32, help="Pipeline: itens em espera entre etapas.")
+    e.add_argument("--compressao", choices=tuple(COMPRESSOES), default="equilibrada",
+                   help="Pipeline: esforço do encoder (como em 'converter').")
+    e.set_defaults(fn=_cmd_exportar)
+
+    for cmd in (c, r, e):
+        cmd.add_argument("--metricas", metavar="PREFIXO", help="Grava PREFIXO.json (trace) e PREFIXO.prom.")
+    return p
+
+
+def main(argv=None):
+    args = _parser().parse_args(argv)
+    args.coletor = Metricas({"converter": "conversor", "remover": "removedor"}.get(args.comando, "exportador"))
+    try:
+        return args.fn(args)
+    except (ErroExportacao, LimiteExcedido, RuntimeError, ValueError, OSError) as e:
+        _emitir("erro", mensagem=str(e))
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
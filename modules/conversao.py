@@ -0,0 +1,312 @@
+import io
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from PIL import Image
+
+from modules.arquivo_zip import ZipStream
+from modules.ingestao import arquivos_locais, contar_imagens, iterar_imagens, processar_em_fluxo
+from modules.metricas import NULA, Metricas
+from modules.previas import Previas
+from modules.processos import (
+    PROCESSOS, Gravador, compartilhar, descartar, desempacotar, empacotar, ler, liberar, nucleos,
+)
+
+# Núcleo do conversor, sem Streamlit: usado pela página, pelo pipeline e pela CLI.
+
+# Uma variante de saída: tamanho (w, h), cor de fundo (None = transparente) e formato
+Alvo = namedtuple("Alvo", "size bg fmt")
+
+_MIMES = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp"}
+
+# Níveis de compressão: a qualidade visual é a mesma, muda o esforço do encoder.
+# "equilibrada" é o padrão; "menor" liga optimize no PNG (o antigo padrão) e WebP method=6.
+COMPRESSOES = {
+    "rapida": {
+        "png": {"compress_level": 1},
+        "jpg": {"quality": 92},
+        "webp": {"quality": 95, "method": 0},
+    },
+    "equilibrada": {
+        "png": {"compress_level": 6},
+        "jpg": {"quality": 92, "optimize": True},
+        "webp": {"quality": 95, "method": 4},
+    },
+    "menor": {
+        "png": {"optimize": True},
+        "jpg": {"quality": 92, "optimize": True, "progressive": True},
+        "webp": {"quality": 95, "method": 6},
+    },
+}
+ROTULOS_COMPRESSAO = {"rapida": "mais rápida", "equilibrada": "equilibrada", "menor": "menor arquivo"}
+
+
+def _tem_alpha(img: Image.Image):
+    return img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+
+
+def _abrir_imagem(raw: bytes, tamanhos, rapido=False):
+    """Decodifica a imagem uma vez para todos os tamanhos de saída.
+
+    No modo rápido, JPEGs grandes são decodificados em escala reduzida (draft DCT),
+    suficiente para o maior alvo, e imagens opacas ficam em RGB (a conversão para
+    RGBA, quando necessária, acontece só depois do resize).
+    """
+    img = Image.open(io.BytesIO(raw))
+    if not rapido:
+        return img.convert("RGBA")
+
+    if img.format == "JPEG":
+        w, h = img.size
+        scale = max(min(t[0]/w, t[1]/h) for t in tamanhos)
+        if scale < 1:
+            img.draft("RGB", (max(1, int(w*scale)), max(1, int(h*scale))))
+
+    if not _tem_alpha(img):
+        return img.convert("RGB")
+    return img.convert("RGBA")
+
+
+def _resize_and_center(img: Image.Image, target_size, bg_color=None, reducing_gap=None):
+    """Redimensiona e centraliza a imagem, opcionalmente com cor de fundo."""
+    w, h = img.size
+    scale = min(target_size[0]/w, target_size[1]/h)
+    new_w, new_h = max(1, int(w*scale)), max(1, int(h*scale))
+    img = img.resize((new_w, new_h), Image.Resampling.LANCZOS, reducing_gap=reducing_gap)
+
+    # Se bg_color for None → manter transparência
+    if bg_color is None:
+        canvas = Image.new("RGBA", target_size, (0, 0, 0, 0))
+    else:
+        canvas = Image.new("RGB", target_size, bg_color)
+
+    off = ((target_size[0]-new_w)//2, (target_size[1]-new_h)//2)
+    if bg_color is not None and img.mode == "RGB":
+        canvas.paste(img, off)
+        return canvas
+    if img.mode != "RGBA":
+        img = img.convert("RGBA")
+    canvas.paste(img, off, img)
+    return canvas
+
+
+def _encode(img: Image.Image, fmt: str, compressao="equilibrada"):
+    bio = io.BytesIO()
+    opcoes = COMPRESSOES[compressao][fmt]
+    if fmt == "jpg":
+        img.convert("RGB").save(bio, format="JPEG", **opcoes)
+    elif fmt == "png":
+        img.save(bio, format="PNG", **opcoes)
+    else:
+        img.save(bio, format="WEBP", **opcoes)
+    return bio.getvalue()
+
+
+def _preview(img: Image.Image, fmt: str):
+    prev_io = io.BytesIO()
+    pv = img.copy()
+    pv.thumbnail((360, 360))
+    if fmt == "jpg":
+        pv.convert("RGB").save(prev_io, format="JPEG", quality=85)
+    elif fmt == "png":
+        pv.save(prev_io, format="PNG")
+    else:
+        pv.save(prev_io, format="WEBP", quality=90)
+    return prev_io.getvalue(), _MIMES[fmt]
+
+
+def _pasta_alvo(alvo: Alvo):
+    """Subpasta do ZIP para um alvo, ex.: '1080x1920_webp_f2f2f2'."""
+    fundo = "transparente" if alvo.bg is None else "%02x%02x%02x" % alvo.bg
+    return f"{alvo.size[0]}x{alvo.size[1]}_{alvo.fmt}_{fundo}"
+
+
+def hex_para_rgb(valor):
+    valor = (valor or "").strip().lower()
+    if valor in ("", "transparente", "none"):
+        return None
+    valor = valor.strip("#")
+    return tuple(int(valor[i:i+2], 16) for i in (0, 2, 4))
+
+
+def parse_alvo(texto):
+    """'1080x1920:#f2f2f2:webp' -> Alvo (fundo 'transparente' e formato png por padrão)."""
+    partes = texto.split(":")
+    size = tuple(int(v) for v in partes[0].lower().split("x"))
+    bg = hex_para_rgb(partes[1]) if len(partes) > 1 else None
+    fmt = partes[2].lower() if len(partes) > 2 else "png"
+    if len(size) != 2 or fmt not in _MIMES:
+        raise ValueError(f"Alvo inválido: {texto}")
+    return Alvo(size, bg, fmt)
+
+
+def converter_imagem(nome, raw, alvos, rapido=True, subpastas=False, metricas=NULA, com_preview=True,
+                     compressao="equilibrada"):
+    """Decodifica uma vez e gera todas as variantes: ((rel, preview, mime), [(arcname, bytes)]).
+
+    Sem `com_preview`, preview e mime vêm como None.
+    """
+    rel = Path(nome)
+    with metricas.medir("decode", nome):
+        img = _abrir_imagem(raw, [a.size for a in alvos], rapido=rapido)
+    preview, saidas = (None, None), []
+    for alvo in alvos:
+        with metricas.medir("resize", nome):
+            composed = _resize_and_center(img, alvo.size, bg_color=alvo.bg, reducing_gap=3.0 if rapido else None)
+        arc = (Path(_pasta_alvo(alvo)) / rel if subpastas else rel).with_suffix("." + alvo.fmt)
+        with metricas.medir("encode", nome):
+            saidas.append((arc.as_posix(), _encode(composed, alvo.fmt, compressao)))
+        if com_preview and preview[0] is None:
+            with metricas.medir("preview", nome):
+                preview = _preview(composed, alvo.fmt)
+    return (rel.as_posix(), *preview), saidas
+
+
+def _converter_em_processo(nome, entrada, tamanho, alvos, rapido, subpastas, com_preview, compressao, enviado):
+    """Roda no worker: entrada lida do bloco compartilhado (ou recebida em bytes), saídas num bloco novo.
+
+    Nunca levanta exceção: o erro volta como valor, junto com os eventos de métricas.
+    """
+    gravador = Gravador()
+    gravador.registrar("espera_fila", time.perf_counter() - enviado, nome, enviado)
+    try:
+        res, saidas = converter_imagem(nome, ler(entrada, tamanho), alvos, rapido, subpastas, gravador,
+                                       com_preview, compressao)
+        saida, faixas = empacotar([data for _, data in saidas])
+    except Exception as e:
+        return None, e, gravador.eventos
+    return (res, [arc for arc, _ in saidas], saida, faixas), None, gravador.eventos
+
+
+def _lote_em_processos(itens, alvos, rapido, subpastas, janela, metricas, previews, compressao):
+    """Gera (nome, res, saidas, erro) com o trabalho pesado em PROCESSOS.
+
+    Se o consumidor parar antes do fim (cancelamento, erro, close()), os itens em voo
+    são cancelados ou aguardados e todos os blocos compartilhados são liberados.
+    """
+    pendentes = {}  # Future -> (nome do item, SharedMemory de entrada ou None), até o item voltar
+
+    def _soltar(shm):
+        if shm is not None:
+            liberar(shm)
+
+    def _recolher(f):
+        nome, shm = pendentes.pop(f)
+        _soltar(shm)
+        try:
+            pronto, erro, eventos = f.result()
+        except BrokenProcessPool as e:
+            # Worker morto (OOM, crash no decoder): falham só os itens em voo; o pool é recriado no próximo submit
+            return nome, None, None, e
+        for evento in eventos:
+            metricas.registrar(*evento)
+        if erro is not None:
+            return nome, None, None, erro
+        res, arcs, saida, faixas = pronto
+        return nome, res, list(zip(arcs, desempacotar(saida, faixas))), None
+
+    try:
+        for i, (nome, raw) in enumerate(metricas.fluxo(itens)):
+            shm = compartilhar(raw)  # None com o tmpfs cheio: os bytes vão por pickle
+            try:
+                f = PROCESSOS.submit(_converter_em_processo, nome, raw if shm is None else shm.name, len(raw), alvos,
+                                     rapido, subpastas, previews is None or i < previews, compressao,
+                                     time.perf_counter())
+            except BaseException:
+                _soltar(shm)
+                raise
+            pendentes[f] = (nome, shm)
+            if len(pendentes) >= janela:
+                prontos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+                for f in prontos:
+                    yield _recolher(f)
+        while pendentes:
+            prontos, _ = wait(pendentes, return_when=FIRST_COMPLETED)
+            for f in prontos:
+                yield _recolher(f)
+    finally:
+        for f, (_, shm) in pendentes.items():
+            if not f.cancel():
+                try:
+                    pronto, _, _ = f.result()
+                except (BrokenProcessPool, CancelledError):
+                    pronto = None
+                if pronto is not None:
+                    descartar(pronto[2])
+            _soltar(shm)
+
+
+def _lote_em_threads(itens, alvos, rapido, subpastas, workers, janela, metricas, previews, compressao):
+    """Gera (nome, res, saidas, erro) com o trabalho pesado num pool de threads."""
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        def _um(nome, raw, enviado, com_preview):
+            metricas.registrar("espera_fila", time.perf_counter() - enviado, nome, enviado)
+            try:
+                res, saidas = converter_imagem(nome, raw, alvos, rapido, subpastas, metricas, com_preview, compressao)
+            except Exception as e:
+                return nome, None, None, e
+            return nome, res, saidas, None
+
+        itens = ((nome, raw, time.perf_counter(), previews is None or i < previews)
+                 for i, (nome, raw) in enumerate(metricas.fluxo(itens)))
+        for f in processar_em_fluxo(ex, _um, itens, janela=janela):
+            yield f.result()
+
+
+def converter_lote(itens, alvos, zout, rapido=True, subpastas=False, workers=8, janela=16, metricas=NULA,
+                   previews=None, compressao="equilibrada", processos=False):
+    """Converte (nome, raw) em paralelo, gravando cada saída no ZipStream assim que fica pronta.
+
+    Gera (nome, resultado, erro) na ordem de conclusão; resultado é (rel, preview, mime)
+    e fica None quando o item falha.
+    `previews` limita quantos itens (os primeiros enviados) geram preview; None = todos.
+    `compressao` é uma chave de COMPRESSOES. Com `processos`, decode/resize/encode rodam
+    no pool de processos (um por núcleo) e `workers` é ignorado.
+    LimiteExcedido da ingestão é propagado.
+    """
+    if processos:
+        lote = _lote_em_processos(itens, alvos, rapido, subpastas, janela, metricas, previews, compressao)
+    else:
+        lote = _lote_em_threads(itens, alvos, rapido, subpastas, workers, janela, metricas, previews, compressao)
+    for nome, res, saidas, erro in lote:
+        if erro is not None:
+            metricas.item(erro=True)
+            yield nome, None, erro
+            continue
+        with metricas.medir("zip", nome):
+            for arc, data in saidas:
+                zout.adicionar(arc, data)
+        metricas.bytes(saida=sum(len(data) for _, data in saidas))
+        metricas.item()
+        yield nome, res, None
+
+
+def trabalho_conversao(ctx, alvos, rapido=True, subpastas=False, workers=8, max_previews=6, compressao="equilibrada",
+                       processos=False):
+    """Trabalho em segundo plano: converte <pasta>/entrada em <pasta>/resultado.zip."""
+    files = arquivos_locais([os.path.join(ctx.pasta, "entrada")])
+    total = contar_imagens(files)
+    zip_path = os.path.join(ctx.pasta, "resultado.zip")
+    previas = Previas(os.path.join(ctx.pasta, "previews"), max_previews)
+    erros = 0
+    janela = (nucleos() if processos else workers) * 2
+    with ZipStream(destino=zip_path) as zout, Metricas("conversor") as metricas:
+        lote = converter_lote(iterar_imagens(files, avisar=ctx.aviso), alvos, zout, rapido=rapido,
+                              subpastas=subpastas, workers=workers, janela=janela, metricas=metricas,
+                              previews=max_previews, compressao=compressao, processos=processos)
+        for i, (nome, res, erro) in enumerate(lote, 1):
+            ctx.verificar()
+            if erro is not None:
+                erros += 1
+                ctx.aviso(f"Erro ao processar {nome}: {erro}")
+            elif res[1] is not None:
+                previas.adicionar(*res)
+            ctx.progresso(i, total, f"Processado {i}/{total}")
+        zout.finalizar().close()
+    trace, prom = metricas.salvar(ctx.pasta)
+    return {"zip": zip_path, "previews": previas.itens, "erros": erros,
+            "metricas": metricas.resumo(), "trace": trace, "prom": prom}
@@ -1,27 +1,11 @@
 import streamlit as st
-from PIL import Image
-import io, os, shutil, zipfile, base64
-from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
-def _resize_and_center(img: Image.Image, target_size, bg_color=None):
-    """Redimensiona e centraliza a imagem, opcionalmente com cor de fundo."""
-    w, h = img.size
-    scale = min(target_size[0]/w, target_size[1]/h)
-    new_w, new_h = max(1, int(w*scale)), max(1, int(h*scale))
-    img = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-
-    # Se bg_color for None → manter transparência
-    if bg_color is None:
-        canvas = Image.new("RGBA", target_size, (0, 0, 0, 0))
-    else:
-        canvas = Image.new("RGB", target_size, bg_color)
-
-    off = ((target_size[0]-new_w)//2, (target_size[1]-new_h)//2)
-    if img.mode != "RGBA":
-        img = img.convert("RGBA")
-    canvas.paste(img, off, img)
-    return canvas
+
+from modules import painel_metricas, painel_trabalhos, recursos
+from modules.conversao import COMPRESSOES, ROTULOS_COMPRESSAO, Alvo, hex_para_rgb, trabalho_conversao
+from modules.ingestao import contar_imagens
+from modules.processos import nucleos
+
+_CHAVE = "trabalho_conversor"
 
 
 def _play_ping(ping_b64: str):
@@ -30,11 +14,9 @@ def _play_ping(ping_b64: str):
 
 def render(ping_b64: str):
     # ====== Banner ======
-    banner_path = "assets/banner_resize.png"
-    try:
-        with open(banner_path, "rb") as f:
-            b64_banner = base64.b64encode(f.read()).decode("utf-8")
-    except FileNotFoundError:
+    # Reduzido e codificado uma vez por processo
+    banner = recursos.imagem_data_uri("assets/banner_resize.png")
+    if banner is None:
         st.error("❌ Imagem de banner não encontrada em 'assets/banner_resize.png'")
         st.stop()
 
@@ -89,12 +71,16 @@ def render(ping_b64: str):
     <div class="hero-container">
         <div class="hero-title">CONVERSOR DE IMAGEM</div>
         <div class="hero">
-            <img src="data:image/png;base64,{b64_banner}" class="bg" alt="banner">
+            <img src="{banner}" class="bg" alt="banner">
         </div>
     </div>
     """, unsafe_allow_html=True)
 
     # ====== Configurações ======
+    multi = st.toggle(
+        "Vários alvos (uma decodificação → vários tamanhos/formatos)", value=False,
+        help="Cada imagem é lida uma única vez e gera todas as variantes da tabela."
+    )
     col1, col2 = st.columns(2)
     with col1:
         target_label = st.radio("Resolução", ("1080x1080", "1080x1920"), horizontal=True)
@@ -109,101 +95,93 @@ def render(ping_b64: str):
     st.write("---")
     out_format = st.selectbox("Formato de saída", ("png", "jpg", "webp"), index=0)
 
-    # ====== Upload ======
-    files = st.file_uploader("Envie imagens ou ZIP", type=["jpg", "jpeg", "png", "webp", "zip"], accept_multiple_files=True)
-    if not files:
-        st.info("👆 Envie suas imagens acima para começar.")
-        st.stop()
+    alvos = [Alvo(target, bg_rgb, out_format)]
+    if multi:
+        tabela = st.data_editor(
+            [
+                {"Resolução": "1080x1080", "Fundo": "transparente", "Formato": "png"},
+                {"Resolução": "1080x1920", "Fundo": "transparente", "Formato": "png"},
+                {"Resolução": "1080x1080", "Fundo": "#ffffff", "Formato": "webp"},
+                {"Resolução": "1080x1920", "Fundo": "#ffffff", "Formato": "webp"},
+            ],
+            num_rows="dynamic",
+            use_container_width=True,
+            column_config={
+                "Resolução": st.column_config.SelectboxColumn(options=["1080x1080", "1080x1920"], required=True),
+                "Fundo": st.column_config.TextColumn(help="'transparente' ou cor em hex, ex.: #f2f2f2"),
+                "Formato": st.column_config.SelectboxColumn(options=["png", "jpg", "webp"], required=True),
+            },
+        )
+        try:
+            alvos = [
+                Alvo(tuple(int(v) for v in row["Resolução"].split("x")), hex_para_rgb(row["Fundo"]), row["Formato"])
+                for row in tabela if row.get("Resolução") and row.get("Formato")
+            ]
+        except ValueError:
+            st.error("Cor de fundo inválida na tabela de alvos.")
+            st.stop()
+        alvos = list(dict.fromkeys(alvos))
+        if not alvos:
+            st.warning("Adicione ao menos um alvo.")
+            st.stop()
+    qualidade = st.radio(
+        "Qualidade de redimensionamento", ("rápida", "exata"), index=0, horizontal=True,
+        help="Rápida: decodificação reduzida de JPEG e redução em etapas (reducing_gap). Exata: LANCZOS em resolução total."
+    )
+    rapido = qualidade == "rápida"
+    c1, c2 = st.columns(2)
+    compressao = c1.radio(
+        "Compressão", tuple(COMPRESSOES), index=1, horizontal=True, format_func=ROTULOS_COMPRESSAO.get,
+        help="Esforço do encoder: PNG compress_level/optimize, JPEG optimize/progressive, WebP method. A qualidade visual é a mesma."
+    )
+    processos = c2.toggle(
+        f"Usar processos ({nucleos()} núcleos)", value=False,
+        help="Decode, resize e encode em processos separados, fora do GIL. Compensa em lotes grandes com mais de um "
+             "núcleo; os bytes passam por /dev/shm (por pickle quando ele está sem espaço)."
+    )
 
-    INP, OUT = "conv_in", "conv_out"
-    shutil.rmtree(INP, ignore_errors=True)
-    shutil.rmtree(OUT, ignore_errors=True)
-    os.makedirs(INP, exist_ok=True)
-    os.makedirs(OUT, exist_ok=True)
-
-    from zipfile import ZipFile, BadZipFile
-    for f in files:
-        if f.name.lower().endswith(".zip"):
-            try:
-                with ZipFile(io.BytesIO(f.read())) as z:
-                    z.extractall(INP)
-            except BadZipFile:
-                st.error(f"ZIP inválido: {f.name}")
-        else:
-            open(os.path.join(INP, f.name), "wb").write(f.read())
-
-    paths = [p for p in Path(INP).rglob("*") if p.suffix.lower() in (".jpg", ".jpeg", ".png", ".webp")]
-    if not paths:
-        st.warning("Nenhuma imagem encontrada.")
+    # ====== Upload ======
+    # O lote roda em segundo plano: reruns e refresh do navegador não o interrompem
+    if not painel_trabalhos.trabalho_da_sessao(_CHAVE):
+        files = st.file_uploader("Envie imagens ou ZIP", type=["jpg", "jpeg", "png", "webp", "zip"], accept_multiple_files=True)
+        if not files:
+            st.info("👆 Envie suas imagens acima para começar.")
+            st.stop()
+
+        # Imagens lidas direto dos uploads/ZIPs, sob demanda, sem extrair em disco
+        tot = contar_imagens(files)
+        if not tot:
+            st.warning("Nenhuma imagem encontrada.")
+            st.stop()
+
+        if st.button(f"▶️ Converter {tot} imagens", use_container_width=True):
+            arquivo = "convertidas_multi.zip" if multi else f"convertidas_{target_label}.zip"
+            if painel_trabalhos.iniciar_trabalho(
+                _CHAVE, "conversor", files, trabalho_conversao, parametros={"arquivo": arquivo, "total": tot},
+                alvos=alvos, rapido=rapido, subpastas=multi, workers=8, compressao=compressao, processos=processos,
+            ):
+                st.rerun()
         st.stop()
 
     # ====== Processamento ======
-    prog = st.progress(0.0)
-    info = st.empty()
-    results = []
-
-    def worker(p: Path):
-        rel = p.relative_to(INP)
-        raw = open(p, "rb").read()
-        img = Image.open(io.BytesIO(raw)).convert("RGBA")
-        composed = _resize_and_center(img, target, bg_color=bg_rgb)
-        outp = (Path(OUT) / rel).with_suffix("." + out_format.lower())
-        os.makedirs(outp.parent, exist_ok=True)
-
-        bio = io.BytesIO()
-        if out_format.lower() == "jpg":
-            composed.convert("RGB").save(bio, format="JPEG", quality=92, optimize=True)
-        elif out_format.lower() == "png":
-            composed.save(bio, format="PNG", optimize=True)
-        else:
-            composed.save(bio, format="WEBP", quality=95)
-        open(outp, "wb").write(bio.getvalue())
-
-        prev_io = io.BytesIO()
-        pv = composed.copy()
-        pv.thumbnail((360, 360))
-        if out_format.lower() == "jpg":
-            pv.convert("RGB").save(prev_io, format="JPEG", quality=85)
-            mime = "image/jpeg"
-        elif out_format.lower() == "png":
-            pv.save(prev_io, format="PNG")
-            mime = "image/png"
-        else:
-            pv.save(prev_io, format="WEBP", quality=90)
-            mime = "image/webp"
-        return rel.as_posix(), prev_io.getvalue(), mime
-
-    with ThreadPoolExecutor(max_workers=8) as ex:
-        fut = [ex.submit(worker, p) for p in paths]
-        tot = len(fut)
-        for i, f in enumerate(as_completed(fut), 1):
-            try:
-                results.append(f.result())
-            except Exception as e:
-                st.error(f"Erro ao processar: {e}")
-            prog.progress(i / tot)
-            info.info(f"Processado {i}/{tot}")
+    estado = painel_trabalhos.acompanhar(_CHAVE)
+    if estado is None:
+        st.stop()
+    res = estado["resultado"]
 
     st.write("---")
     st.subheader("Pré-visualizações")
     cols = st.columns(3)
-    for idx, (name, data, mime) in enumerate(results[:6]):
+    for idx, (name, caminho, mime) in enumerate(res["previews"]):
         with cols[idx % 3]:
-            st.image(data, caption=name, use_column_width=True)
+            st.image(caminho, caption=name, use_column_width=True)
 
     # ====== ZIP ======
-    zbytes = io.BytesIO()
-    with zipfile.ZipFile(zbytes, "w", zipfile.ZIP_DEFLATED) as z:
-        for root, _, files in os.walk(OUT):
-            for fn in files:
-                fp = os.path.join(root, fn)
-                arc = os.path.relpath(fp, OUT)
-                z.write(fp, arc)
-    zbytes.seek(0)
-
     st.success("✅ Conversão concluída!")
     _play_ping(ping_b64)
-    st.download_button("📦 Baixar imagens convertidas", data=zbytes, file_name=f"convertidas_{target_label}.zip", mime="application/zip")
+    with open(res["zip"], "rb") as zbytes:
+        st.download_button("📦 Baixar imagens convertidas", data=zbytes, file_name=estado["parametros"]["arquivo"], mime="application/zip")
+    painel_metricas.mostrar(res.get("metricas"), res.get("trace"), res.get("prom"))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,72 @@
+import csv
+import gzip
+
+# Formatos do CSV do exportador:
+#   largo: uma linha por produto, colunas fixas Imagem 1..N (+ "Imagens extras")
+#   longo: uma linha por imagem
+FORMATOS = ("largo", "longo")
+
+_COLUNAS_LONGO = ["Produto ID", "Título", "Handle", "Posição", "Imagem ID", "URL", "Atualizada em"]
+
+
+class CsvStream:
+    """Escreve o CSV linha a linha, à medida que os produtos chegam da API.
+
+    Nada da coleção fica acumulado em memória; `descarregar_a_cada` linhas o
+    buffer vai para o disco, então o arquivo parcial já é legível durante a exportação.
+    """
+
+    def __init__(self, caminho, formato="largo", max_imagens=10, comprimir=False, variante=None,
+                 descarregar_a_cada=250):
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato de CSV inválido: {formato}")
+        self.caminho = caminho + ".gz" if comprimir and not caminho.endswith(".gz") else caminho
+        self.formato = formato
+        self.max_imagens = max_imagens
+        self.variante = variante or ""
+        self.descarregar_a_cada = descarregar_a_cada
+        if comprimir:
+            self._f = gzip.open(self.caminho, "wt", encoding="utf-8-sig", newline="")
+        else:
+            self._f = open(self.caminho, "w", encoding="utf-8-sig", newline="")
+        self._w = csv.writer(self._f)
+        self.produtos = 0
+        self.linhas = 0
+        self._w.writerow(self._cabecalho())
+
+    def _cabecalho(self):
+        if self.formato == "longo":
+            return _COLUNAS_LONGO + (["Variante CDN"] if self.variante else [])
+        return (["Título"] + (["Variante CDN"] if self.variante else [])
+                + [f"Imagem {i + 1}" for i in range(self.max_imagens)] + ["Imagens extras"])
+
+    def _linha(self, row):
+        self._w.writerow(row)
+        self.linhas += 1
+        if self.linhas % self.descarregar_a_cada == 0:
+            self._f.flush()
+
+    def escrever_produto(self, produto, urls):
+        """`urls` são as URLs finais (já com a variante do CDN), na ordem de produto['images']."""
+        self.produtos += 1
+        title = produto.get("title", "")
+        if self.formato == "longo":
+            for i, (img, url) in enumerate(zip(produto.get("images", []), urls), 1):
+                row = [produto.get("id", ""), title, produto.get("handle") or "", i,
+                       img.get("id", ""), url, img.get("updated_at") or ""]
+                self._linha(row + ([self.variante] if self.variante else []))
+            return
+        fixas = list(urls[:self.max_imagens]) + [""] * max(0, self.max_imagens - len(urls))
+        extras = " ".join(urls[self.max_imagens:])
+        self._linha([title] + ([self.variante] if self.variante else []) + fixas + [extras])
+
+    def fechar(self):
+        self._f.close()
+        return self.caminho
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if not self._f.closed:
+            self._f.close()
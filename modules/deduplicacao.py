@@ -0,0 +1,84 @@
+import csv
+import hashlib
+import io
+import os
+import shutil
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Catálogos repetem a mesma imagem do CDN (tabela de medidas, banner da marca)
+# em centenas de produtos: baixamos uma vez por URL e guardamos uma vez por conteúdo.
+
+
+def normalizar_url(url):
+    """Forma canônica para comparar URLs: https, host minúsculo, query ordenada, sem fragmento."""
+    url = url.strip()
+    if url.startswith("//"):
+        url = "https:" + url
+    partes = urlsplit(url)
+    esquema = "https" if partes.scheme in ("http", "https") else partes.scheme
+    query = urlencode(sorted(parse_qsl(partes.query, keep_blank_values=True)))
+    return urlunsplit((esquema, partes.netloc.lower(), partes.path, query, ""))
+
+
+def agrupar_por_url(tarefas):
+    """[(url, caminho, ...)] -> (tarefas únicas, {caminho baixado: [caminhos repetidos]})."""
+    unicas, primeiro, repetidas = [], {}, {}
+    for t in tarefas:
+        chave = normalizar_url(t[0])
+        if chave in primeiro:
+            repetidas.setdefault(primeiro[chave], []).append(t[1])
+        else:
+            primeiro[chave] = t[1]
+            unicas.append(t)
+    return unicas, repetidas
+
+
+def sha256_arquivo(caminho, chunk=1024 * 1024):
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(chunk), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def vincular(origem, destino):
+    """Faz `destino` apontar para o mesmo arquivo de `origem` (hard link; cópia se o FS não suportar)."""
+    if os.path.exists(destino) and os.path.samefile(origem, destino):
+        return
+    os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+    tmp = destino + ".link"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(origem, tmp)
+    except OSError:
+        shutil.copy2(origem, tmp)
+    os.replace(tmp, destino)
+
+
+class IndiceConteudo:
+    """Primeiro arquivo visto para cada sha256; os repetidos viram vínculos para ele."""
+
+    def __init__(self):
+        self._por_hash = {}
+        self.vinculos = []   # (caminho repetido, caminho original)
+        self.bytes_poupados = 0
+
+    def registrar(self, caminho, sha256=None):
+        """Devolve o caminho original se o conteúdo já foi visto, senão None."""
+        sha256 = sha256 or sha256_arquivo(caminho)
+        original = self._por_hash.setdefault(sha256, caminho)
+        if original == caminho:
+            return None
+        self.vinculos.append((caminho, original))
+        self.bytes_poupados += os.path.getsize(caminho)
+        return original
+
+    def csv_vinculos(self, relativo=lambda c: c):
+        """Manifesto 'arquivo,original' (UTF-8) para acompanhar o ZIP."""
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        w.writerow(["arquivo", "original"])
+        for caminho, original in self.vinculos:
+            w.writerow([relativo(caminho), relativo(original)])
+        return buf.getvalue().encode("utf-8-sig")
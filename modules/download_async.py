@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import importlib
+import importlib.util
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from modules.agendador import RETENTAVEIS, LimitadorAdaptativoAsync, espera_backoff
+from modules.http_pool import Baixado
+from modules.metricas import NULA
+
+# aiohttp leva ~0,25 s para importar: só carrega quando o motor asyncio é usado
+_HAS_AIOHTTP = importlib.util.find_spec("aiohttp") is not None
+aiohttp = None
+
+CHUNK = 64 * 1024
+
+
+class Progresso:
+    """Estado compartilhado de um lote de downloads."""
+
+    def __init__(self, total, metricas=NULA):
+        self.total = total
+        self.metricas = metricas
+        self.concluidos = 0
+        self.bytes = 0
+        self.ok = []       # Baixado
+        self.falhas = []   # (url, motivo)
+        self.inicio = time.perf_counter()
+
+    @property
+    def segundos(self):
+        return time.perf_counter() - self.inicio
+
+    @property
+    def bytes_por_s(self):
+        return self.bytes / max(self.segundos, 1e-6)
+
+
+async def _tentar(sessao, limitador, sem_host, url, caminho, prog, timeout, headers):
+    """Uma tentativa: devolve (Baixado, None), (None, motivo_final) ou (None, (motivo, retry_after))."""
+    t0 = time.perf_counter()
+    async with limitador, sem_host:
+        t1 = time.perf_counter()
+        prog.metricas.registrar("espera_fila", t1 - t0, url, t0)
+        with prog.metricas.medir("download", url):
+            return await _get(sessao, url, caminho, prog, timeout, headers)
+
+
+async def _get(sessao, url, caminho, prog, timeout, headers):
+    async with sessao.get(url, timeout=aiohttp.ClientTimeout(total=timeout), headers=headers) as r:
+        if r.status == 304:
+            return Baixado(url, caminho, 304, r.headers.get("ETag"), None), None
+        if r.status in RETENTAVEIS:
+            return None, (f"HTTP {r.status}", r.headers.get("Retry-After"))
+        if r.status != 200:
+            return None, f"HTTP {r.status}"
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        tmp = caminho + ".part"
+        h = hashlib.sha256()
+        try:
+            with open(tmp, "wb") as f:
+                async for chunk in r.content.iter_chunked(CHUNK):
+                    f.write(chunk)
+                    h.update(chunk)
+                    prog.bytes += len(chunk)
+            os.replace(tmp, caminho)
+        except BaseException:
+            # Erro, timeout ou cancelamento: não deixa .part na pasta (no incremental ela persiste)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        return Baixado(url, caminho, 200, r.headers.get("ETag"), h.hexdigest()), None
+
+
+async def _baixar(sessao, limitador, sem_host, url, caminho, prog, timeout, max_tentativas, headers=None):
+    motivo = None
+    try:
+        for tentativa in range(max_tentativas):
+            try:
+                ok, erro = await _tentar(sessao, limitador, sem_host, url, caminho, prog, timeout, headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                ok, erro = None, (type(e).__name__, None)
+            if ok:
+                await limitador.sucesso()
+                prog.ok.append(ok)
+                return ok
+            if isinstance(erro, str):
+                motivo = erro
+                break
+            # 429/5xx/conexão: reduz a concorrência e tenta de novo após o backoff
+            motivo = f"{erro[0]} após {tentativa + 1} tentativa(s)"
+            limitador.congestionado()
+            await asyncio.sleep(espera_backoff(tentativa, erro[1]))
+        prog.falhas.append((url, motivo))
+        return None
+    except Exception as e:
+        prog.falhas.append((url, f"{type(e).__name__}: {e}" if str(e) else type(e).__name__))
+        return None
+    finally:
+        prog.concluidos += 1
+
+
+def _concluir(ao_concluir, baixado, prog):
+    """Roda ao_concluir na thread de escrita; uma falha ali vale só para esta URL."""
+    try:
+        ao_concluir(baixado)
+    except Exception as e:
+        prog.ok.remove(baixado)
+        prog.falhas.append((baixado.url, str(e) or type(e).__name__))
+
+
+async def _baixar_todos(tarefas, concorrencia, por_host, timeout, ao_progredir, ao_concluir, intervalo, max_tentativas,
+                        metricas):
+    prog = Progresso(len(tarefas), metricas)
+    # Começa em 1/4 do teto e sobe enquanto o CDN responde bem
+    limitador = LimitadorAdaptativoAsync(inicial=max(1, concorrencia // 4), maximo=concorrencia)
+    sems_host = {}
+    conector = aiohttp.TCPConnector(limit=concorrencia, limit_per_host=por_host, ttl_dns_cache=300)
+    loop = asyncio.get_running_loop()
+    # Uma thread só: ao_concluir continua serializado e na ordem de conclusão
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="download-escrita") as escritor:
+        async with aiohttp.ClientSession(connector=conector) as sessao:
+            futs = []
+            for url, caminho, *resto in tarefas:
+                host = urlsplit(url).netloc
+                sem_host = sems_host.setdefault(host, asyncio.Semaphore(por_host))
+                # Terceiro elemento opcional: ETag conhecido -> GET condicional
+                headers = {"If-None-Match": resto[0]} if resto and resto[0] else None
+                futs.append(asyncio.ensure_future(
+                    _baixar(sessao, limitador, sem_host, url, caminho, prog, timeout, max_tentativas, headers)
+                ))
+
+            ultimo, escritas = 0.0, []
+            for fut in asyncio.as_completed(futs):
+                baixado = await fut
+                if baixado and ao_concluir:
+                    # sha256, hard links e ZIP fora do loop: não seguram os downloads em voo
+                    escritas.append(loop.run_in_executor(escritor, _concluir, ao_concluir, baixado, prog))
+                agora = time.perf_counter()
+                if ao_progredir and (agora - ultimo >= intervalo or prog.concluidos == prog.total):
+                    ao_progredir(prog)
+                    ultimo = agora
+            await asyncio.gather(*escritas)
+    return prog
+
+
+def baixar_todos(tarefas, concorrencia=256, por_host=64, timeout=30, ao_progredir=None, ao_concluir=None,
+                 intervalo=0.25, max_tentativas=5, metricas=NULA):
+    """Baixa [(url, caminho[, etag])] com asyncio/aiohttp, gravando em blocos.
+
+    ao_progredir(Progresso) é chamado na thread de quem chamou, no máximo a cada
+    `intervalo` segundos; ao_concluir(Baixado) a cada arquivo salvo ou confirmado (304),
+    numa thread de escrita própria (um por vez, fora do event loop). Se ao_concluir
+    levantar exceção, o item sai de `ok` e vai para `falhas`, como um download falho.
+    """
+    global aiohttp
+    if not _HAS_AIOHTTP:
+        raise RuntimeError("Biblioteca 'aiohttp' não encontrada. Instale com: pip install aiohttp")
+    if aiohttp is None:
+        aiohttp = importlib.import_module("aiohttp")
+    return asyncio.run(_baixar_todos(tarefas, concorrencia, por_host, timeout, ao_progredir, ao_concluir,
+                                     intervalo, max_tentativas, metricas))
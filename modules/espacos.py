@@ -0,0 +1,226 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from modules.ingestao import LIMITE_TOTAL_MB
+
+# Espaços de trabalho isolados: cada sessão/trabalho escreve só na sua pasta.
+# Quando /dev/shm (tmpfs) tem folga, os arquivos ficam em RAM; senão, no disco.
+# Pastas sem atividade há mais que o TTL da categoria são apagadas em segundo plano.
+
+_MARCADOR = ".ultimo_uso"
+
+# Categorias que precisam sobreviver a reinícios ficam sempre no disco
+PERSISTENTES = {"sincronizacao"}
+
+
+class CotaExcedida(Exception):
+    pass
+
+
+def cota_padrao_mb():
+    """Cabe um lote no limite da ingestão (entrada) mais um resultado do mesmo porte, com folga."""
+    return 2 * LIMITE_TOTAL_MB + 1024
+
+
+def _slug(texto):
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", texto).strip("._")[:120] or "espaco"
+
+
+def _uso(pasta):
+    total = 0
+    for raiz, _, nomes in os.walk(pasta):
+        for nome in nomes:
+            try:
+                total += os.lstat(os.path.join(raiz, nome)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _ultima_atividade(pasta):
+    """Maior mtime entre a pasta, o marcador e o estado.json dos trabalhos."""
+    tempos = []
+    for caminho in (pasta, os.path.join(pasta, _MARCADOR), os.path.join(pasta, "estado.json")):
+        try:
+            tempos.append(os.stat(caminho).st_mtime)
+        except OSError:
+            pass
+    return max(tempos) if tempos else 0
+
+
+class Espaco:
+    """Pasta privada com cota em bytes."""
+
+    def __init__(self, caminho, cota_bytes):
+        self.caminho = caminho
+        self.cota_bytes = cota_bytes
+        self._conferido_em = 0.0
+
+    def garantir(self):
+        """Recria a pasta se a limpeza por TTL a removeu e renova o último uso."""
+        os.makedirs(self.caminho, exist_ok=True)
+        self.tocar()
+        return self.caminho
+
+    def tocar(self):
+        with open(os.path.join(self.caminho, _MARCADOR), "w"):
+            pass
+
+    def uso(self):
+        return _uso(self.caminho)
+
+    def reservar(self, n_bytes):
+        """Levanta CotaExcedida se `n_bytes` a mais não cabem na cota."""
+        usado = self.uso()
+        if usado + n_bytes > self.cota_bytes:
+            raise CotaExcedida(
+                f"Espaço insuficiente: {(usado + n_bytes) / 2**20:.0f} MB excedem a cota de "
+                f"{self.cota_bytes / 2**20:.0f} MB"
+            )
+
+    def conferir(self, intervalo=1.0):
+        """Levanta CotaExcedida se o que já está na pasta (entradas e saídas) passou da cota.
+
+        Para chamar durante a escrita dos resultados; mede no máximo a cada `intervalo` s.
+        """
+        agora = time.monotonic()
+        if agora - self._conferido_em < intervalo:
+            return
+        self._conferido_em = agora
+        self.reservar(0)
+
+    def esvaziar(self):
+        """Apaga o conteúdo (mantém a pasta)."""
+        for nome in os.listdir(self.caminho):
+            caminho = os.path.join(self.caminho, nome)
+            if os.path.isdir(caminho) and not os.path.islink(caminho):
+                shutil.rmtree(caminho, ignore_errors=True)
+            else:
+                os.remove(caminho)
+        self.tocar()
+
+
+class GerenciadorEspacos:
+    """Cria espaços por categoria ('sessoes', 'trabalhos', ...) e apaga os expirados."""
+
+    def __init__(self, raiz_ram="/dev/shm", raiz_disco=None, ram_min_livre_mb=1024, cota_mb=None, ram_previsto_mb=2048,
+                 ttl_h=6, ttl_persistente_h=168, intervalo_limpeza_s=600):
+        self.raiz_disco = os.path.join(raiz_disco or tempfile.gettempdir(), "v2labs_espacos")
+        self.raiz_ram = os.path.join(raiz_ram, "v2labs_espacos") if raiz_ram and self._gravavel(raiz_ram) else None
+        self.ram_min_livre = ram_min_livre_mb * 2**20
+        self.cota_bytes = (cota_mb or cota_padrao_mb()) * 2**20
+        self.ram_previsto = ram_previsto_mb * 2**20
+        self.ttl_s = ttl_h * 3600
+        self.ttl_persistente_s = ttl_persistente_h * 3600
+        self.intervalo_limpeza_s = intervalo_limpeza_s
+        self._lock = threading.Lock()
+        self._limpeza = None
+
+    @staticmethod
+    def _gravavel(pasta):
+        return os.path.isdir(pasta) and os.access(pasta, os.W_OK | os.X_OK)
+
+    def _ram_disponivel(self, previsto=None):
+        """Se `previsto` bytes (ou, sem estimativa, ram_previsto) cabem no tmpfs além da folga mínima."""
+        if not self.raiz_ram:
+            return False
+        previsto = self.ram_previsto if previsto is None else previsto
+        try:
+            return shutil.disk_usage(os.path.dirname(self.raiz_ram)).free >= self.ram_min_livre + previsto
+        except OSError:
+            return False
+
+    def pasta(self, categoria):
+        """Pasta lógica da categoria (em RAM quando há tmpfs, exceto nas persistentes)."""
+        raiz = self.raiz_disco if categoria in PERSISTENTES or not self.raiz_ram else self.raiz_ram
+        caminho = os.path.join(raiz, categoria)
+        os.makedirs(caminho, exist_ok=True)
+        return caminho
+
+    def criar(self, categoria, nome=None, cota_mb=None, previsto=None):
+        """Novo espaço (ou o existente com o mesmo nome) em <pasta da categoria>/<nome>.
+
+        Se a categoria mora em RAM mas o tmpfs não tem folga para `previsto` bytes
+        (estimativa do que o espaço vai guardar), os dados vão para o disco e o
+        caminho lógico vira um link simbólico para lá.
+        """
+        self._agendar_limpeza()
+        nome = _slug(nome) if nome else uuid.uuid4().hex[:12]
+        caminho = os.path.join(self.pasta(categoria), nome)
+        cota = cota_mb * 2**20 if cota_mb else self.cota_bytes
+        with self._lock:
+            if not os.path.lexists(caminho):
+                em_ram = caminho.startswith(self.raiz_ram or "\0")
+                if em_ram and not self._ram_disponivel(previsto):
+                    real = os.path.join(self.raiz_disco, categoria, nome)
+                    os.makedirs(real, exist_ok=True)
+                    os.symlink(real, caminho)
+                else:
+                    os.makedirs(caminho, exist_ok=True)
+        espaco = Espaco(caminho, cota)
+        espaco.garantir()
+        return espaco
+
+    def remover(self, caminho):
+        real = os.path.realpath(caminho)
+        if os.path.islink(caminho):
+            os.remove(caminho)
+        shutil.rmtree(real, ignore_errors=True)
+
+    def limpar_expirados(self):
+        """Apaga espaços sem atividade há mais que o TTL; devolve quantos foram removidos."""
+        agora, removidos = time.time(), 0
+        for raiz in filter(None, (self.raiz_ram, self.raiz_disco)):
+            if not os.path.isdir(raiz):
+                continue
+            for categoria in os.listdir(raiz):
+                ttl = self.ttl_persistente_s if categoria in PERSISTENTES else self.ttl_s
+                pasta_cat = os.path.join(raiz, categoria)
+                for nome in os.listdir(pasta_cat):
+                    caminho = os.path.join(pasta_cat, nome)
+                    if agora - _ultima_atividade(caminho) > ttl:
+                        self.remover(caminho)
+                        removidos += 1
+        return removidos
+
+    def _agendar_limpeza(self):
+        """Thread daemon que roda limpar_expirados() a cada intervalo (uma por processo)."""
+        with self._lock:
+            if self._limpeza is not None:
+                return
+
+            def _loop():
+                while True:
+                    try:
+                        self.limpar_expirados()
+                    except OSError:
+                        pass
+                    time.sleep(self.intervalo_limpeza_s)
+
+            self._limpeza = threading.Thread(target=_loop, name="limpeza-espacos", daemon=True)
+            self._limpeza.start()
+
+    def stats(self):
+        return {
+            "em_ram": bool(self.raiz_ram) and self._ram_disponivel(),
+            "raiz": self.raiz_ram or self.raiz_disco,
+            "cota_mb": self.cota_bytes // 2**20,
+            "ttl_h": self.ttl_s / 3600,
+        }
+
+
+# Um gerenciador por processo, configurável por ambiente
+ESPACOS = GerenciadorEspacos(
+    raiz_ram=os.environ.get("ESPACOS_RAM_DIR", "/dev/shm"),
+    raiz_disco=os.environ.get("ESPACOS_DISCO_DIR") or None,
+    ram_min_livre_mb=int(os.environ.get("ESPACOS_RAM_MIN_LIVRE_MB", "1024")),
+    cota_mb=int(os.environ.get("ESPACOS_COTA_MB", "0")) or None,
+    ram_previsto_mb=int(os.environ.get("ESPACOS_RAM_PREVISTO_MB", "2048")),
+    ttl_h=float(os.environ.get("ESPACOS_TTL_H", "6")),
+    ttl_persistente_h=float(os.environ.get("ESPACOS_TTL_PERSISTENTE_H", "168")),
+)
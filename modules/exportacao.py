@@ -0,0 +1,414 @@
+import concurrent.futures
+import contextlib
+import os
+import re
+import shutil
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+from modules import download_async, pipeline
+from modules.agendador import RETENTAVEIS, AgendadorShopify, ErroHTTP, LimitadorAdaptativo, espera_backoff
+from modules.arquivo_zip import ZipStream
+from modules.csv_stream import CsvStream
+from modules.deduplicacao import IndiceConteudo, agrupar_por_url, vincular
+from modules.http_pool import Baixado, baixar_para_arquivo, obter_sessao
+from modules.manifesto import Manifesto
+from modules.metricas import NULA
+from modules.shopify_bulk import ErroBulk, ShopifyBulk, gid_para_id
+
+# Núcleo do exportador Shopify, sem Streamlit: usado pela página e pela CLI.
+
+# Downloads simultâneos no modo Turbo (também define o tamanho do pool HTTP)
+WORKERS_TURBO = 16
+MAX_TENTATIVAS = 5
+
+# Variantes pedidas ao CDN da Shopify (parâmetros width/format na URL da imagem)
+LARGURAS_CDN = ["Original", 2048, 1600, 1080, 720]
+FORMATOS_CDN = ["Original", "jpg", "pjpg", "webp"]
+
+MODOS = ("csv", "zip", "pipeline")
+
+# Chamadas à Admin API passam pelo agendador (leaky bucket + retry em 429/5xx). O balde
+# é de cada loja: um agendador por host, para que o limite de uma não atrase as outras.
+_agendadores = {}   # "https://loja.myshopify.com" -> AgendadorShopify
+_lock_agendadores = threading.Lock()
+
+
+def _agendador(url):
+    """Agendador da loja dona de `url` (criado no primeiro uso)."""
+    partes = urlsplit(url)
+    host = f"{partes.scheme}://{partes.netloc}"
+    with _lock_agendadores:
+        api = _agendadores.get(host)
+        if api is None:
+            api = _agendadores[host] = AgendadorShopify(obter_sessao(WORKERS_TURBO))
+        return api
+
+ResultadoExportacao = namedtuple("ResultadoExportacao", "colecao_id produtos imagens csv zip falhas")
+
+
+class ErroExportacao(Exception):
+    pass
+
+
+def _shopify_request(url, token, params=None):
+    headers = {
+        "X-Shopify-Access-Token": token,
+        "Content-Type": "application/json",
+    }
+    try:
+        r = _agendador(url).get(url, headers=headers, params=params, timeout=60)
+    except ErroHTTP as e:
+        raise ErroExportacao(f"Erro de conexão com a Shopify: {e}")
+    if r.status_code != 200:
+        try:
+            detalhe = r.json()
+        except ValueError:
+            detalhe = r.text[:300]
+        raise ErroExportacao(f"Erro {r.status_code}: {detalhe}")
+    return r
+
+
+def _base_url(shop_name):
+    # SHOPIFY_API_BASE permite apontar para um servidor local de testes
+    return os.environ.get("SHOPIFY_API_BASE") or f"https://{shop_name}.myshopify.com"
+
+
+def _handle_da_entrada(collection_input):
+    """ID numérico, handle ou URL da coleção -> ID ou handle."""
+    if collection_input.isdigit():
+        return collection_input
+    if collection_input.startswith("http"):
+        m = re.search(r"/collections/([^/?#]+)", collection_input)
+        if not m:
+            raise ErroExportacao("URL de coleção inválida.")
+        return m.group(1)
+    return collection_input
+
+
+def _get_collection_id(shop_name, api_version, collection_input, token):
+    handle = _handle_da_entrada(collection_input)
+    # Se for ID direto
+    if handle.isdigit():
+        return handle
+
+    # Buscar coleção pelo handle (manual ou automática)
+    for tipo in ("custom_collections", "smart_collections"):
+        url = f"{_base_url(shop_name)}/admin/api/{api_version}/{tipo}.json"
+        r = _shopify_request(url, token, params={"handle": handle})
+        items = r.json().get(tipo, [])
+        if items:
+            return str(items[0]["id"])
+    raise ErroExportacao("Coleção não encontrada pelo handle informado.")
+
+
+def _get_products_in_collection(shop_name, api_version, collection_id, token):
+    """Gera os produtos da coleção, uma página da REST API por vez."""
+    url = f"{_base_url(shop_name)}/admin/api/{api_version}/products.json"
+    params = {"collection_id": collection_id, "limit": 250}
+    while True:
+        r = _shopify_request(url, token, params=params)
+        yield from r.json().get("products", [])
+        link = r.headers.get("link", "")
+        if link and 'rel="next"' in link:
+            try:
+                page_info = link.split("page_info=")[-1].split(">")[0]
+            except Exception:
+                break
+            # Com page_info a API só aceita limit (os demais filtros vêm no cursor)
+            params = {"limit": 250, "page_info": page_info}
+        else:
+            break
+
+
+def _baixar_imagem(url, caminho, limitador=None, etag=None, workers=WORKERS_TURBO):
+    """Baixa uma imagem e devolve um Baixado; levanta exceção com o motivo em caso de falha.
+
+    429/5xx e erros de conexão são repetidos com backoff; o limitador adaptativo
+    reduz a concorrência quando o CDN começa a recusar. Com `etag`, o GET é
+    condicional e um 304 mantém o arquivo local.
+    """
+    limitador = limitador or LimitadorAdaptativo(inicial=1, maximo=1)
+    headers = {"If-None-Match": etag} if etag else None
+    for tentativa in range(MAX_TENTATIVAS):
+        try:
+            with limitador:
+                r = baixar_para_arquivo(obter_sessao(workers), url, caminho, timeout=20, headers=headers)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            motivo, retry_after = f"{type(e).__name__}", None
+        else:
+            if r.status_code in (200, 304):
+                limitador.sucesso()
+                return Baixado(url, caminho, r.status_code, r.headers.get("ETag"), getattr(r, "sha256", None))
+            if r.status_code not in RETENTAVEIS:
+                raise RuntimeError(f"HTTP {r.status_code}")
+            motivo, retry_after = f"HTTP {r.status_code}", r.headers.get("Retry-After")
+        limitador.congestionado()
+        time.sleep(espera_backoff(tentativa, retry_after))
+    raise RuntimeError(f"{motivo} após {MAX_TENTATIVAS} tentativas")
+
+
+def _parametros_variante(largura, formato):
+    """Parâmetros do CDN para a variante escolhida ({} = original)."""
+    params = {}
+    if largura != "Original":
+        params["width"] = str(largura)
+    if formato != "Original":
+        params["format"] = formato
+    return params
+
+
+def _url_variante(src, params):
+    """Acrescenta/substitui width e format na URL do CDN, preservando ?v=."""
+    if not params:
+        return src
+    partes = urlsplit(src)
+    query = [(k, v) for k, v in parse_qsl(partes.query, keep_blank_values=True) if k not in params]
+    return urlunsplit(partes._replace(query=urlencode(query + list(params.items()))))
+
+
+def _pasta_produto(title):
+    return re.sub(r'[\\/*?:\"<>|]', "_", title)
+
+
+def _emitir(ao_evento, evento, **dados):
+    if ao_evento:
+        ao_evento({"evento": evento, **dados})
+
+
+def _produtos(shop_name, api_version, token, colecao, fonte, ao_evento):
+    """Resolve a coleção e devolve (collection_id, gerador de produtos) pela fonte escolhida."""
+    if fonte == "bulk":
+        base = _base_url(shop_name)
+        bulk = ShopifyBulk(_agendador(base), base, api_version, token)
+        try:
+            gid = bulk.resolver_colecao(_handle_da_entrada(colecao))
+            bulk.iniciar(gid)
+            url_jsonl = bulk.aguardar(ao_progredir=lambda op: _emitir(
+                ao_evento, "bulk", status=op["status"], objetos=int(op.get("objectCount") or 0),
+                mensagem=f"Bulk operation: {op['status']} · {op.get('objectCount') or 0} objetos",
+            ))
+        except ErroBulk as e:
+            raise ErroExportacao(str(e))
+        return str(gid_para_id(gid)), bulk.iterar_produtos(url_jsonl)
+    collection_id = _get_collection_id(shop_name, api_version, colecao, token)
+    return collection_id, _get_products_in_collection(shop_name, api_version, collection_id, token)
+
+
+def _executar_pipeline(tarefas, opcoes, zip_path, ao_evento, metricas=NULA):
+    """Modo pipeline: download → remoção de fundo → conversão, tudo em memória."""
+    try:
+        pipe = pipeline.Pipeline(**(opcoes or {}), metricas=metricas)
+    except RuntimeError as e:
+        raise ErroExportacao(str(e))
+    _emitir(ao_evento, "inicio", etapa="pipeline", total=len(tarefas),
+            mensagem=f"Processando {len(tarefas)} imagens no pipeline...")
+    with ZipStream(destino=zip_path) as zout, contextlib.closing(pipe.executar(tarefas)) as fluxo:
+        for i, (nome, saidas) in enumerate(fluxo, 1):
+            with metricas.medir("zip", nome):
+                for arc, data in saidas:
+                    zout.adicionar(arc, data)
+            metricas.item()
+            c = pipe.concluidos
+            _emitir(ao_evento, "progresso", etapa="pipeline", feitos=i, total=len(tarefas), **c,
+                    mensagem=f"Baixadas {c['download']} · sem fundo {c['remocao']} · convertidas {c['conversao']}"
+                             f" / {len(tarefas)}")
+        zout.finalizar().close()
+    for _ in pipe.falhas:
+        metricas.item(erro=True)
+    return [(nome, f"{etapa}: {motivo}") for nome, etapa, motivo in pipe.falhas]
+
+
+def _executar_downloads(tarefas, meta, pasta, zip_path, chave_colecao, turbo, motor, incremental, deduplicar,
+                        ao_evento, metricas=NULA, workers=WORKERS_TURBO):
+    """Modo ZIP: baixa para `pasta` (incremental/deduplicado) e monta o ZIP por produto."""
+    _emitir(ao_evento, "inicio", etapa="download", total=len(tarefas), mensagem=f"Baixando {len(tarefas)} imagens...")
+    # Cada imagem entra no ZIP assim que o download termina
+    with ZipStream(destino=zip_path) as zout:
+
+        def _arc(caminho):
+            return os.path.relpath(caminho, pasta)
+
+        indice = IndiceConteudo() if deduplicar else None
+
+        def _no_zip(caminho, sha=None):
+            """Conteúdo inédito entra no ZIP; repetido vira hard link no disco e linha em _duplicadas.csv."""
+            original = indice.registrar(caminho, sha) if indice else None
+            with metricas.medir("zip", caminho):
+                if original:
+                    vincular(original, caminho)
+                else:
+                    zout.adicionar_arquivo(caminho, _arc(caminho))
+
+        manifesto = None
+        if incremental:
+            manifesto = Manifesto(os.path.join(pasta, ".manifesto.sqlite"))
+            pendentes, reusadas, condicionais = [], 0, 0
+            for url, caminho in tarefas:
+                imagem_id, _, updated_at, src = meta[caminho]
+                acao, etag = manifesto.decidir(chave_colecao, imagem_id, updated_at, src, caminho)
+                if acao == "reusar":
+                    _no_zip(caminho, (manifesto.obter(chave_colecao, imagem_id) or {}).get("sha256"))
+                    reusadas += 1
+                else:
+                    condicionais += acao == "condicional"
+                    pendentes.append((url, caminho, etag))
+            _emitir(ao_evento, "info", reusadas=reusadas, condicionais=condicionais,
+                    mensagem=f"♻️ {reusadas} imagens reaproveitadas · {condicionais} a confirmar · "
+                             f"{len(pendentes) - condicionais} novas/alteradas")
+            tarefas = pendentes
+
+        # Mesma URL em vários produtos: baixa uma vez e replica o arquivo depois
+        repetidas = {}
+        if deduplicar:
+            total_antes = len(tarefas)
+            tarefas, repetidas = agrupar_por_url(tarefas)
+            if total_antes > len(tarefas):
+                _emitir(ao_evento, "info", evitados=total_antes - len(tarefas),
+                        mensagem=f"🔁 {total_antes - len(tarefas)} downloads evitados (URLs repetidas)")
+
+        def _anexar(b):
+            for caminho in [b.caminho] + repetidas.get(b.caminho, []):
+                if caminho != b.caminho:
+                    vincular(b.caminho, caminho)
+                sha = b.sha256
+                if manifesto is not None:
+                    imagem_id, produto_id, updated_at, src = meta[caminho]
+                    anterior = manifesto.obter(chave_colecao, imagem_id) or {}
+                    sha = sha or anterior.get("sha256")
+                    manifesto.registrar(
+                        chave_colecao, imagem_id, produto_id, updated_at, src,
+                        b.etag or anterior.get("etag"), sha, caminho,
+                    )
+                _no_zip(caminho, sha)
+
+        def _atualizar(feitos, total, mb_s):
+            _emitir(ao_evento, "progresso", etapa="download", feitos=feitos, total=total, mb_s=round(mb_s, 3),
+                    mensagem=f"Baixadas {feitos}/{total} · {mb_s:.1f} MB/s")
+
+        if turbo and motor == "asyncio":
+            res = download_async.baixar_todos(
+                tarefas, ao_concluir=_anexar, metricas=metricas,
+                ao_progredir=lambda p: _atualizar(p.concluidos, p.total, p.bytes_por_s / 1e6),
+            )
+            metricas.bytes(entrada=res.bytes)
+            falhas = res.falhas
+            for _ in res.ok:
+                metricas.item()
+            for _ in falhas:
+                metricas.item(erro=True)
+        else:
+            falhas = []
+            inicio = time.perf_counter()
+
+            def _baixar_medido(url, caminho, limitador, *resto, enviado=None):
+                if enviado is not None:
+                    metricas.registrar("espera_fila", time.perf_counter() - enviado, url, enviado)
+                with metricas.medir("download", url):
+                    b = _baixar_imagem(url, caminho, limitador, *resto, workers=workers)
+                if b.status == 200:
+                    metricas.bytes(entrada=os.path.getsize(caminho))
+                return b
+
+            def _registrar(i, url, fut_ou_fn):
+                try:
+                    _anexar(fut_ou_fn())
+                except Exception as e:
+                    falhas.append((url, str(e) or type(e).__name__))
+                    metricas.item(erro=True)
+                else:
+                    metricas.item()
+                mb = zout.bytes_escritos / 1e6
+                _atualizar(i, len(tarefas), mb / max(time.perf_counter() - inicio, 1e-6))
+
+            if turbo:
+                limitador = LimitadorAdaptativo(inicial=workers, maximo=workers)
+                with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
+                    futs = {ex.submit(_baixar_medido, t[0], t[1], limitador, *t[2:], enviado=time.perf_counter()): t[0]
+                            for t in tarefas}
+                    for i, fut in enumerate(concurrent.futures.as_completed(futs), 1):
+                        _registrar(i, futs[fut], fut.result)
+            else:
+                for i, t in enumerate(tarefas, 1):
+                    _registrar(i, t[0], lambda: _baixar_medido(t[0], t[1], None, *t[2:]))
+
+        if manifesto is not None:
+            manifesto.fechar()
+        if indice and indice.vinculos:
+            zout.adicionar("_duplicadas.csv", indice.csv_vinculos(lambda c: _arc(c).replace(os.sep, "/")))
+            _emitir(ao_evento, "info", duplicadas=len(indice.vinculos), bytes_poupados=indice.bytes_poupados,
+                    mensagem=f"🔁 {len(indice.vinculos)} imagens repetidas guardadas uma vez só · "
+                             f"{indice.bytes_poupados / 1e6:.1f} MB a menos no ZIP")
+        zout.finalizar().close()
+        metricas.bytes(saida=zout.bytes_escritos)
+        return falhas
+
+
+def exportar_colecao(shop_name, api_version, token, colecao, destino=".", modo="csv", fonte="rest",
+                     formato_csv="largo", max_imagens=10, comprimir_csv=False, turbo=True, motor="threads",
+                     incremental=False, deduplicar=True, largura_cdn="Original", formato_cdn="Original",
+                     opcoes_pipeline=None, ao_evento=None, metricas=None, workers_download=WORKERS_TURBO):
+    """Exporta a coleção para `destino`: sempre o CSV e, nos modos 'zip' e 'pipeline', o ZIP.
+
+    `ao_evento(dict)` recebe o progresso ({"evento": ..., "mensagem": ..., ...}).
+    Com `metricas` (modules.metricas.Metricas), os downloads e etapas são cronometrados.
+    Erros de API, coleção inexistente ou dependência ausente levantam ErroExportacao.
+    """
+    if modo not in MODOS:
+        raise ErroExportacao(f"Modo inválido: {modo}")
+    os.makedirs(destino, exist_ok=True)
+    pasta = os.path.normpath(os.path.join(destino, "imagens_baixadas"))
+    # No modo incremental as imagens já baixadas são reaproveitadas
+    if modo == "zip" and not incremental and os.path.exists(pasta):
+        shutil.rmtree(pasta)
+
+    variante = _parametros_variante(largura_cdn, formato_cdn)
+    collection_id, produtos = _produtos(shop_name, api_version, token, colecao, fonte, ao_evento)
+
+    # O CSV é gravado à medida que as páginas chegam; só as tarefas de download ficam em memória
+    saida_csv = CsvStream(os.path.join(destino, f"imagens_colecao_{collection_id}.csv"), formato=formato_csv,
+                          max_imagens=int(max_imagens), comprimir=comprimir_csv, variante=urlencode(variante))
+    tarefas, meta = [], {}
+
+    def _status_csv():
+        _emitir(ao_evento, "csv", produtos=saida_csv.produtos, linhas=saida_csv.linhas,
+                mensagem=f"📝 {saida_csv.produtos} produtos · {saida_csv.linhas} linhas no CSV")
+
+    try:
+        for p in produtos:
+            title = p.get("title", "")
+            imagens = p.get("images", [])
+            urls = [_url_variante(img["src"], variante) for img in imagens]
+            saida_csv.escrever_produto(p, urls)
+            if saida_csv.produtos % 50 == 0:
+                _status_csv()
+            if modo == "pipeline":
+                tarefas.extend((src, f"{_pasta_produto(title)}/{i+1}.jpg") for i, src in enumerate(urls))
+            elif modo == "zip":
+                for i, (img, src) in enumerate(zip(imagens, urls)):
+                    caminho = os.path.join(pasta, _pasta_produto(title), f"{i+1}.{'webp' if formato_cdn == 'webp' else 'jpg'}")
+                    tarefas.append((src, caminho))
+                    imagem_id = img["id"] if img.get("id") is not None else img["src"]
+                    meta[caminho] = (imagem_id, p.get("id"), img.get("updated_at"), src)
+    except ErroBulk as e:
+        raise ErroExportacao(str(e))
+    finally:
+        csv_path = saida_csv.fechar()
+    _status_csv()
+
+    zip_path, falhas = None, []
+    if saida_csv.produtos and tarefas:
+        if modo == "pipeline":
+            zip_path = os.path.join(destino, f"pipeline_colecao_{collection_id}.zip")
+            falhas = _executar_pipeline(tarefas, opcoes_pipeline, zip_path, ao_evento, metricas or NULA)
+        else:
+            zip_path = os.path.join(destino, f"imagens_colecao_{collection_id}.zip")
+            falhas = _executar_downloads(tarefas, meta, pasta, zip_path, f"{shop_name}:{collection_id}",
+                                         turbo, motor, incremental, deduplicar, ao_evento, metricas or NULA,
+                                         workers_download)
+
+    return ResultadoExportacao(collection_id, saida_csv.produtos, len(tarefas), csv_path, zip_path, falhas)
@@ -1,11 +1,18 @@
 import streamlit as st
-import requests
-import pandas as pd
-import re
 import os
-import shutil
-import zipfile
-import concurrent.futures
+import uuid
+
+from modules.csv_stream import FORMATOS
+from modules.conversao import COMPRESSOES, ROTULOS_COMPRESSAO, Alvo, hex_para_rgb
+from modules import download_async, painel_metricas, pipeline
+from modules.cache_resultados import CACHE
+from modules.espacos import ESPACOS, CotaExcedida
+from modules.metricas import Metricas
+from modules.exportacao import (
+    FORMATOS_CDN, LARGURAS_CDN, WORKERS_TURBO, ErroExportacao, exportar_colecao,
+)
+from modules.remocao import MODELOS
+
 
 # ============== Helpers ==============
 def _header():
@@ -44,75 +51,48 @@ def _header():
     """, unsafe_allow_html=True)
 
 
-def _shopify_request(url, token, params=None):
-    headers = {
-        "X-Shopify-Access-Token": token,
-        "Content-Type": "application/json",
-    }
-    r = requests.get(url, headers=headers, params=params, timeout=60)
-    if r.status_code != 200:
+def _opcoes_pipeline():
+    """Configurações do modo pipeline (remoção de fundo + conversão) -> kwargs do Pipeline."""
+    with st.expander("✨ Etapas do pipeline", expanded=True):
+        remover = st.toggle("Remover fundo", value=pipeline._HAS_REMBG, disabled=not pipeline._HAS_REMBG)
+        modelo = None
+        if remover:
+            modelo = st.selectbox("Modelo", MODELOS, index=0)
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            resolucao = st.selectbox("Resolução", ("1080x1080", "1080x1920", "Sem redimensionar"), index=0)
+        with c2:
+            fundo = st.text_input("Fundo", value="transparente", help="'transparente' ou cor em hex, ex.: #f2f2f2")
+        with c3:
+            fmt = st.selectbox("Formato de saída", ("png", "jpg", "webp"), index=0)
+        compressao = st.radio("Compressão", tuple(COMPRESSOES), index=1, horizontal=True,
+                              format_func=ROTULOS_COMPRESSAO.get)
+        c4, c5, c6 = st.columns(3)
+        with c4:
+            workers_download = st.number_input("Downloads simultâneos", 1, 256, WORKERS_TURBO, 1)
+        with c5:
+            workers_encode = st.number_input("Workers de conversão", 1, 64, 4, 1)
+        with c6:
+            tamanho_fila = st.number_input("Fila entre etapas", 1, 1024, 32, 1,
+                                           help="Itens em espera entre uma etapa e a seguinte (limita a memória).")
+    alvos = []
+    if resolucao != "Sem redimensionar":
         try:
-            st.error(f"Erro {r.status_code}: {r.json()}")
-        except Exception:
-            st.error(f"Erro {r.status_code}: {r.text[:300]}")
-        st.stop()
-    return r
-
-
-def _get_collection_id(shop_name, api_version, collection_input, token):
-    # Se for ID direto
-    if collection_input.isdigit():
-        return collection_input
-
-    # Se for URL
-    if collection_input.startswith("http"):
-        m = re.search(r"/collections/([^/?#]+)", collection_input)
-        if m:
-            handle = m.group(1)
-        else:
-            st.error("URL de coleção inválida."); st.stop()
-    else:
-        handle = collection_input
-
-    # Buscar coleção pelo handle
-    url = f"https://{shop_name}.myshopify.com/admin/api/{api_version}/custom_collections.json"
-    r = _shopify_request(url, token, params={"handle": handle})
-    items = r.json().get("custom_collections", [])
-    if not items:
-        st.error("Coleção não encontrada pelo handle informado."); st.stop()
-    return str(items[0]["id"])
-
-
-def _get_products_in_collection(shop_name, api_version, collection_id, token):
-    produtos = []
-    page_info = None
-    while True:
-        url = f"https://{shop_name}.myshopify.com/admin/api/{api_version}/products.json"
-        params = {"collection_id": collection_id, "limit": 250}
-        if page_info:
-            params["page_info"] = page_info
-        r = _shopify_request(url, token, params=params)
-        produtos.extend(r.json().get("products", []))
-        link = r.headers.get("link", "")
-        if link and 'rel="next"' in link:
-            try:
-                page_info = link.split("page_info=")[-1].split(">")[0]
-            except Exception:
-                break
-        else:
-            break
-    return produtos
+            alvos = [Alvo(tuple(int(v) for v in resolucao.split("x")), hex_para_rgb(fundo), fmt)]
+        except ValueError:
+            st.error("Cor de fundo inválida."); st.stop()
+    return {
+        "modelo": modelo, "alvos": alvos, "workers_download": workers_download,
+        "workers_encode": workers_encode, "tamanho_fila": tamanho_fila, "cache": CACHE, "compressao": compressao,
+    }
 
 
-def _baixar_imagem(url, caminho):
-    try:
-        r = requests.get(url, timeout=20)
-        if r.status_code == 200:
-            os.makedirs(os.path.dirname(caminho), exist_ok=True)
-            with open(caminho, "wb") as f:
-                f.write(r.content)
-    except Exception:
-        pass
+def _mostrar_falhas(falhas):
+    if not falhas:
+        return
+    st.warning(f"⚠️ {len(falhas)} imagem(ns) não puderam ser baixadas.")
+    with st.expander("Ver URLs com falha"):
+        st.dataframe([{"URL": u, "Motivo": m} for u, m in falhas], use_container_width=True)
 
 
 # ============== Interface ==============
@@ -131,8 +111,51 @@ def render(ping_b64: str):
     collection_input = st.text_input("Coleção (ID, handle ou URL)", placeholder="ex: dunk ou https://sualoja.myshopify.com/collections/dunk")
 
     st.markdown("### Opções")
-    modo = st.radio("Selecione a ação:", ("🔗 Gerar apenas CSV com links", "📦 Baixar imagens e gerar ZIP por produto"), index=0, horizontal=True)
+    modo = st.radio("Selecione a ação:", (
+        "🔗 Gerar apenas CSV com links",
+        "📦 Baixar imagens e gerar ZIP por produto",
+        "✨ Pipeline: baixar → remover fundo → converter",
+    ), index=0, horizontal=True)
+    fonte = st.radio(
+        "Fonte dos produtos", ("REST (paginado)", "GraphQL Bulk (coleções grandes)"), index=0, horizontal=True,
+        help="Bulk: a Shopify gera um arquivo com a coleção inteira, lido em streaming."
+    )
+    colC, colN, colG = st.columns(3)
+    with colC:
+        formato_csv = st.radio(
+            "Layout do CSV", FORMATOS, index=0, horizontal=True,
+            help="largo: uma linha por produto · longo: uma linha por imagem."
+        )
+    with colN:
+        max_imagens = st.number_input("Colunas de imagem (largo)", min_value=1, max_value=250, value=10, step=1,
+                                      help="Imagens além desse número vão para a coluna 'Imagens extras'.")
+    with colG:
+        comprimir_csv = st.toggle("CSV com gzip", value=False)
     turbo = st.toggle("Turbo (download paralelo)", value=True)
+    incremental = st.toggle(
+        "Sincronização incremental", value=False,
+        help="Mantém as imagens já baixadas e só busca o que é novo ou mudou (manifesto local + GET condicional)."
+    )
+    deduplicar = st.toggle(
+        "Deduplicar imagens repetidas", value=True,
+        help="Baixa cada URL uma vez e guarda no ZIP uma cópia por conteúdo; as repetições ficam em _duplicadas.csv."
+    )
+    colL, colF = st.columns(2)
+    with colL:
+        largura_cdn = st.selectbox(
+            "Largura no CDN", LARGURAS_CDN, index=0,
+            help="Pede à Shopify a imagem já redimensionada (width=) em vez do original."
+        )
+    with colF:
+        formato_cdn = st.selectbox("Formato no CDN", FORMATOS_CDN, index=0)
+    motor = "threads"
+    if turbo:
+        motores = ["threads"] + (["asyncio"] if download_async._HAS_AIOHTTP else [])
+        motor = st.radio(
+            "Motor de download", motores, index=len(motores) - 1, horizontal=True,
+            help="asyncio: centenas de conexões simultâneas com limite por host (requer aiohttp)."
+        )
+    opcoes_pipeline = _opcoes_pipeline() if "✨" in modo else None
     st.write("---")
 
     if st.button("▶️ Iniciar Exportação", use_container_width=True):
@@ -140,57 +163,65 @@ def render(ping_b64: str):
             st.warning("Preencha todos os campos obrigatórios.")
             st.stop()
 
-        # Limpa pastas antigas
-        if os.path.exists("imagens_baixadas"):
-            shutil.rmtree("imagens_baixadas")
-        for file in os.listdir():
-            if file.endswith(".zip") or file.endswith(".csv"):
-                os.remove(file)
-
-        collection_id = _get_collection_id(shop_name, api_version, collection_input, access_token)
-        produtos = _get_products_in_collection(shop_name, api_version, collection_id, access_token)
+        # Cada sessão grava no seu próprio espaço; no modo incremental o espaço é
+        # nomeado pela loja/coleção para que o manifesto e as imagens sobrevivam
+        if incremental:
+            espaco = ESPACOS.criar("sincronizacao", f"{shop_name}-{collection_input}")
+        else:
+            espaco = ESPACOS.criar("sessoes", st.session_state.setdefault("espaco_extrator", uuid.uuid4().hex[:12]))
+            espaco.esvaziar()
+
+        # A página só traduz os eventos do núcleo em widgets
+        ui = {}
+
+        def _ao_evento(ev):
+            tipo = ev["evento"]
+            if tipo == "bulk":
+                ui.setdefault("bulk", st.empty()).info(ev["mensagem"])
+            elif tipo == "csv":
+                ui.setdefault("csv", st.empty()).caption(ev["mensagem"])
+            elif tipo == "inicio":
+                st.info(ev["mensagem"])
+                ui["prog"], ui["status"] = st.progress(0.0), st.empty()
+            elif tipo == "progresso":
+                espaco.conferir()  # downloads, CSV e ZIP contam na cota do espaço
+                ui["prog"].progress(min(ev["feitos"] / ev["total"], 1.0) if ev["total"] else 1.0)
+                ui["status"].info(ev["mensagem"])
+            elif tipo == "info":
+                st.info(ev["mensagem"])
+
+        metricas = Metricas("exportador")
+        try:
+            res = exportar_colecao(
+                shop_name, api_version, access_token, collection_input, destino=espaco.caminho,
+                modo="pipeline" if "✨" in modo else "zip" if "📦" in modo else "csv",
+                fonte="bulk" if fonte.startswith("GraphQL") else "rest",
+                formato_csv=formato_csv, max_imagens=int(max_imagens), comprimir_csv=comprimir_csv,
+                turbo=turbo, motor=motor, incremental=incremental, deduplicar=deduplicar,
+                largura_cdn=largura_cdn, formato_cdn=formato_cdn,
+                opcoes_pipeline=opcoes_pipeline, ao_evento=_ao_evento, metricas=metricas,
+            )
+        except (ErroExportacao, CotaExcedida) as e:
+            st.error(f"❌ {e}")
+            st.stop()
+        finally:
+            metricas.encerrar()
 
-        if not produtos:
+        if not res.produtos:
             st.warning("Nenhum produto encontrado nesta coleção.")
             st.stop()
 
-        dados, tarefas = [], []
-        for p in produtos:
-            title = p.get("title", "")
-            imagens = [img["src"] for img in p.get("images", [])]
-            item = {"Título": title}
-            for i, img in enumerate(imagens):
-                item[f"Imagem {i+1}"] = img
-                if "📦" in modo:
-                    pasta = os.path.join("imagens_baixadas", re.sub(r'[\\/*?:\"<>|]', "_", title))
-                    tarefas.append((img, os.path.join(pasta, f"{i+1}.jpg")))
-            dados.append(item)
-
-        if "📦" in modo and tarefas:
-            st.info(f"Baixando {len(tarefas)} imagens...")
-            if turbo:
-                with concurrent.futures.ThreadPoolExecutor(max_workers=16) as ex:
-                    list(ex.map(lambda x: _baixar_imagem(*x), tarefas))
-            else:
-                for t in tarefas:
-                    _baixar_imagem(*t)
-
-            zip_name = f"imagens_colecao_{collection_id}.zip"
-            with zipfile.ZipFile(zip_name, "w", zipfile.ZIP_DEFLATED) as zipf:
-                for root, _, files in os.walk("imagens_baixadas"):
-                    for file in files:
-                        path = os.path.join(root, file)
-                        zipf.write(path, os.path.relpath(path, "imagens_baixadas"))
-
-            with open(zip_name, "rb") as f:
-                st.download_button("📥 Baixar ZIP", f, file_name=zip_name, use_container_width=True)
-
-        csv_name = f"imagens_colecao_{collection_id}.csv"
-        pd.DataFrame(dados).to_csv(csv_name, index=False, encoding="utf-8-sig")
-        with open(csv_name, "rb") as f:
-            st.download_button("📥 Baixar CSV", f, file_name=csv_name, use_container_width=True)
+        if res.zip:
+            _mostrar_falhas(res.falhas)
+            with open(res.zip, "rb") as f:
+                st.download_button("📥 Baixar ZIP", f, file_name=os.path.basename(res.zip), use_container_width=True)
+
+        with open(res.csv, "rb") as f:
+            st.download_button("📥 Baixar CSV", f, file_name=os.path.basename(res.csv), use_container_width=True,
+                               mime="application/gzip" if comprimir_csv else "text/csv")
 
         st.success("🎉 Exportação concluída!")
+        painel_metricas.mostrar(metricas.resumo(), *metricas.salvar(espaco.caminho))
 
 
 if __name__ == "__main__":
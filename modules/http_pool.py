@@ -0,0 +1,59 @@
+import hashlib
+import os
+import threading
+from collections import namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_lock = threading.Lock()
+_sessoes = {}   # tamanho do pool -> requests.Session
+
+CHUNK = 64 * 1024
+
+# Resultado de um download: status 200 (arquivo gravado) ou 304 (arquivo local mantido)
+Baixado = namedtuple("Baixado", "url caminho status etag sha256")
+
+
+def obter_sessao(pool_size=16):
+    """Session compartilhada pelo processo (keep-alive + pool de conexões por host).
+
+    O pool do urllib3 é thread-safe; pool_block evita abrir conexões descartáveis
+    quando há mais threads do que conexões.
+    """
+    with _lock:
+        sessao = _sessoes.get(pool_size)
+        if sessao is None:
+            sessao = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size, pool_block=True)
+            sessao.mount("https://", adapter)
+            sessao.mount("http://", adapter)
+            _sessoes[pool_size] = sessao
+        return sessao
+
+
+def baixar_para_arquivo(sessao, url, caminho, timeout=20, headers=None):
+    """Baixa `url` em blocos direto para `caminho` (via arquivo .part + rename).
+
+    Devolve a resposta (com o corpo já consumido) para o chamador inspecionar
+    status e cabeçalhos; o arquivo só é gravado em respostas 200, e nesse caso
+    `r.sha256` traz o hash do conteúdo.
+    """
+    with sessao.get(url, stream=True, timeout=timeout, headers=headers) as r:
+        if r.status_code != 200:
+            return r
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        tmp = caminho + ".part"
+        h = hashlib.sha256()
+        try:
+            with open(tmp, "wb") as f:
+                for chunk in r.iter_content(CHUNK):
+                    f.write(chunk)
+                    h.update(chunk)
+            os.replace(tmp, caminho)
+            r.sha256 = h.hexdigest()
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return r
@@ -0,0 +1,204 @@
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from modules import sessoes_rembg
+from modules.cache_resultados import chave_resultado
+from modules.metricas import NULA
+
+# Normalização e resolução de entrada de cada modelo (iguais às sessões do rembg)
+PERFIS = {
+    "u2net_human_seg": {"mean": (0.485, 0.456, 0.406), "std": (0.229, 0.224, 0.225), "size": (320, 320)},
+    "u2net": {"mean": (0.485, 0.456, 0.406), "std": (0.229, 0.224, 0.225), "size": (320, 320)},
+    "isnet-general-use": {"mean": (0.5, 0.5, 0.5), "std": (1.0, 1.0, 1.0), "size": (1024, 1024)},
+}
+
+
+def _em_lotes(itens, n):
+    it = iter(itens)
+    while True:
+        lote = list(islice(it, n))
+        if not lote:
+            return
+        yield lote
+
+
+def preprocessar(img: Image.Image, perfil):
+    """Converte a imagem no tensor CHW float32 esperado pelo modelo."""
+    im = img.convert("RGB").resize(perfil["size"], Image.Resampling.LANCZOS)
+    arr = np.asarray(im, dtype=np.float32)
+    arr = arr / max(float(arr.max()), 1e-6)
+    arr = (arr - np.array(perfil["mean"], dtype=np.float32)) / np.array(perfil["std"], dtype=np.float32)
+    return arr.transpose((2, 0, 1))
+
+
+def abrir_reduzido(raw: bytes, tamanho):
+    """Decodifica já perto de `tamanho`: draft DCT no JPEG, reduce() nos demais."""
+    img = Image.open(io.BytesIO(raw))
+    if img.format == "JPEG":
+        img.draft("RGB", tamanho)
+    else:
+        fator = int(min(img.width / tamanho[0], img.height / tamanho[1]) // 2)
+        if fator > 1:
+            img = img.reduce(fator)
+    return ImageOps.exif_transpose(img)
+
+
+def _mascara(pred: np.ndarray, size):
+    """Predição normalizada (0..255) como máscara L no tamanho pedido."""
+    ma, mi = float(pred.max()), float(pred.min())
+    pred = (pred - mi) / max(ma - mi, 1e-6)
+    mask = Image.fromarray((pred.clip(0, 1) * 255).astype("uint8"), mode="L")
+    return mask.resize(size, Image.Resampling.LANCZOS)
+
+
+def pos_processar(img: Image.Image, pred: np.ndarray, compress_level=6, metricas=NULA, nome=None):
+    """Redimensiona a máscara e recorta a imagem (PNG)."""
+    with metricas.medir("composicao", nome):
+        mask = _mascara(pred, img.size)
+        if img.mode != "RGBA":
+            img = img.convert("RGBA")
+        cutout = Image.composite(img, Image.new("RGBA", img.size, 0), mask)
+    with metricas.medir("encode", nome):
+        bio = io.BytesIO()
+        cutout.save(bio, format="PNG", compress_level=compress_level)
+    return bio.getvalue()
+
+
+def aplicar_mascara(raw: bytes, pred: np.ndarray, compress_level=6, metricas=NULA, nome=None):
+    """Modo máscara: só a máscara é ampliada e vira o alfa do original."""
+    with metricas.medir("decode", nome):
+        img = ImageOps.exif_transpose(Image.open(io.BytesIO(raw)))
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGB")
+    with metricas.medir("composicao", nome):
+        img.putalpha(_mascara(pred, img.size))
+    with metricas.medir("encode", nome):
+        bio = io.BytesIO()
+        img.save(bio, format="PNG", compress_level=compress_level)
+    return bio.getvalue()
+
+
+class BatchEngine:
+    """Inferência em lotes: pré-processamento e pós-processamento em paralelo,
+    uma única chamada ao ONNX por lote (na thread que consome o gerador)."""
+
+    def __init__(self, modelo, tamanho_lote=8, workers=4, intra_threads=0, inter_threads=0,
+                 cache=None, opcoes=None, modo_mascara=False, png_compress_level=6, metricas=NULA):
+        self.modelo = modelo
+        self.perfil = PERFIS[modelo]
+        self.tamanho_lote = max(1, int(tamanho_lote))
+        self.workers = max(1, int(workers))
+        self.session = sessoes_rembg.obter_sessao(modelo, intra_threads, inter_threads)
+        self.cache = cache
+        self.modo_mascara = modo_mascara
+        self.png_compress_level = int(png_compress_level)
+        self.metricas = metricas
+        self.opcoes = {**(opcoes or {}), "modo_mascara": modo_mascara, "png": self.png_compress_level}
+
+    def _preparar(self, nome, raw, enviado):
+        m = self.metricas
+        m.registrar("espera_fila", time.perf_counter() - enviado, nome, enviado)
+        chave = chave_resultado(raw, self.modelo, self.opcoes) if self.cache is not None else None
+        if chave is not None:
+            out = self.cache.get(chave)
+            if out is not None:
+                return {"nome": nome, "raw": raw, "out": out, "hit": True}
+        if self.modo_mascara:
+            # Só a cópia reduzida fica em memória até o pós-processamento
+            with m.medir("decode", nome):
+                img = abrir_reduzido(raw, self.perfil["size"])
+                img.load()
+            with m.medir("preparo", nome):
+                tensor = preprocessar(img, self.perfil)
+            return {"nome": nome, "raw": raw, "img": None, "chave": chave, "tensor": tensor, "hit": False}
+        with m.medir("decode", nome):
+            img = ImageOps.exif_transpose(Image.open(io.BytesIO(raw)))
+            img.load()
+        with m.medir("preparo", nome):
+            tensor = preprocessar(img, self.perfil)
+        return {"nome": nome, "raw": raw, "img": img, "chave": chave, "tensor": tensor, "hit": False}
+
+    def _finalizar(self, item, pred):
+        if self.modo_mascara:
+            out = aplicar_mascara(item["raw"], pred, self.png_compress_level, self.metricas, item["nome"])
+        else:
+            out = pos_processar(item.pop("img"), pred, self.png_compress_level, self.metricas, item["nome"])
+        if item["chave"] is not None:
+            self.cache.put(item["chave"], out)
+        return item["nome"], item["raw"], out, None, False
+
+    def _inferir(self, tensores):
+        """Roda o modelo sobre o lote; respeita modelos exportados com batch fixo."""
+        entrada = self.session.inner_session.get_inputs()[0]
+        fixo = entrada.shape[0] if isinstance(entrada.shape[0], int) else None
+        passo = fixo or len(tensores)
+        preds = []
+        for i in range(0, len(tensores), passo):
+            lote = np.stack(tensores[i:i + passo])
+            with self.metricas.medir("inferencia", f"lote de {len(lote)}"):
+                out = self.session.inner_session.run(None, {entrada.name: lote})
+            preds.extend(out[0][:, 0, :, :])
+        return preds
+
+    def processar(self, itens):
+        """Recebe (nome, raw) e produz (nome, raw, out_bytes, erro, hit_cache)."""
+        with ThreadPoolExecutor(max_workers=self.workers) as ex:
+            lotes = _em_lotes(itens, self.tamanho_lote)
+
+            def _submeter(lote):
+                if lote is None:
+                    return None
+                return [(nome, raw, ex.submit(self._preparar, nome, raw, time.perf_counter())) for nome, raw in lote]
+
+            prox = _submeter(next(lotes, None))
+            pendentes = []
+            while prox is not None:
+                atual = prox
+                # Pré-processa o próximo lote enquanto este passa pelo modelo
+                prox = _submeter(next(lotes, None))
+
+                prontos = []
+                for nome, raw, fut in atual:
+                    try:
+                        item = fut.result()
+                    except Exception as e:
+                        yield nome, raw, None, e, False
+                        continue
+                    if item["hit"]:
+                        yield nome, raw, item["out"], None, True
+                    else:
+                        prontos.append(item)
+
+                if prontos:
+                    try:
+                        preds = self._inferir([item.pop("tensor") for item in prontos])
+                    except Exception as e:
+                        for item in prontos:
+                            yield item["nome"], item["raw"], None, e, False
+                        preds = []
+                    for item, pred in zip(prontos, preds):
+                        pendentes.append((item, ex.submit(self._finalizar, item, pred)))
+
+                # Entrega o que já terminou sem bloquear a fila
+                ainda = []
+                for item, fut in pendentes:
+                    if fut.done():
+                        yield self._resultado(item, fut)
+                    else:
+                        ainda.append((item, fut))
+                pendentes = ainda
+
+            for item, fut in pendentes:
+                yield self._resultado(item, fut)
+
+    @staticmethod
+    def _resultado(item, fut):
+        try:
+            return fut.result()
+        except Exception as e:
+            return item["nome"], item["raw"], None, e, False
@@ -0,0 +1,162 @@
+import os
+import posixpath
+from concurrent.futures import FIRST_COMPLETED, wait
+from zipfile import ZipFile, BadZipFile
+
+EXTENSOES = (".jpg", ".jpeg", ".png", ".webp")
+
+# Limites de ingestão (tamanho descompactado)
+LIMITE_MEMBRO_MB = int(os.environ.get("INGESTAO_LIMITE_MEMBRO_MB", "200"))
+LIMITE_TOTAL_MB = int(os.environ.get("INGESTAO_LIMITE_TOTAL_MB", "10240"))
+# Razão de compressão acima disso é tratada como zip bomb
+RAZAO_MAXIMA = 200
+
+
+class LimiteExcedido(Exception):
+    pass
+
+
+def nome_seguro(nome):
+    """Caminho relativo limpo (sem '/', '..' ou unidades) para usar no ZIP de saída."""
+    nome = nome.replace("\\", "/")
+    partes = [p for p in posixpath.normpath(nome).split("/") if p not in ("", ".", "..")]
+    if partes and partes[0].endswith(":"):
+        partes = partes[1:]
+    return "/".join(partes)
+
+
+def _eh_imagem(nome):
+    base = posixpath.basename(nome)
+    return (
+        nome.lower().endswith(EXTENSOES)
+        and not base.startswith("._")
+        and not nome.startswith("__MACOSX/")
+    )
+
+
+def _conteudo(f):
+    return f.getvalue() if hasattr(f, "getvalue") else f.read()
+
+
+def _origem_zip(f):
+    # Arquivos locais abrem pelo caminho; uploads, pelo próprio objeto
+    return getattr(f, "caminho", f)
+
+
+class ArquivoLocal:
+    """Arquivo em disco com a interface dos uploads do Streamlit (name + read)."""
+
+    def __init__(self, caminho, nome=None):
+        self.caminho = caminho
+        self.name = nome or os.path.basename(caminho)
+
+    def read(self):
+        with open(self.caminho, "rb") as f:
+            return f.read()
+
+
+def arquivos_locais(caminhos):
+    """Arquivos, ZIPs e pastas (recursivas) -> ArquivoLocal com nomes relativos à pasta informada."""
+    arquivos = []
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            for raiz, dirs, nomes in os.walk(caminho):
+                dirs.sort()
+                for nome in sorted(nomes):
+                    completo = os.path.join(raiz, nome)
+                    arquivos.append(ArquivoLocal(completo, os.path.relpath(completo, caminho)))
+        else:
+            arquivos.append(ArquivoLocal(caminho))
+    return arquivos
+
+
+def _membros(z):
+    for info in z.infolist():
+        if not info.is_dir() and _eh_imagem(info.filename):
+            yield info
+
+
+def contar_imagens(files):
+    """Conta as imagens pelos diretórios centrais dos ZIPs, sem ler os dados."""
+    total = 0
+    for f in files:
+        if f.name.lower().endswith(".zip"):
+            try:
+                with ZipFile(_origem_zip(f)) as z:
+                    total += sum(1 for _ in _membros(z))
+            except BadZipFile:
+                pass
+        elif _eh_imagem(f.name):
+            total += 1
+    return total
+
+
+def _ler_limitado(z, info, limite):
+    """Lê um membro sem confiar no tamanho declarado no cabeçalho."""
+    with z.open(info) as src:
+        data = src.read(limite + 1)
+    if len(data) > limite:
+        raise LimiteExcedido(f"{info.filename} excede {limite // (1024 * 1024)} MB")
+    return data
+
+
+def iterar_imagens(files, avisar=None, limite_membro_mb=LIMITE_MEMBRO_MB, limite_total_mb=LIMITE_TOTAL_MB):
+    """Gera (nome_relativo, bytes) direto dos uploads, um membro por vez, sem extrair em disco."""
+    avisar = avisar or (lambda msg: None)
+    limite_membro = limite_membro_mb * 1024 * 1024
+    limite_total = limite_total_mb * 1024 * 1024
+    total = 0
+
+    def _contabilizar(n, nome):
+        nonlocal total
+        total += n
+        if total > limite_total:
+            raise LimiteExcedido(f"Lote excede o limite total de {limite_total_mb} MB (em {nome})")
+
+    for f in files:
+        if not f.name.lower().endswith(".zip"):
+            if _eh_imagem(f.name):
+                data = _conteudo(f)
+                _contabilizar(len(data), f.name)
+                yield nome_seguro(f.name), data
+            continue
+
+        try:
+            z = ZipFile(_origem_zip(f))
+        except BadZipFile:
+            avisar(f"ZIP inválido: {f.name}")
+            continue
+        with z:
+            for info in _membros(z):
+                if info.file_size > limite_membro:
+                    avisar(f"Ignorado (maior que {limite_membro_mb} MB): {info.filename}")
+                    continue
+                if info.compress_size and info.file_size / info.compress_size > RAZAO_MAXIMA:
+                    avisar(f"Ignorado (compressão suspeita): {info.filename}")
+                    continue
+                try:
+                    data = _ler_limitado(z, info, limite_membro)
+                except LimiteExcedido as e:
+                    avisar(f"Ignorado: {e}")
+                    continue
+                except Exception as e:
+                    avisar(f"Não foi possível ler {info.filename}: {e}")
+                    continue
+                _contabilizar(len(data), info.filename)
+                yield nome_seguro(info.filename), data
+
+
+def processar_em_fluxo(ex, fn, itens, janela=32):
+    """Submete fn(*item) ao executor mantendo no máximo `janela` tarefas em voo.
+
+    Gera os futuros concluídos na ordem em que terminam.
+    """
+    pendentes = set()
+    for item in itens:
+        pendentes.add(ex.submit(fn, *item))
+        if len(pendentes) >= janela:
+            prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+            yield from prontos
+    while pendentes:
+        prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+        yield from prontos
@@ -0,0 +1,67 @@
+import os
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS imagens (
+    colecao     TEXT NOT NULL,
+    imagem_id   TEXT NOT NULL,
+    produto_id  TEXT,
+    updated_at  TEXT,
+    src         TEXT,
+    etag        TEXT,
+    sha256      TEXT,
+    caminho     TEXT,
+    sincronizado_em REAL,
+    PRIMARY KEY (colecao, imagem_id)
+)
+"""
+
+
+class Manifesto:
+    """Registro local (SQLite) das imagens já exportadas, para sincronização incremental."""
+
+    def __init__(self, caminho):
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._con = sqlite3.connect(caminho, check_same_thread=False)
+        self._con.row_factory = sqlite3.Row
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def obter(self, colecao, imagem_id):
+        with self._lock:
+            row = self._con.execute(
+                "SELECT * FROM imagens WHERE colecao = ? AND imagem_id = ?", (colecao, str(imagem_id))
+            ).fetchone()
+        return dict(row) if row else None
+
+    def registrar(self, colecao, imagem_id, produto_id, updated_at, src, etag, sha256, caminho):
+        with self._lock:
+            self._con.execute(
+                "INSERT OR REPLACE INTO imagens VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (colecao, str(imagem_id), str(produto_id), updated_at, src, etag, sha256, caminho, time.time()),
+            )
+            self._con.commit()
+
+    def decidir(self, colecao, imagem_id, updated_at, src, caminho):
+        """('reusar', None) se nada mudou e o arquivo existe; ('condicional', etag) se
+        vale um GET com If-None-Match; ('baixar', None) caso contrário.
+
+        O ETag gravado é o da URL anterior: com `src` diferente (imagem trocada ou outra
+        variante do CDN) um 304 manteria o arquivo velho, então baixa de novo.
+        """
+        row = self.obter(colecao, imagem_id)
+        if not row or row["caminho"] != caminho or row["src"] != src:
+            return "baixar", None
+        existe = os.path.exists(caminho) and os.path.getsize(caminho) > 0
+        if existe and row["updated_at"] == updated_at:
+            return "reusar", None
+        if existe and row["etag"]:
+            return "condicional", row["etag"]
+        return "baixar", None
+
+    def fechar(self):
+        with self._lock:
+            self._con.close()
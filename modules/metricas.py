@@ -0,0 +1,248 @@
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+try:
+    import resource
+    _HAS_RESOURCE = True
+except Exception:
+    _HAS_RESOURCE = False
+
+# Instrumentação por etapa: cada item registra quanto tempo passou em leitura/download,
+# decode, inferência, resize, encode, ZIP e espera na fila. O resumo mostra onde o
+# tempo vai; o trace (formato Chrome/Perfetto) e o texto Prometheus ficam para análise.
+
+# Ordem de exibição; etapas fora da lista aparecem depois, em ordem alfabética
+ETAPAS = ("leitura", "download", "espera_fila", "decode", "preparo", "inferencia", "resize",
+          "composicao", "encode", "preview", "zip")
+
+
+def _descendentes(pid="self"):
+    """PIDs dos processos filhos, netos etc. (o pool de processos nasce do forkserver)."""
+    pids = []
+    try:
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                pids += f.read().split()
+    except OSError:
+        return pids
+    for filho in list(pids):
+        pids += _descendentes(filho)
+    return pids
+
+
+def _rss_atual():
+    """RSS do processo e dos descendentes em bytes (/proc no Linux; pico do processo como alternativa)."""
+    try:
+        total = 0
+        for pid in ["self", *_descendentes()]:
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    total += int(f.read().split()[1])
+            except OSError:
+                continue  # processo terminou entre a listagem e a leitura
+        if total:
+            return total * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, IndexError, AttributeError):
+        pass
+    if _HAS_RESOURCE:
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico if sys.platform == "darwin" else pico * 1024
+    return 0
+
+
+def _percentil(ordenados, q):
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(round(q * (len(ordenados) - 1))))]
+
+
+class _Nula:
+    """Métricas desligadas: mesma interface, nenhum custo."""
+
+    def medir(self, etapa, item=None):
+        return contextlib.nullcontext()
+
+    def registrar(self, etapa, segundos, item=None, inicio=None):
+        pass
+
+    def bytes(self, entrada=0, saida=0):
+        pass
+
+    def item(self, erro=False):
+        pass
+
+    def fluxo(self, itens, etapa="leitura"):
+        return itens
+
+
+NULA = _Nula()
+
+
+class Metricas(_Nula):
+    """Coletor thread-safe de uma execução (um lote de uma ferramenta)."""
+
+    def __init__(self, ferramenta, max_eventos=100_000, intervalo_rss=0.2):
+        self.ferramenta = ferramenta
+        self.max_eventos = max_eventos
+        self._lock = threading.Lock()
+        self._duracoes = defaultdict(list)  # etapa -> [segundos]
+        self._eventos = []                  # (etapa, inicio, segundos, item, thread)
+        self.bytes_entrada = 0
+        self.bytes_saida = 0
+        self.itens = 0
+        self.erros = 0
+        self.inicio_unix = time.time()
+        self.inicio = time.perf_counter()
+        self.fim = None
+        self.pico_rss = _rss_atual()
+        self._parar = threading.Event()
+        self._amostrador = threading.Thread(target=self._amostrar, args=(intervalo_rss,), daemon=True)
+        self._amostrador.start()
+
+    def _amostrar(self, intervalo):
+        while not self._parar.wait(intervalo):
+            self.pico_rss = max(self.pico_rss, _rss_atual())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.encerrar()
+
+    # ====== Coleta ======
+    @contextlib.contextmanager
+    def medir(self, etapa, item=None):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(etapa, time.perf_counter() - t0, item, t0)
+
+    def registrar(self, etapa, segundos, item=None, inicio=None):
+        inicio = time.perf_counter() - segundos if inicio is None else inicio
+        with self._lock:
+            self._duracoes[etapa].append(segundos)
+            if len(self._eventos) < self.max_eventos:
+                self._eventos.append((etapa, inicio, segundos, item, threading.get_ident()))
+
+    def bytes(self, entrada=0, saida=0):
+        with self._lock:
+            self.bytes_entrada += entrada
+            self.bytes_saida += saida
+
+    def item(self, erro=False):
+        with self._lock:
+            self.itens += 1
+            self.erros += bool(erro)
+
+    def fluxo(self, itens, etapa="leitura"):
+        """Envolve um gerador de (nome, raw, ...) medindo cada next() e os bytes lidos."""
+        it = iter(itens)
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            self.registrar(etapa, time.perf_counter() - t0, item[0], t0)
+            self.bytes(entrada=len(item[1]))
+            yield item
+
+    def encerrar(self):
+        if self.fim is None:
+            self.fim = time.perf_counter()
+            self._parar.set()
+            self.pico_rss = max(self.pico_rss, _rss_atual())
+        return self
+
+    # ====== Exportação ======
+    @property
+    def segundos(self):
+        return (self.fim or time.perf_counter()) - self.inicio
+
+    def resumo(self):
+        """Dict serializável com totais e p50/p95/máximo por etapa."""
+        with self._lock:
+            duracoes = {etapa: sorted(v) for etapa, v in self._duracoes.items()}
+        ordem = [e for e in ETAPAS if e in duracoes] + sorted(set(duracoes) - set(ETAPAS))
+        etapas = []
+        for etapa in ordem:
+            v = duracoes[etapa]
+            etapas.append({
+                "etapa": etapa, "n": len(v), "total_s": round(sum(v), 4),
+                "p50_ms": round(_percentil(v, 0.5) * 1000, 2), "p95_ms": round(_percentil(v, 0.95) * 1000, 2),
+                "max_ms": round(v[-1] * 1000, 2),
+            })
+        segundos = self.segundos
+        return {
+            "ferramenta": self.ferramenta, "segundos": round(segundos, 3),
+            "itens": self.itens, "erros": self.erros,
+            "itens_por_s": round(self.itens / segundos, 2) if segundos > 0 else 0.0,
+            "bytes_entrada": self.bytes_entrada, "bytes_saida": self.bytes_saida,
+            "pico_rss_mb": round(self.pico_rss / 2**20, 1), "etapas": etapas,
+        }
+
+    def trace(self):
+        """Trace no formato Chrome (chrome://tracing, ui.perfetto.dev), com o resumo em otherData."""
+        with self._lock:
+            eventos = list(self._eventos)
+        pid = os.getpid()
+        return {
+            "traceEvents": [
+                {"name": etapa, "ph": "X", "pid": pid, "tid": tid,
+                 "ts": round((inicio - self.inicio) * 1e6), "dur": round(seg * 1e6),
+                 "args": {"item": item} if item is not None else {}}
+                for etapa, inicio, seg, item, tid in eventos
+            ],
+            "displayTimeUnit": "ms",
+            "otherData": {"inicio_unix": self.inicio_unix, **self.resumo()},
+        }
+
+    def prometheus(self):
+        """Texto no formato de exposição do Prometheus."""
+        r = self.resumo()
+        f = f'ferramenta="{self.ferramenta}"'
+        with self._lock:
+            duracoes = {etapa: sorted(v) for etapa, v in self._duracoes.items()}
+        linhas = [
+            "# HELP v2labs_etapa_segundos Duração por item de cada etapa.",
+            "# TYPE v2labs_etapa_segundos summary",
+        ]
+        for etapa, v in duracoes.items():
+            rotulos = f'{f},etapa="{etapa}"'
+            for q in (0.5, 0.95):
+                linhas.append(f'v2labs_etapa_segundos{{{rotulos},quantile="{q}"}} {_percentil(v, q):.6f}')
+            linhas.append(f"v2labs_etapa_segundos_sum{{{rotulos}}} {sum(v):.6f}")
+            linhas.append(f"v2labs_etapa_segundos_count{{{rotulos}}} {len(v)}")
+        linhas += [
+            "# HELP v2labs_itens_total Itens processados.",
+            "# TYPE v2labs_itens_total counter",
+            f'v2labs_itens_total{{{f},resultado="ok"}} {r["itens"] - r["erros"]}',
+            f'v2labs_itens_total{{{f},resultado="erro"}} {r["erros"]}',
+            "# HELP v2labs_bytes_total Bytes lidos/baixados e gravados.",
+            "# TYPE v2labs_bytes_total counter",
+            f'v2labs_bytes_total{{{f},direcao="entrada"}} {r["bytes_entrada"]}',
+            f'v2labs_bytes_total{{{f},direcao="saida"}} {r["bytes_saida"]}',
+            "# HELP v2labs_duracao_segundos Duração total da execução.",
+            "# TYPE v2labs_duracao_segundos gauge",
+            f"v2labs_duracao_segundos{{{f}}} {r['segundos']}",
+            "# HELP v2labs_pico_rss_bytes Pico de memória residente durante a execução.",
+            "# TYPE v2labs_pico_rss_bytes gauge",
+            f"v2labs_pico_rss_bytes{{{f}}} {self.pico_rss}",
+        ]
+        return "\n".join(linhas) + "\n"
+
+    def salvar(self, pasta, prefixo="metricas"):
+        """Grava <prefixo>.json (trace) e <prefixo>.prom; devolve os dois caminhos."""
+        self.encerrar()
+        base = os.path.join(pasta, prefixo)
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(self.trace(), f, ensure_ascii=False, default=str)
+        with open(base + ".prom", "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        return base + ".json", base + ".prom"
@@ -0,0 +1,44 @@
+import os
+
+import streamlit as st
+
+# Painel de desempenho mostrado ao fim de cada execução (resumo de modules.metricas).
+
+_NOMES = {
+    "leitura": "Leitura", "download": "Download", "espera_fila": "Espera na fila", "decode": "Decode",
+    "preparo": "Pré-processamento", "inferencia": "Inferência", "resize": "Resize/composição",
+    "composicao": "Máscara/composição", "encode": "Encode", "preview": "Preview", "zip": "ZIP",
+}
+
+
+def mostrar(resumo, trace=None, prom=None):
+    """Expander com totais, tabela por etapa e downloads do trace JSON e das métricas Prometheus."""
+    if not resumo:
+        return
+    with st.expander("⏱️ Desempenho desta execução"):
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Imagens/s", f"{resumo['itens_por_s']:.1f}")
+        c2.metric("Duração", f"{resumo['segundos']:.1f} s")
+        c3.metric("Entrada → saída", f"{resumo['bytes_entrada'] / 1e6:.1f} → {resumo['bytes_saida'] / 1e6:.1f} MB")
+        c4.metric("Pico de memória", f"{resumo['pico_rss_mb']:.0f} MB")
+
+        # Tempo somado de todas as threads; a coluna % mostra onde o trabalho se concentra
+        soma = sum(e["total_s"] for e in resumo["etapas"] if e["etapa"] != "espera_fila") or 1.0
+        st.dataframe([
+            {
+                "Etapa": _NOMES.get(e["etapa"], e["etapa"]), "Itens": e["n"], "Total (s)": e["total_s"],
+                "%": "—" if e["etapa"] == "espera_fila" else f"{e['total_s'] / soma:.0%}",
+                "p50 (ms)": e["p50_ms"], "p95 (ms)": e["p95_ms"], "Máx (ms)": e["max_ms"],
+            }
+            for e in resumo["etapas"]
+        ], use_container_width=True, hide_index=True)
+        if resumo["erros"]:
+            st.caption(f"{resumo['erros']} de {resumo['itens']} itens com erro.")
+
+        cols = st.columns(2)
+        for col, caminho, rotulo, mime in ((cols[0], trace, "📄 Trace JSON", "application/json"),
+                                           (cols[1], prom, "📈 Métricas Prometheus", "text/plain")):
+            if caminho and os.path.exists(caminho):
+                with open(caminho, "rb") as f:
+                    col.download_button(rotulo, f, file_name=os.path.basename(caminho), mime=mime,
+                                        use_container_width=True, key=f"metricas_{rotulo}")
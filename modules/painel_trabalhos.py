@@ -0,0 +1,107 @@
+import os
+import time
+
+import streamlit as st
+
+from modules.espacos import CotaExcedida
+from modules.ingestao import nome_seguro
+from modules.trabalhos import CANCELADO, CONCLUIDO, FALHOU, FINAIS, INTERROMPIDO, NA_FILA, TRABALHOS
+
+# Lado Streamlit dos trabalhos em segundo plano: a página só dispara o trabalho e
+# consulta o estado. O id fica na sessão e na URL (?chave=id), então um refresh
+# do navegador volta a acompanhar o mesmo trabalho.
+
+
+def _tamanho(f):
+    return getattr(f, "size", None) or len(f.getbuffer() if hasattr(f, "getbuffer") else f.read())
+
+
+def _salvar_uploads(files, pasta, espaco=None):
+    """Grava os uploads em `pasta`; com `espaco`, recusa o lote inteiro se passar da cota.
+
+    Cópia proposital: os UploadedFile morrem com a sessão, e o trabalho precisa
+    sobreviver a reruns e ao refresh. Os ZIPs vão como estão; a ingestão continua
+    lendo um membro por vez, sem extrair.
+    """
+    if espaco is not None:
+        espaco.reservar(sum(_tamanho(f) for f in files))
+    os.makedirs(pasta, exist_ok=True)
+    for f in files:
+        destino = os.path.join(pasta, nome_seguro(f.name) or "arquivo")
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        with open(destino, "wb") as out:
+            out.write(f.getbuffer() if hasattr(f, "getbuffer") else f.read())
+
+
+def trabalho_da_sessao(chave):
+    return st.session_state.get(chave) or st.query_params.get(chave)
+
+
+def _esquecer(chave):
+    st.session_state.pop(chave, None)
+    if chave in st.query_params:
+        del st.query_params[chave]
+
+
+def iniciar_trabalho(chave, tipo, files, fn, parametros=None, **kwargs):
+    """Copia os uploads para a pasta do trabalho e o coloca na fila global.
+
+    Devolve None (com a mensagem na tela) se os arquivos não cabem na cota do espaço.
+    """
+    # Entradas mais um resultado do mesmo porte
+    ctx = TRABALHOS.criar(tipo, parametros, previsto=2 * sum(_tamanho(f) for f in files))
+    try:
+        _salvar_uploads(files, os.path.join(ctx.pasta, "entrada"), ctx.espaco)
+    except CotaExcedida as e:
+        TRABALHOS.cancelar(ctx.id)
+        TRABALHOS.remover(ctx.id)
+        st.error(f"❌ {e}")
+        return None
+    TRABALHOS.iniciar(ctx, fn, **kwargs)
+    st.session_state[chave] = ctx.id
+    st.query_params[chave] = ctx.id
+    return ctx.id
+
+
+def acompanhar(chave, intervalo=1.0):
+    """Mostra o trabalho da sessão; devolve o estado quando ele termina, senão None.
+
+    Enquanto o trabalho roda, a página é reexecutada a cada `intervalo` segundos.
+    """
+    id_ = trabalho_da_sessao(chave)
+    if not id_:
+        return None
+    estado = TRABALHOS.status(id_)
+    if estado is None:
+        # Id da sessão/URL cuja pasta a limpeza por TTL já apagou
+        _esquecer(chave)
+        st.warning("⌛ Resultado expirado: os arquivos deste trabalho já foram apagados. Envie o lote de novo.")
+        return None
+
+    if estado["estado"] not in FINAIS:
+        total = estado["total"] or 0
+        st.progress(min(estado["feitos"] / total, 1.0) if total else 0.0)
+        if estado["estado"] == NA_FILA:
+            s = TRABALHOS.stats()
+            st.info(f"⏳ Na fila · {s['executando']}/{s['max_concorrentes']} trabalhos em execução no servidor")
+        else:
+            st.info(estado["mensagem"] or "Preparando...")
+        st.caption(f"Trabalho {id_} — pode fechar ou recarregar a página; o processamento continua.")
+        if st.button("⏹️ Cancelar", key=f"{chave}_cancelar"):
+            TRABALHOS.cancelar(id_)
+        time.sleep(intervalo)
+        st.rerun()
+
+    if estado["avisos"]:
+        with st.expander(f"⚠️ {len(estado['avisos'])} aviso(s)"):
+            for aviso in estado["avisos"]:
+                st.write(aviso)
+    if estado["estado"] == FALHOU:
+        st.error(f"❌ O trabalho falhou: {estado['erro']}")
+    elif estado["estado"] in (CANCELADO, INTERROMPIDO):
+        st.warning(f"O trabalho foi {estado['estado']}.")
+    if st.button("🗑️ Descartar e começar outro lote", key=f"{chave}_descartar"):
+        TRABALHOS.remover(id_)
+        _esquecer(chave)
+        st.rerun()
+    return estado if estado["estado"] == CONCLUIDO else None
@@ -0,0 +1,199 @@
+import io
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from PIL import Image
+
+from modules.agendador import RETENTAVEIS, LimitadorAdaptativo, espera_backoff
+from modules.conversao import Alvo, converter_imagem
+from modules.http_pool import obter_sessao
+from modules.ingestao import processar_em_fluxo
+from modules.metricas import NULA
+from modules.sessoes_rembg import _HAS_REMBG
+
+# Pipeline em memória: download → remoção de fundo → redimensionamento → encode.
+# Cada etapa roda na sua thread e entrega à seguinte por uma fila limitada, então
+# rede, inferência e encode se sobrepõem sem ZIPs intermediários.
+
+_FIM = object()
+
+_EXTENSOES = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "GIF": ".gif"}
+
+
+def _extensao(raw, padrao):
+    """Extensão pelo conteúdo: o nome da tarefa é sempre .jpg, mas o CDN pode servir PNG/WebP."""
+    try:
+        with Image.open(io.BytesIO(raw)) as img:
+            return _EXTENSOES.get(img.format, padrao)
+    except OSError:
+        return padrao
+
+
+class _Falha:
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def _em_thread(gerador, tamanho_fila):
+    """Consome `gerador` numa thread própria, entregando os itens por uma fila limitada.
+
+    Se o consumidor parar antes do fim (erro, cancelamento, close()), o produtor
+    desiste do put pendente e fecha `gerador`, o que encerra as etapas anteriores.
+    """
+    fila = queue.Queue(maxsize=max(1, tamanho_fila))
+    parar = threading.Event()
+
+    def _entregar(item):
+        while not parar.is_set():
+            try:
+                fila.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produzir():
+        try:
+            for item in gerador:
+                if not _entregar(item):
+                    break
+        except BaseException as e:
+            _entregar(_Falha(e))
+        finally:
+            gerador.close()
+            _entregar(_FIM)
+
+    threading.Thread(target=_produzir, daemon=True).start()
+    try:
+        while True:
+            item = fila.get()
+            if item is _FIM:
+                return
+            if isinstance(item, _Falha):
+                raise item.exc
+            yield item
+    finally:
+        parar.set()
+
+
+class Pipeline:
+    """Encadeia as etapas sobre [(url, nome)] e gera (nome, [(arcname, bytes)]).
+
+    `modelo=None` pula a remoção de fundo; sem `alvos`, a saída é o PNG recortado.
+    Itens com erro não seguem adiante e ficam em `falhas` como (nome, etapa, motivo).
+    """
+
+    def __init__(self, modelo=None, alvos=(), workers_download=16, workers_encode=4, tamanho_lote=8,
+                 tamanho_fila=32, rapido=True, modo_mascara=True, cache=None, max_tentativas=5, metricas=NULA,
+                 compressao="equilibrada"):
+        if modelo and not _HAS_REMBG:
+            raise RuntimeError("Biblioteca 'rembg' não encontrada. Instale com: pip install rembg onnxruntime")
+        self.modelo = modelo
+        self.alvos = [a if isinstance(a, Alvo) else Alvo(*a) for a in alvos]
+        self.workers_download = max(1, int(workers_download))
+        self.workers_encode = max(1, int(workers_encode))
+        self.tamanho_lote = tamanho_lote
+        self.tamanho_fila = max(1, int(tamanho_fila))
+        self.rapido = rapido
+        self.compressao = compressao
+        self.modo_mascara = modo_mascara
+        self.cache = cache
+        self.max_tentativas = max_tentativas
+        self.metricas = metricas
+        self.falhas = []
+        self.concluidos = {"download": 0, "remocao": 0, "conversao": 0}
+        self.bytes_baixados = 0
+
+    # ====== Etapas ======
+    @staticmethod
+    def _protegido(fn, nome, *args):
+        """Roda a etapa de um item devolvendo (nome, resultado, erro) em vez de levantar."""
+        try:
+            return nome, fn(*args), None
+        except Exception as e:
+            return nome, None, str(e) or type(e).__name__
+
+    def _buscar(self, url, limitador):
+        sessao = obter_sessao(self.workers_download)
+        motivo = None
+        for tentativa in range(self.max_tentativas):
+            try:
+                with limitador, self.metricas.medir("download", url):
+                    r = sessao.get(url, timeout=20)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                motivo, retry_after = type(e).__name__, None
+            else:
+                if r.status_code == 200:
+                    limitador.sucesso()
+                    return r.content
+                if r.status_code not in RETENTAVEIS:
+                    raise RuntimeError(f"HTTP {r.status_code}")
+                motivo, retry_after = f"HTTP {r.status_code}", r.headers.get("Retry-After")
+            limitador.congestionado()
+            time.sleep(espera_backoff(tentativa, retry_after))
+        raise RuntimeError(f"{motivo} após {self.max_tentativas} tentativas")
+
+    def _etapa_download(self, tarefas):
+        limitador = LimitadorAdaptativo(inicial=self.workers_download, maximo=self.workers_download)
+        itens = ((self._buscar, nome, url, limitador) for url, nome in tarefas)
+        with ThreadPoolExecutor(max_workers=self.workers_download) as ex:
+            for fut in processar_em_fluxo(ex, self._protegido, itens, janela=self.tamanho_fila):
+                nome, raw, erro = fut.result()
+                if erro is not None:
+                    self.falhas.append((nome, "download", erro))
+                    continue
+                self.concluidos["download"] += 1
+                self.bytes_baixados += len(raw)
+                self.metricas.bytes(entrada=len(raw))
+                yield nome, raw
+
+    def _etapa_remocao(self, itens):
+        from modules.inferencia_lote import BatchEngine
+
+        # PNG intermediário com compressão mínima: ele só vai até a etapa seguinte
+        engine = BatchEngine(
+            self.modelo, tamanho_lote=self.tamanho_lote, workers=4, cache=self.cache,
+            opcoes={"formato": "png"}, modo_mascara=self.modo_mascara, png_compress_level=1, metricas=self.metricas,
+        )
+        for nome, _raw, out, erro, _hit in engine.processar(itens):
+            if erro is not None:
+                self.falhas.append((nome, "remocao", str(erro) or type(erro).__name__))
+                continue
+            self.concluidos["remocao"] += 1
+            yield nome, out
+
+    def _converter(self, nome, raw):
+        if not self.alvos:
+            # Sem conversão os bytes passam como estão: PNG da remoção ou o original do CDN
+            rel = Path(nome)
+            ext = ".png" if self.modelo else _extensao(raw, rel.suffix)
+            return [(rel.with_suffix(ext).as_posix(), raw)]
+        _, saidas = converter_imagem(nome, raw, self.alvos, self.rapido, subpastas=len(self.alvos) > 1,
+                                     metricas=self.metricas, com_preview=False, compressao=self.compressao)
+        return saidas
+
+    def _etapa_conversao(self, itens):
+        with ThreadPoolExecutor(max_workers=self.workers_encode) as ex:
+            itens = ((self._converter, nome, nome, raw) for nome, raw in itens)
+            for fut in processar_em_fluxo(ex, self._protegido, itens, janela=self.tamanho_fila):
+                nome, saidas, erro = fut.result()
+                if erro is not None:
+                    self.falhas.append((nome, "conversao", erro))
+                    continue
+                self.concluidos["conversao"] += 1
+                self.metricas.bytes(saida=sum(len(data) for _, data in saidas))
+                yield nome, saidas
+
+    def executar(self, tarefas):
+        """Gera (nome, [(arcname, bytes)]) à medida que cada imagem sai da última etapa."""
+        fluxo = _em_thread(self._etapa_download(tarefas), self.tamanho_fila)
+        if self.modelo:
+            fluxo = _em_thread(self._etapa_remocao(fluxo), self.tamanho_fila)
+        try:
+            yield from self._etapa_conversao(fluxo)
+        finally:
+            fluxo.close()  # consumidor parou cedo: libera as threads das etapas anteriores
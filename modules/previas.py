@@ -0,0 +1,121 @@
+import base64
+import html
+import io
+import os
+
+from PIL import Image, ImageOps
+
+# Pré-visualizações dos trabalhos: miniaturas geradas no próprio worker, só para os
+# itens que serão exibidos. A página nunca relê os arquivos em resolução original,
+# e a memória não cresce com o tamanho do lote.
+
+LADO = 640  # ~2x a largura de uma coluna na página
+
+
+def miniatura(dados: bytes, lado=LADO):
+    """Decodifica já reduzido (draft DCT no JPEG) e devolve a miniatura com EXIF aplicado."""
+    img = Image.open(io.BytesIO(dados))
+    if img.format == "JPEG":
+        img.draft("RGB", (lado, lado))
+    img = ImageOps.exif_transpose(img)
+    img.thumbnail((lado, lado))
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "PA") else "RGB")
+    return img
+
+
+def _salvar(img: Image.Image, caminho):
+    img.save(caminho, format="WEBP", quality=82)
+    return caminho
+
+
+class Previas:
+    """Guarda até `maximo` pré-visualizações em `pasta`; `itens` vai no resultado do trabalho."""
+
+    def __init__(self, pasta, maximo, lado=LADO):
+        os.makedirs(pasta, exist_ok=True)
+        self.pasta = pasta
+        self.maximo = maximo
+        self.lado = lado
+        self.itens = []
+
+    @property
+    def cheio(self):
+        return len(self.itens) >= self.maximo
+
+    def adicionar(self, nome, dados, mime):
+        """Miniatura já pronta (ex.: a do conversor), gravada como está."""
+        if self.cheio:
+            return
+        caminho = os.path.join(self.pasta, f"{len(self.itens)}.{mime.split('/')[1]}")
+        with open(caminho, "wb") as f:
+            f.write(dados)
+        self.itens.append([nome, caminho, mime])
+
+    def adicionar_par(self, nome, antes: bytes, depois: bytes):
+        """Antes/depois reduzidos ao mesmo tamanho, prontos para sobrepor na página."""
+        if self.cheio:
+            return
+        img_a = miniatura(antes, self.lado)
+        img_d = miniatura(depois, self.lado)
+        if img_d.size != img_a.size:
+            img_d = img_d.resize(img_a.size, Image.Resampling.LANCZOS)
+        base = os.path.join(self.pasta, str(len(self.itens)))
+        self.itens.append([nome, _salvar(img_a, base + "_antes.webp"), _salvar(img_d, base + "_depois.webp")])
+
+
+# ====== Comparador no navegador ======
+def _data_uri(caminho):
+    with open(caminho, "rb") as f:
+        return "data:image/webp;base64," + base64.b64encode(f.read()).decode("ascii")
+
+
+def altura_comparador(pares, largura_coluna=340):
+    """Altura estimada do iframe: slider + cada linha com a proporção da miniatura."""
+    total = 70
+    for _, antes, _ in pares:
+        with Image.open(antes) as img:
+            total += int(largura_coluna * img.height / max(img.width, 1)) + 40
+    return total
+
+
+def comparador_html(pares, valor=50):
+    """Página autocontida: um slider mistura antes/depois com opacidade, sem rerun no Python.
+
+    `pares` é [(nome, caminho_antes, caminho_depois)] de Previas.adicionar_par.
+    """
+    linhas = []
+    for nome, antes, depois in pares:
+        nome = html.escape(nome)
+        a, d = _data_uri(antes), _data_uri(depois)
+        linhas.append(f"""
+        <figure><img src="{a}"><figcaption>ANTES — {nome}</figcaption></figure>
+        <figure><div class="pilha"><img class="fundo" src="{a}"><img class="recorte" src="{d}"></div>
+        <figcaption>DEPOIS — {nome}</figcaption></figure>""")
+    return f"""
+    <style>
+    body {{ margin: 0; font-family: 'Inter', sans-serif; color: #111; }}
+    label {{ font-size: 14px; display: flex; justify-content: space-between; }}
+    input[type=range] {{ width: 100%; accent-color: #007bff; margin: 6px 0 14px; }}
+    .grade {{ display: grid; grid-template-columns: 1fr 1fr; gap: 12px 16px; }}
+    figure {{ margin: 0; }}
+    figure img {{ width: 100%; display: block; }}
+    figcaption {{ font-size: 13px; color: #666; text-align: center; margin-top: 4px; }}
+    .pilha {{ position: relative; }}
+    .pilha .recorte {{ position: absolute; inset: 0; }}
+    </style>
+    <label>Comparação de mistura <span id="valor"></span></label>
+    <input type="range" id="mistura" min="0" max="100" step="1" value="{int(valor)}">
+    <div class="grade">{"".join(linhas)}</div>
+    <script>
+    const s = document.getElementById("mistura");
+    function aplicar() {{
+        const t = s.value / 100;
+        document.getElementById("valor").textContent = s.value;
+        document.querySelectorAll(".fundo").forEach(e => e.style.opacity = 1 - t);
+        document.querySelectorAll(".recorte").forEach(e => e.style.opacity = t);
+    }}
+    s.addEventListener("input", aplicar);
+    aplicar();
+    </script>
+    """
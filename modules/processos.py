@@ -0,0 +1,198 @@
+import atexit
+import contextlib
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+from modules.metricas import _Nula
+
+# Pool de processos para trabalho de CPU que o GIL serializa (decode, resize, encode).
+# Os bytes de entrada vão por memória compartilhada, sem pickle; as saídas de cada
+# item voltam num único bloco compartilhado criado pelo worker. Pela fila só passam
+# nomes de blocos, offsets e parâmetros. Os blocos moram no tmpfs de /dev/shm, que
+# em contêineres costuma ser pequeno (64 MB no Docker) e dá SIGBUS se lotar: sem
+# folga, os bytes voltam a ir por pickle.
+
+SHM_DIR = "/dev/shm"
+SHM_FOLGA_MB = int(os.environ.get("V2LABS_SHM_FOLGA_MB", "32"))
+
+
+def nucleos():
+    """Núcleos disponíveis para este processo (respeita cpuset/affinity de contêineres)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+@contextlib.contextmanager
+def _sem_main():
+    """Esconde o __main__ enquanto processos são criados.
+
+    O Streamlit registra o script da página como __main__, e forkserver/spawn o
+    reexecutariam em cada worker. Com um __main__ vazio o worker importa só o que
+    a tarefa usa.
+    """
+    original = sys.modules.get("__main__")
+    vazio = types.ModuleType("__main__")
+    sys.modules["__main__"] = vazio
+    try:
+        yield
+    finally:
+        if sys.modules.get("__main__") is vazio:
+            sys.modules["__main__"] = original
+
+
+class _Pool:
+    """ProcessPoolExecutor criado no primeiro uso e reaproveitado entre trabalhos.
+
+    Usado como executor (submit); um pool quebrado por um worker morto é recriado.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers
+        self._ex = None
+        self._lancados = self._maximo = 0
+        self._lock = threading.Lock()
+
+    def _criar(self):
+        # forkserver: não herda as threads do Streamlit (fork com threads vivas trava)
+        metodo = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+        self._lancados, self._maximo = 0, self.workers or nucleos()
+        return ProcessPoolExecutor(max_workers=self._maximo, mp_context=mp.get_context(metodo))
+
+    def _submeter(self, fn, args):
+        # Os workers nascem sob demanda nos primeiros submits (e o forkserver no primeiro)
+        if self._lancados >= self._maximo:
+            return self._ex.submit(fn, *args)
+        self._lancados += 1
+        with _sem_main():
+            return self._ex.submit(fn, *args)
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self._ex is None:
+                self._ex = self._criar()
+            try:
+                return self._submeter(fn, args)
+            except BrokenProcessPool:
+                self._ex.shutdown(wait=False, cancel_futures=True)
+                self._ex = self._criar()
+                return self._submeter(fn, args)
+
+    def encerrar(self):
+        with self._lock:
+            if self._ex is not None:
+                self._ex.shutdown(wait=False, cancel_futures=True)
+                self._ex = None
+
+
+PROCESSOS = _Pool(int(os.environ.get("V2LABS_PROCESSOS", "0")) or None)
+atexit.register(PROCESSOS.encerrar)
+
+
+# ====== Memória compartilhada ======
+def cabe_em_shm(n_bytes):
+    """Se um bloco de `n_bytes` cabe no tmpfs mantendo SHM_FOLGA_MB livres."""
+    try:
+        livre = shutil.disk_usage(SHM_DIR).free
+    except OSError:
+        return False
+    return livre - n_bytes >= SHM_FOLGA_MB * 2**20
+
+
+def compartilhar(dados: bytes):
+    """Copia `dados` para um bloco novo; quem cria chama liberar() depois do resultado.
+
+    None se não há espaço no tmpfs: o chamador envia os bytes por pickle.
+    """
+    if not cabe_em_shm(len(dados)):
+        return None
+    shm = shared_memory.SharedMemory(create=True, size=max(1, len(dados)))
+    shm.buf[:len(dados)] = dados
+    return shm
+
+
+def ler(entrada, tamanho):
+    """(No worker) bytes de um bloco criado pelo processo principal (ou os próprios bytes)."""
+    if isinstance(entrada, bytes):
+        return entrada
+    shm = shared_memory.SharedMemory(name=entrada)
+    try:
+        return bytes(shm.buf[:tamanho])
+    finally:
+        shm.close()
+
+
+def empacotar(partes):
+    """(No worker) grava várias saídas num só bloco: (nome, [(offset, tamanho)]).
+
+    Sem espaço no tmpfs devolve (None, partes), e as saídas voltam por pickle.
+    """
+    total = sum(len(p) for p in partes)
+    if not cabe_em_shm(total):
+        return None, list(partes)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, total))
+    faixas, pos = [], 0
+    for p in partes:
+        shm.buf[pos:pos + len(p)] = p
+        faixas.append((pos, len(p)))
+        pos += len(p)
+    nome = shm.name
+    shm.close()
+    return nome, faixas
+
+
+def desempacotar(nome, faixas):
+    """(No principal) lê as saídas de empacotar() e libera o bloco."""
+    if nome is None:
+        return faixas
+    shm = shared_memory.SharedMemory(name=nome)
+    try:
+        return [bytes(shm.buf[o:o + n]) for o, n in faixas]
+    finally:
+        liberar(shm)
+
+
+def descartar(nome):
+    """(No principal) libera um bloco de empacotar() sem ler as saídas."""
+    if nome is None:
+        return
+    try:
+        liberar(shared_memory.SharedMemory(name=nome))
+    except FileNotFoundError:
+        pass
+
+
+def liberar(shm):
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+class Gravador(_Nula):
+    """Métricas dentro do worker: guarda os eventos para o principal repetir em Metricas."""
+
+    def __init__(self):
+        self.eventos = []  # (etapa, segundos, item, inicio)
+
+    def registrar(self, etapa, segundos, item=None, inicio=None):
+        self.eventos.append((etapa, segundos, item, inicio))
+
+    @contextlib.contextmanager
+    def medir(self, etapa, item=None):
+        # perf_counter é CLOCK_MONOTONIC no Linux: os inícios batem com os do principal
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(etapa, time.perf_counter() - t0, item, t0)
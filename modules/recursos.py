@@ -0,0 +1,64 @@
+import base64
+import functools
+import importlib
+import io
+import os
+import threading
+
+from PIL import Image
+
+# Conteúdo estático das páginas, preparado uma vez por processo. Cada rerun do
+# Streamlit reenvia o HTML da página; com o banner em PNG original isso era ~1 MB
+# de base64 por rerun (inclusive a cada segundo enquanto um trabalho roda).
+
+_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BANNERS = ("assets/banner_resize.png", "assets/removedor_banner.png")
+
+# Dependências pesadas carregadas sob demanda (ver sessoes_rembg e download_async)
+PESADOS = ("numpy", "modules.inferencia_lote", "aiohttp", "onnxruntime", "rembg")
+
+
+def _resolver(caminho):
+    """Relativo ao diretório atual (como antes) ou, se não existir, à raiz do projeto."""
+    if os.path.exists(caminho):
+        return caminho
+    return os.path.join(_RAIZ, caminho)
+
+
+@functools.lru_cache(maxsize=None)
+def imagem_data_uri(caminho, lado_max=1000, qualidade=88):
+    """Data URI WebP da imagem reduzida a `lado_max` (2x o tamanho exibido); None se não existir."""
+    try:
+        img = Image.open(_resolver(caminho))
+        img.load()
+    except OSError:
+        return None
+    img.thumbnail((lado_max, lado_max))
+    bio = io.BytesIO()
+    img.save(bio, format="WEBP", quality=qualidade)
+    return "data:image/webp;base64," + base64.b64encode(bio.getvalue()).decode("ascii")
+
+
+def preaquecer(modulos=PESADOS, em_background=True):
+    """Codifica os banners e importa as dependências pesadas antes do primeiro uso."""
+    def _aquecer():
+        for caminho in BANNERS:
+            imagem_data_uri(caminho)
+        for nome in modulos:
+            try:
+                importlib.import_module(nome)
+            except Exception:
+                pass
+
+    if em_background:
+        t = threading.Thread(target=_aquecer, name="preaquecer", daemon=True)
+        t.start()
+        return t
+    _aquecer()
+    return None
+
+
+# Contêineres que sobem com frequência: V2LABS_PREAQUECER=1 aquece logo no import
+if os.environ.get("V2LABS_PREAQUECER", "").strip() in ("1", "true", "sim"):
+    preaquecer()
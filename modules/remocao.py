@@ -0,0 +1,66 @@
+import os
+from pathlib import Path
+
+from modules.arquivo_zip import ZipStream
+from modules.cache_resultados import CACHE
+from modules.ingestao import arquivos_locais, contar_imagens, iterar_imagens
+from modules.metricas import NULA, Metricas
+from modules.previas import Previas
+from modules.sessoes_rembg import _HAS_REMBG
+
+# Núcleo do removedor de fundo, sem Streamlit: usado pela página e pela CLI.
+
+MODELOS = ("u2net_human_seg", "u2net", "isnet-general-use")
+
+
+def remover_fundo_lote(itens, zout, modelo=MODELOS[0], tamanho_lote=8, workers=4, intra_threads=0,
+                       inter_threads=0, cache=CACHE, modo_mascara=True, png_compress_level=6, metricas=NULA):
+    """Recorta (nome, raw) em lotes e grava cada PNG no ZipStream.
+
+    Gera (nome, raw, out_bytes, erro, hit_cache) na ordem em que ficam prontos.
+    """
+    if not _HAS_REMBG:
+        raise RuntimeError("Biblioteca 'rembg' não encontrada. Instale com: pip install rembg onnxruntime")
+    # numpy/onnxruntime só entram no processo quando o removedor é usado
+    from modules.inferencia_lote import BatchEngine
+
+    # Sessão reaproveitada entre chamadas; cache por conteúdo evita reprocessar
+    engine = BatchEngine(
+        modelo, tamanho_lote=tamanho_lote, workers=workers,
+        intra_threads=intra_threads, inter_threads=inter_threads,
+        cache=cache, opcoes={"formato": "png"},
+        modo_mascara=modo_mascara, png_compress_level=png_compress_level, metricas=metricas,
+    )
+    for nome, raw, out, erro, hit in engine.processar(metricas.fluxo(itens)):
+        if erro is None:
+            with metricas.medir("zip", nome):
+                zout.adicionar(Path(nome).with_suffix(".png").as_posix(), out)
+            metricas.bytes(saida=len(out))
+        metricas.item(erro=erro is not None)
+        yield nome, raw, out, erro, hit
+
+
+def trabalho_remocao(ctx, modelo, max_previews=3, **opcoes):
+    """Trabalho em segundo plano: recorta <pasta>/entrada em <pasta>/resultado.zip."""
+    files = arquivos_locais([os.path.join(ctx.pasta, "entrada")])
+    total = contar_imagens(files)
+    zip_path = os.path.join(ctx.pasta, "resultado.zip")
+    previas = Previas(os.path.join(ctx.pasta, "previews"), max_previews)
+    erros, hits = 0, 0
+    with ZipStream(destino=zip_path) as zout, Metricas("removedor") as metricas:
+        for i, (nome, raw, out, erro, hit) in enumerate(remover_fundo_lote(
+                iterar_imagens(files, avisar=ctx.aviso), zout, modelo, metricas=metricas, **opcoes), 1):
+            ctx.verificar()
+            if erro is not None:
+                erros += 1
+                ctx.aviso(f"Erro ao processar {nome}: {erro}")
+            elif not previas.cheio:
+                # Só as miniaturas ficam; raw/out do item são liberados a seguir
+                with metricas.medir("preview", nome):
+                    previas.adicionar_par(nome, raw, out)
+            hits += hit
+            ctx.progresso(i, total, f"Processado {i}/{total} · cache {hits}/{i} ({hits / i:.0%})", cache_hits=hits)
+        zout.finalizar().close()
+    trace, prom = metricas.salvar(ctx.pasta)
+    return {"zip": zip_path, "previews": previas.itens, "erros": erros, "cache_hits": hits,
+            "metricas": metricas.resumo(), "trace": trace, "prom": prom}
@@ -1,14 +1,13 @@
 import streamlit as st
-from PIL import Image
-import io, os, shutil, zipfile, base64
-from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import streamlit.components.v1 as components
 
-try:
-    from rembg import remove, new_session
-    _HAS_REMBG = True
-except Exception:
-    _HAS_REMBG = False
+from modules import sessoes_rembg
+from modules import painel_metricas, painel_trabalhos, previas, recursos
+from modules.ingestao import contar_imagens
+from modules.remocao import MODELOS, trabalho_remocao
+from modules.sessoes_rembg import _HAS_REMBG
+
+_CHAVE = "trabalho_removedor"
 
 
 def _play_ping(ping_b64: str):
@@ -17,11 +16,9 @@ def _play_ping(ping_b64: str):
 
 def render(ping_b64: str):
     # ====== CARREGAR IMAGEM COMO BASE64 ======
-    banner_path = "assets/removedor_banner.png"
-    try:
-        with open(banner_path, "rb") as f:
-            b64_banner = base64.b64encode(f.read()).decode("utf-8")
-    except FileNotFoundError:
+    # Reduzido e codificado uma vez por processo
+    banner = recursos.imagem_data_uri("assets/removedor_banner.png")
+    if banner is None:
         st.error("❌ Imagem de banner não encontrada em 'assets/removedor_banner.png'")
         st.stop()
 
@@ -106,7 +103,7 @@ def render(ping_b64: str):
     <div class="hero-container">
         <div class="hero-title">REMOVEDOR DE FUNDO</div>
         <div class="hero">
-            <img src="data:image/png;base64,{b64_banner}" class="bg" alt="background">
+            <img src="{banner}" class="bg" alt="background">
         </div>
     </div>
     """, unsafe_allow_html=True)
@@ -120,124 +117,80 @@ def render(ping_b64: str):
     with st.expander("⚙️ Configurações avançadas", expanded=False):
         model = st.selectbox(
             "Modelo",
-            ("u2net_human_seg", "u2net", "isnet-general-use"),
+            MODELOS,
             index=0,
             help="Escolha o modelo de recorte — o padrão é otimizado para pessoas."
         )
         st.caption("💡 Dica: 'u2net_human_seg' é ideal para retratos humanos.")
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            tamanho_lote = st.number_input("Tamanho do lote", 1, 64, 8, 1, help="Imagens por chamada ao modelo.")
+        with c2:
+            intra_threads = st.number_input("Threads intra-op", 0, 64, 0, 1, help="0 = automático (onnxruntime).")
+        with c3:
+            inter_threads = st.number_input("Threads inter-op", 0, 64, 0, 1, help="0 = automático (onnxruntime).")
+        modo_mascara = st.toggle(
+            "Modo máscara (inferência em baixa resolução)", value=True,
+            help="O modelo roda numa cópia reduzida; só a máscara é ampliada e aplicada ao original."
+        )
+        png_level = st.slider("Compressão PNG", 0, 9, 6, 1, help="0 = mais rápido, 9 = arquivo menor.")
+        stats = sessoes_rembg.POOL.stats()
+        if stats["carregados"]:
+            st.caption(
+                f"🧠 Modelos em memória: {', '.join(stats['carregados'])} "
+                f"({stats['memoria_mb']:.0f}/{stats['memoria_max_mb']} MB) · "
+                f"hits {stats['hits']} · misses {stats['misses']}"
+            )
 
     # ====== UPLOAD ======
-    files = st.file_uploader(
-        "📂 Envie imagens ou um arquivo ZIP",
-        type=["jpg", "jpeg", "png", "webp", "zip"],
-        accept_multiple_files=True
-    )
-    if not files:
-        st.markdown('<div class="custom-alert">👆 Envie suas imagens acima para começar.</div>', unsafe_allow_html=True)
+    # O lote roda em segundo plano: reruns e refresh do navegador não o interrompem
+    if not painel_trabalhos.trabalho_da_sessao(_CHAVE):
+        files = st.file_uploader(
+            "📂 Envie imagens ou um arquivo ZIP",
+            type=["jpg", "jpeg", "png", "webp", "zip"],
+            accept_multiple_files=True
+        )
+        if not files:
+            st.markdown('<div class="custom-alert">👆 Envie suas imagens acima para começar.</div>', unsafe_allow_html=True)
+            st.stop()
+
+        # ====== LEITURA SOB DEMANDA (ZIP COM SUBPASTAS, SEM EXTRAIR EM DISCO) ======
+        tot = contar_imagens(files)
+        if not tot:
+            st.warning("Nenhuma imagem válida foi encontrada dentro das pastas enviadas.")
+            st.stop()
+
+        if st.button(f"▶️ Remover fundo de {tot} imagens", use_container_width=True):
+            if painel_trabalhos.iniciar_trabalho(
+                _CHAVE, "removedor", files, trabalho_remocao, parametros={"modelo": model, "total": tot},
+                modelo=model, tamanho_lote=tamanho_lote, workers=4,
+                intra_threads=intra_threads, inter_threads=inter_threads,
+                modo_mascara=modo_mascara, png_compress_level=png_level,
+            ):
+                st.rerun()
         st.stop()
 
-    INP, OUT = "rm_in", "rm_out"
-    shutil.rmtree(INP, ignore_errors=True)
-    shutil.rmtree(OUT, ignore_errors=True)
-    os.makedirs(INP, exist_ok=True)
-    os.makedirs(OUT, exist_ok=True)
-
-    # ====== EXTRAÇÃO COMPLETA (ZIP COM SUBPASTAS) ======
-    from zipfile import ZipFile, BadZipFile
-
-    def extract_all(zip_file, extract_to):
-        """Extrai ZIP incluindo subpastas preservando estrutura"""
-        for member in zip_file.infolist():
-            try:
-                zip_file.extract(member, extract_to)
-            except Exception as e:
-                st.warning(f"Não foi possível extrair {member.filename}: {e}")
-
-    for f in files:
-        if f.name.lower().endswith(".zip"):
-            try:
-                with ZipFile(io.BytesIO(f.read())) as z:
-                    extract_all(z, INP)
-            except BadZipFile:
-                st.error(f"❌ ZIP inválido: {f.name}")
-        else:
-            file_path = os.path.join(INP, f.name)
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, "wb") as out:
-                out.write(f.read())
-
-    paths = [p for p in Path(INP).rglob("*") if p.suffix.lower() in (".jpg", ".jpeg", ".png", ".webp")]
-    if not paths:
-        st.warning("Nenhuma imagem válida foi encontrada dentro das pastas enviadas.")
+    estado = painel_trabalhos.acompanhar(_CHAVE)
+    if estado is None:
         st.stop()
-
-    session = new_session(model)
-
-    prog = st.progress(0.0)
-    info = st.empty()
-    previews = []
-
-    def worker(p: Path):
-        rel = p.relative_to(INP)
-        raw = open(p, "rb").read()
-        out_bytes = remove(raw, session=session)
-        outp = (Path(OUT) / rel).with_suffix(".png")
-        os.makedirs(outp.parent, exist_ok=True)
-        open(outp, "wb").write(out_bytes)
-        return raw, out_bytes, rel.as_posix()
-
-    with ThreadPoolExecutor(max_workers=4) as ex:
-        fut = [ex.submit(worker, p) for p in paths]
-        tot = len(fut)
-        for i, f in enumerate(as_completed(fut), 1):
-            try:
-                previews.append(f.result())
-            except Exception as e:
-                st.error(f"Erro ao processar: {e}")
-            prog.progress(i / tot)
-            info.info(f"Processado {i}/{tot}")
+    res = estado["resultado"]
 
     st.markdown("<hr style='border: 0; border-top: 1px solid #ccc;'>", unsafe_allow_html=True)
     st.subheader("🖼️ Pré-visualização (Antes / Depois)")
-    alpha = st.slider("Comparação de mistura", 0, 100, 50, 1)
-    blend = alpha / 100.0
-
-    cols = st.columns(2)
-    for orig_b, out_b, name in previews[:3]:
-        with cols[0]:
-            st.image(orig_b, caption=f"ANTES — {name}", use_column_width=True)
-        with cols[1]:
-            try:
-                img_o = Image.open(io.BytesIO(orig_b)).convert("RGBA")
-                img_r = Image.open(io.BytesIO(out_b)).convert("RGBA")
-                w = min(img_o.width, img_r.width)
-                h = min(img_o.height, img_r.height)
-                img_o = img_o.resize((w, h))
-                img_r = img_r.resize((w, h))
-                blended = Image.blend(img_o, img_r, blend)
-                bio = io.BytesIO()
-                blended.save(bio, format="PNG")
-                bio.seek(0)
-                st.image(bio, caption=f"DEPOIS — {name}", use_column_width=True)
-            except Exception:
-                st.image(out_b, caption=f"DEPOIS — {name}", use_column_width=True)
-
-    # ====== CRIAR ZIP FINAL ======
-    zbytes = io.BytesIO()
-    with zipfile.ZipFile(zbytes, "w", zipfile.ZIP_DEFLATED) as z:
-        for root, _, files in os.walk(OUT):
-            for fn in files:
-                fp = os.path.join(root, fn)
-                arc = os.path.relpath(fp, OUT)
-                z.write(fp, arc)
-    zbytes.seek(0)
+    # Miniaturas geradas no trabalho; a mistura roda no navegador, sem rerun a cada ajuste
+    pares = res["previews"][:3]
+    if pares:
+        components.html(previas.comparador_html(pares), height=previas.altura_comparador(pares), scrolling=True)
 
+    # ====== ZIP FINAL (montado durante o processamento) ======
     st.success("✅ Remoção de fundo concluída!")
     _play_ping(ping_b64)
-    st.download_button(
-        "📦 Baixar PNGs sem fundo",
-        data=zbytes,
-        file_name="sem_fundo.zip",
-        mime="application/zip",
-        use_container_width=True
-    )
+    with open(res["zip"], "rb") as zbytes:
+        st.download_button(
+            "📦 Baixar PNGs sem fundo",
+            data=zbytes,
+            file_name="sem_fundo.zip",
+            mime="application/zip",
+            use_container_width=True
+        )
+    painel_metricas.mostrar(res.get("metricas"), res.get("trace"), res.get("prom"))
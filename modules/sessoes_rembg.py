@@ -0,0 +1,157 @@
+import importlib.util
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Detecta sem importar: rembg/onnxruntime (centenas de MB e segundos de import)
+# só carregam quando a primeira sessão é criada
+_HAS_REMBG = all(importlib.util.find_spec(m) is not None for m in ("rembg", "onnxruntime"))
+
+# Modelos oferecidos no removedor de fundo
+MODELOS = ("u2net_human_seg", "u2net", "isnet-general-use")
+
+# Estimativa de memória residente por sessão (MB) quando não dá para medir o RSS
+_TAMANHO_ESTIMADO_MB = {
+    "u2net_human_seg": 350,
+    "u2net": 350,
+    "isnet-general-use": 360,
+}
+
+
+def _rss_mb():
+    """RSS atual do processo em MB (None fora do Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class SessionPool:
+    """Registro de sessões rembg compartilhado pelo processo, com despejo LRU."""
+
+    def __init__(self, memoria_max_mb=1024):
+        self.memoria_max_mb = memoria_max_mb
+        self._sessoes = OrderedDict()   # chave -> (sessao, custo_mb)
+        self._lock = threading.Lock()
+        self._carregando = {}           # chave -> Lock (evita carregar o mesmo modelo 2x)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.tempo_carga = {}           # chave -> segundos da carga
+
+    def obter(self, modelo, intra_threads=0, inter_threads=0):
+        """Devolve a sessão do modelo, carregando-a só na primeira vez.
+
+        intra/inter_threads = 0 deixa o onnxruntime decidir.
+        """
+        chave = (modelo, int(intra_threads), int(inter_threads))
+        with self._lock:
+            if chave in self._sessoes:
+                self._sessoes.move_to_end(chave)
+                self.hits += 1
+                return self._sessoes[chave][0]
+            trava = self._carregando.setdefault(chave, threading.Lock())
+
+        with trava:
+            # Outra thread pode ter terminado a carga enquanto esperávamos
+            with self._lock:
+                if chave in self._sessoes:
+                    self._sessoes.move_to_end(chave)
+                    self.hits += 1
+                    return self._sessoes[chave][0]
+                self.misses += 1
+
+            import onnxruntime as ort
+            from rembg import new_session
+
+            opts = ort.SessionOptions()
+            opts.intra_op_num_threads = int(intra_threads)
+            opts.inter_op_num_threads = int(inter_threads)
+
+            rss_antes = _rss_mb()
+            t0 = time.perf_counter()
+            sessao = new_session(modelo, sess_opts=opts)
+            self.tempo_carga[chave] = time.perf_counter() - t0
+            rss_depois = _rss_mb()
+
+            custo = _TAMANHO_ESTIMADO_MB.get(modelo, 400)
+            if rss_antes is not None and rss_depois is not None and rss_depois > rss_antes:
+                custo = rss_depois - rss_antes
+
+            with self._lock:
+                self._sessoes[chave] = (sessao, custo)
+                self._carregando.pop(chave, None)
+                self._despejar()
+            return sessao
+
+    def _despejar(self):
+        # Mantém ao menos a sessão mais recente, mesmo acima do orçamento
+        while len(self._sessoes) > 1 and self.memoria_usada_mb() > self.memoria_max_mb:
+            self._sessoes.popitem(last=False)
+            self.evictions += 1
+
+    def memoria_usada_mb(self):
+        return sum(custo for _, custo in self._sessoes.values())
+
+    def aquecer(self, modelos=MODELOS, em_background=True):
+        """Pré-carrega modelos (opcionalmente numa thread daemon)."""
+        def _carregar():
+            for m in modelos:
+                try:
+                    self.obter(m)
+                except Exception:
+                    pass
+
+        if em_background:
+            t = threading.Thread(target=_carregar, name="rembg-aquecer", daemon=True)
+            t.start()
+            return t
+        _carregar()
+        return None
+
+    def limpar(self):
+        with self._lock:
+            self._sessoes.clear()
+
+    @staticmethod
+    def _rotulo(chave):
+        """'u2net' com threads automáticas; 'u2net (intra 4, inter 1)' caso contrário."""
+        modelo, intra, inter = chave
+        if not intra and not inter:
+            return modelo
+        return f"{modelo} (intra {intra}, inter {inter})"
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "carregados": [self._rotulo(c) for c in self._sessoes],
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits / total) if total else 0.0,
+                "memoria_mb": round(self.memoria_usada_mb(), 1),
+                "memoria_max_mb": self.memoria_max_mb,
+                "tempo_carga_s": {self._rotulo(c): round(t, 2) for c, t in self.tempo_carga.items()},
+            }
+
+
+# Instância única do processo (sobrevive aos reruns do Streamlit)
+POOL = SessionPool(memoria_max_mb=int(os.environ.get("REMBG_SESSOES_MAX_MB", "1024")))
+
+
+def obter_sessao(modelo, intra_threads=0, inter_threads=0):
+    return POOL.obter(modelo, intra_threads, inter_threads)
+
+
+def aquecer(modelos=MODELOS, em_background=True):
+    return POOL.aquecer(modelos, em_background=em_background)
+
+
+# Aquecimento opcional na inicialização: REMBG_PREAQUECER="u2net_human_seg,u2net"
+_preaquecer = [m.strip() for m in os.environ.get("REMBG_PREAQUECER", "").split(",") if m.strip()]
+if _preaquecer:
+    aquecer(_preaquecer)
@@ -0,0 +1,158 @@
+import json
+import time
+
+# Exportação via GraphQL Bulk Operations: a Shopify monta um JSONL com todos os
+# produtos/imagens da coleção e o lemos linha a linha, sem paginar.
+# O tipo Image do GraphQL não tem updatedAt: cada imagem herda o updatedAt do produto.
+
+_BULK_QUERY = """
+{
+  collection(id: "%s") {
+    products {
+      edges {
+        node {
+          id
+          title
+          handle
+          updatedAt
+          images {
+            edges {
+              node { id url }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+_RUN_MUTATION = """
+mutation run($query: String!) {
+  bulkOperationRunQuery(query: $query) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+"""
+
+_POLL_QUERY = """
+{
+  currentBulkOperation { id status errorCode objectCount url partialDataUrl }
+}
+"""
+
+_COLLECTION_BY_HANDLE = """
+query col($q: String!) {
+  collections(first: 1, query: $q) { edges { node { id handle } } }
+}
+"""
+
+
+class ErroBulk(Exception):
+    pass
+
+
+def gid_para_id(gid):
+    """'gid://shopify/Product/123' -> 123 (int quando possível)."""
+    tail = str(gid).rsplit("/", 1)[-1]
+    return int(tail) if tail.isdigit() else tail
+
+
+class ShopifyBulk:
+    """Cliente mínimo de GraphQL Admin para bulk operations.
+
+    `api` é um objeto com .post/.get (AgendadorShopify ou requests.Session).
+    """
+
+    def __init__(self, api, base_url, api_version, token, intervalo_poll=2.0, timeout_poll=3600):
+        self.api = api
+        self.endpoint = f"{base_url}/admin/api/{api_version}/graphql.json"
+        self.headers = {"X-Shopify-Access-Token": token, "Content-Type": "application/json"}
+        self.intervalo_poll = intervalo_poll
+        self.timeout_poll = timeout_poll
+
+    def _graphql(self, query, variables=None):
+        r = self.api.post(self.endpoint, headers=self.headers, json={"query": query, "variables": variables or {}})
+        if r.status_code != 200:
+            raise ErroBulk(f"Erro {r.status_code}: {r.text[:300]}")
+        corpo = r.json()
+        if corpo.get("errors"):
+            raise ErroBulk(f"GraphQL: {corpo['errors']}")
+        return corpo["data"]
+
+    def resolver_colecao(self, id_ou_handle):
+        """ID numérico ou handle (coleção manual ou automática) -> gid da coleção."""
+        if str(id_ou_handle).isdigit():
+            return f"gid://shopify/Collection/{id_ou_handle}"
+        data = self._graphql(_COLLECTION_BY_HANDLE, {"q": f"handle:'{id_ou_handle}'"})
+        edges = data["collections"]["edges"]
+        if not edges:
+            raise ErroBulk("Coleção não encontrada pelo handle informado.")
+        return edges[0]["node"]["id"]
+
+    def iniciar(self, collection_gid):
+        data = self._graphql(_RUN_MUTATION, {"query": _BULK_QUERY % collection_gid})
+        res = data["bulkOperationRunQuery"]
+        if res["userErrors"]:
+            raise ErroBulk("; ".join(e["message"] for e in res["userErrors"]))
+        return res["bulkOperation"]["id"]
+
+    def aguardar(self, ao_progredir=None):
+        """Consulta a operação até terminar; devolve a URL do JSONL (None se vazio)."""
+        limite = time.monotonic() + self.timeout_poll
+        while True:
+            op = self._graphql(_POLL_QUERY)["currentBulkOperation"]
+            if op is None:
+                raise ErroBulk("Nenhuma bulk operation em andamento.")
+            if ao_progredir:
+                ao_progredir(op)
+            if op["status"] == "COMPLETED":
+                return op.get("url")
+            if op["status"] in ("FAILED", "CANCELED", "EXPIRED"):
+                raise ErroBulk(f"Bulk operation {op['status']}: {op.get('errorCode')}")
+            if time.monotonic() > limite:
+                raise ErroBulk("Tempo esgotado aguardando a bulk operation.")
+            time.sleep(self.intervalo_poll)
+
+    def iterar_produtos(self, url_jsonl):
+        """Lê o JSONL em streaming e gera produtos no formato da REST API.
+
+        O arquivo lista cada produto seguido das suas imagens (__parentId), então
+        só um produto fica em memória por vez.
+        """
+        if not url_jsonl:
+            return
+        with self.api.get(url_jsonl, stream=True, timeout=300) as r:
+            if r.status_code != 200:
+                raise ErroBulk(f"Erro {r.status_code} ao baixar o resultado da bulk operation")
+            atual = None
+            for linha in r.iter_lines():
+                if not linha:
+                    continue
+                obj = json.loads(linha)
+                pai = obj.get("__parentId")
+                if pai is None:
+                    if atual is not None:
+                        yield atual
+                    atual = {
+                        "id": gid_para_id(obj["id"]),
+                        "title": obj.get("title", ""),
+                        "handle": obj.get("handle"),
+                        "updated_at": obj.get("updatedAt"),
+                        "images": [],
+                    }
+                elif atual is not None and gid_para_id(pai) == atual["id"]:
+                    atual["images"].append({
+                        "id": gid_para_id(obj["id"]),
+                        "src": obj.get("url") or obj.get("src"),
+                        "updated_at": atual["updated_at"],
+                    })
+            if atual is not None:
+                yield atual
+
+    def exportar(self, id_ou_handle, ao_progredir=None):
+        """Resolve a coleção, roda a bulk operation e gera os produtos."""
+        gid = self.resolver_colecao(id_ou_handle)
+        self.iniciar(gid)
+        yield from self.iterar_produtos(self.aguardar(ao_progredir))
@@ -0,0 +1,228 @@
+import json
+import os
+import shutil
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.espacos import ESPACOS, Espaco
+
+# Trabalhos em segundo plano: o lote roda fora do script do Streamlit, então um
+# rerun ou refresh do navegador não o interrompe. O estado de cada trabalho fica em
+# <pasta>/<id>/estado.json e o resultado na mesma pasta. Por padrão, <pasta> é a
+# categoria "trabalhos" dos espaços isolados (RAM quando há tmpfs, com TTL e cota).
+
+NA_FILA, EXECUTANDO, CONCLUIDO, FALHOU, CANCELADO, INTERROMPIDO = (
+    "na_fila", "executando", "concluido", "falhou", "cancelado", "interrompido",
+)
+FINAIS = {CONCLUIDO, FALHOU, CANCELADO, INTERROMPIDO}
+
+
+class Cancelado(Exception):
+    pass
+
+
+def _processo_vivo(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class Contexto:
+    """O que a função do trabalho enxerga: pasta própria, progresso e cancelamento."""
+
+    def __init__(self, gerenciador, id_, espaco):
+        self.id = id_
+        self.espaco = espaco
+        self.pasta = espaco.caminho
+        self._g = gerenciador
+        self._cancelar = threading.Event()
+
+    @property
+    def cancelado(self):
+        return self._cancelar.is_set()
+
+    def verificar(self):
+        """Levanta Cancelado se pediram o cancelamento, ou CotaExcedida se a pasta passou da cota (chamar entre itens)."""
+        if self._cancelar.is_set():
+            raise Cancelado()
+        self.espaco.conferir()
+
+    def progresso(self, feitos, total, mensagem=None, **extras):
+        self._g._atualizar(self.id, feitos=feitos, total=total, mensagem=mensagem, **extras)
+
+    def aviso(self, mensagem):
+        self._g._avisar(self.id, mensagem)
+
+
+class GerenciadorTrabalhos:
+    """Fila de trabalhos com limite global de concorrência, compartilhado por todas as sessões."""
+
+    def __init__(self, max_concorrentes=2, pasta=None, intervalo_gravacao=0.5, espacos=ESPACOS):
+        self.max_concorrentes = max(1, int(max_concorrentes))
+        # Pasta explícita (TRABALHOS_DIR) fica fora da gestão de espaços
+        self.espacos = None if pasta else espacos
+        self.pasta = pasta or espacos.pasta("trabalhos")
+        self.intervalo_gravacao = intervalo_gravacao
+        self._ex = ThreadPoolExecutor(max_workers=self.max_concorrentes, thread_name_prefix="trabalho")
+        self._lock = threading.Lock()
+        self._estados = {}    # id -> dict
+        self._contextos = {}  # id -> Contexto
+        self._futuros = {}    # id -> Future
+        self._gravado_em = {}
+        os.makedirs(self.pasta, exist_ok=True)
+        self._marcar_interrompidos()
+
+    # ====== Persistência ======
+    def _arquivo(self, id_):
+        return os.path.join(self.pasta, id_, "estado.json")
+
+    def _gravar(self, estado, forcar=True):
+        agora = time.monotonic()
+        if not forcar and agora - self._gravado_em.get(estado["id"], 0) < self.intervalo_gravacao:
+            return
+        self._gravado_em[estado["id"]] = agora
+        caminho = self._arquivo(estado["id"])
+        tmp = caminho + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(estado, f, ensure_ascii=False)
+        os.replace(tmp, caminho)
+
+    def _ler(self, id_):
+        try:
+            with open(self._arquivo(id_), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _marcar_interrompidos(self):
+        """Trabalhos que estavam em andamento quando o processo anterior morreu."""
+        for id_ in os.listdir(self.pasta):
+            estado = self._ler(id_)
+            if estado and estado["estado"] not in FINAIS and not _processo_vivo(estado.get("pid")):
+                estado.update(estado=INTERROMPIDO, mensagem="Interrompido pelo reinício do servidor.")
+                self._gravar(estado)
+
+    # ====== API ======
+    def criar(self, tipo, parametros=None, previsto=None):
+        """Reserva id e pasta; o chamador grava as entradas em ctx.pasta antes de iniciar().
+
+        `previsto` (bytes esperados na pasta) decide entre RAM e disco.
+        """
+        id_ = uuid.uuid4().hex[:12]
+        if self.espacos is not None:
+            espaco = self.espacos.criar("trabalhos", id_, previsto=previsto)
+        else:
+            espaco = Espaco(os.path.join(self.pasta, id_), ESPACOS.cota_bytes)
+            espaco.garantir()
+        ctx = Contexto(self, id_, espaco)
+        estado = {
+            "id": id_, "tipo": tipo, "pid": os.getpid(), "estado": NA_FILA,
+            "feitos": 0, "total": 0, "mensagem": None, "avisos": [], "resultado": None, "erro": None, "parametros": parametros or {},
+            "criado_em": time.time(), "iniciado_em": None, "concluido_em": None,
+        }
+        with self._lock:
+            self._estados[id_] = estado
+            self._contextos[id_] = ctx
+            self._gravar(estado)
+        return ctx
+
+    def iniciar(self, ctx, fn, **kwargs):
+        """Enfileira fn(ctx, **kwargs); o retorno (dict) vira o 'resultado' do trabalho."""
+        with self._lock:
+            self._futuros[ctx.id] = self._ex.submit(self._executar, ctx, fn, kwargs)
+        return ctx.id
+
+    def _executar(self, ctx, fn, kwargs):
+        if ctx.cancelado:
+            return self._finalizar(ctx.id, CANCELADO)
+        self._atualizar(ctx.id, forcar=True, estado=EXECUTANDO, iniciado_em=time.time())
+        try:
+            resultado = fn(ctx, **kwargs)
+        except Cancelado:
+            self._finalizar(ctx.id, CANCELADO, mensagem="Cancelado.")
+        except Exception as e:
+            self._finalizar(ctx.id, FALHOU, erro=f"{type(e).__name__}: {e}", detalhe=traceback.format_exc(limit=5))
+        else:
+            self._finalizar(ctx.id, CONCLUIDO, resultado=resultado)
+
+    def _atualizar(self, id_, forcar=False, **campos):
+        with self._lock:
+            estado = self._estados[id_]
+            estado.update(campos)
+            self._gravar(estado, forcar=forcar)
+
+    def _avisar(self, id_, mensagem):
+        with self._lock:
+            self._estados[id_]["avisos"].append(mensagem)
+
+    def _finalizar(self, id_, estado, **campos):
+        self._atualizar(id_, forcar=True, estado=estado, concluido_em=time.time(), **campos)
+        with self._lock:
+            self._contextos.pop(id_, None)
+            self._futuros.pop(id_, None)
+
+    def status(self, id_):
+        """Estado atual (memória ou, para trabalhos de outro processo, o JSON gravado).
+
+        None se o trabalho não existe mais, inclusive quando a limpeza por TTL já
+        apagou a pasta de um trabalho finalizado (o estado em memória é descartado).
+        """
+        if not id_ or os.path.basename(id_) != id_:
+            return None
+        with self._lock:
+            estado = self._estados.get(id_)
+            if estado is not None and estado["estado"] in FINAIS and not os.path.isdir(os.path.join(self.pasta, id_)):
+                del self._estados[id_]
+                return None
+            if estado is not None:
+                return json.loads(json.dumps(estado))
+        return self._ler(id_)
+
+    def cancelar(self, id_):
+        with self._lock:
+            ctx = self._contextos.get(id_)
+            fut = self._futuros.get(id_)
+        if ctx is None:
+            return False
+        ctx._cancelar.set()
+        # Ainda na fila (ou nem enfileirado): sai sem ocupar uma vaga
+        if fut is None or fut.cancel():
+            self._finalizar(id_, CANCELADO, mensagem="Cancelado antes de iniciar.")
+        return True
+
+    def remover(self, id_):
+        """Apaga pasta e estado de um trabalho já finalizado."""
+        estado = self.status(id_)
+        if not estado or estado["estado"] not in FINAIS:
+            return False
+        with self._lock:
+            self._estados.pop(id_, None)
+        if self.espacos is not None:
+            self.espacos.remover(os.path.join(self.pasta, id_))
+        else:
+            shutil.rmtree(os.path.join(self.pasta, id_), ignore_errors=True)
+        return True
+
+    def stats(self):
+        with self._lock:
+            estados = [e["estado"] for e in self._estados.values()]
+        return {
+            "executando": estados.count(EXECUTANDO), "na_fila": estados.count(NA_FILA),
+            "max_concorrentes": self.max_concorrentes,
+        }
+
+
+# Um gerenciador por processo: o limite vale para todas as sessões do servidor
+TRABALHOS = GerenciadorTrabalhos(
+    max_concorrentes=int(os.environ.get("TRABALHOS_MAX_CONCORRENTES", str(max(1, (os.cpu_count() or 2) // 2)))),
+    pasta=os.environ.get("TRABALHOS_DIR") or None,
+)